@@ -1,7 +1,7 @@
 # app/core/config.py
 import os
 from pydantic import BaseModel, Field
-from typing import List, Dict
+from typing import List, Dict, Literal, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,6 +11,12 @@ class ScannerConfig(BaseModel):
     name: str
     url: str
     is_ipo: bool = False
+    # "http" posts the scan clause straight to ChartInk and falls back to Playwright on failure
+    backend: Literal["playwright", "http"] = "playwright"
+    # Worksheet (tab) for this scanner's table; defaults to Settings.worksheet_name
+    worksheet: Optional[str] = None
+    # Cron expression (UTC) for daemon mode; defaults to Settings.daemon_schedule
+    schedule: Optional[str] = None
 
 class Settings(BaseModel):
     """Main application settings."""
@@ -20,20 +26,89 @@ class Settings(BaseModel):
         ScannerConfig(
             name="Monthly stocks for Nifty 100",
             url="https://chartink.com/screener/5ema-monthly-for-nifty-100",
-            is_ipo=False
+            is_ipo=False,
+            backend="http"
         ),
         ScannerConfig(
             name="Monthly stocks from last 5 years IPO",
             url="https://chartink.com/screener/5ema-monthly-69",
-            is_ipo=True
+            is_ipo=True,
+            backend="http"
         )
     ]
     table_headers: List[str] = [
         'Stock Name', 'Symbol', 'Price', 'Volume',
         'Buying Price', 'Stoploss', 'Status'
     ]
+    use_proxies: bool = False  # Route browser contexts and HTTP scans through proxies.txt
+    proxies_file: str = "proxies.txt"
+    proxy_scores_path: str = ".cache/proxy_scores.json"
+    proxy_probe_target: str = "chartink.com:443"
+    proxy_probe_timeout_seconds: float = 5.0
+    proxy_probe_concurrency: int = 100
+    proxy_probe_limit: int = 200  # Max stale proxies probed per startup
+    proxy_rescore_hours: int = 24
+    proxy_top_k: int = 10  # Rotate among this many fastest healthy proxies
+    proxy_failure_threshold: int = 3  # Consecutive failures before the circuit opens
+    proxy_cooldown_seconds: int = 600
+    table_gap_columns: int = 2  # Empty columns between side-by-side tables
+    data_start_row: int = 3  # Row 1 holds the title, row 2 the headers
+    sheets_new_worksheet_rows: int = 1000  # Initial grid size; grown automatically before writes
+    sheets_read_chunk_rows: int = 5000  # Rows per paginated table read
+    sheets_write_chunk_cells: int = 50_000  # Max cells per values batchUpdate request
+    sheets_write_concurrency: int = 3  # Write requests in flight at once
+    # Sheets API quotas in requests per minute (Google's defaults)
+    sheets_read_quota_per_user: int = 60
+    sheets_read_quota_per_project: int = 300
+    sheets_write_quota_per_user: int = 60
+    sheets_write_quota_per_project: int = 300
+    sheets_max_retries: int = 5  # For 429 and 5xx responses
+    sheets_backoff_base_seconds: float = 1.0
+    sheets_backoff_max_seconds: float = 64.0
+    # Append only symbols the scan history has never seen for a scanner, without reading its table back.
+    # Skips dismissed-row cleanup for those tables (use --clean-dismissed), and dismissed symbols stay gone.
+    sheets_append_new_only: bool = False
+    sheets_dry_run: bool = False  # Log planned writes and payload size without writing
+    # "values" writes Buy Price/Stoploss from PriceHistoryService; "formulas" keeps GOOGLEFINANCE lookups
+    price_columns: Literal["values", "formulas"] = "values"
+    # With "formulas": "array" puts one BYROW formula per column in the header row,
+    # "named_function" does the same through a sheet-level named function, "per_row" is the legacy mode
+    formula_strategy: Literal["array", "named_function", "per_row"] = "array"
+    formula_named_function: str = "CHARTINK_LEVEL"
+    price_cache_dir: str = ".cache/price_history"
+    checkpoint_dir: str = ".cache/checkpoints"
+    metrics_dir: str = "metrics"  # Per-run JSON report and Prometheus textfile
+    history_dir: str = "history"  # Parquet scan history, partitioned by scanner and month
+    shard_artifact_dir: str = "shards"  # Per-shard scan results for the merge stage
     retry_attempts: int = 3
-    retry_delay_seconds: int = 5
+    retry_delay_seconds: int = 5  # Doubles on each retry, plus up to a second of jitter
+    # Browser scrape timeouts adapt to each scanner's recent durations
+    scan_latency_path: str = ".cache/scan_latencies.json"
+    scan_latency_window: int = 50  # Successful scrape durations kept per scanner
+    scan_latency_min_samples: int = 5  # Fewer than this and the fixed defaults apply
+    scan_timeout_seconds: int = 90  # Attempt timeout until a scanner has history
+    scan_timeout_p95_factor: float = 3.0  # Attempt timeout = p95 x this, within the bounds below
+    scan_timeout_min_seconds: int = 30
+    scan_timeout_max_seconds: int = 180
+    scan_hedge_min_seconds: int = 5  # Never hedge an attempt earlier than this
+    http_timeout_seconds: int = 30
+    max_concurrent_scans: int = 4  # Size of the browser context pool
+    blocked_resource_types: List[str] = ['image', 'font', 'stylesheet', 'media']
+    blocked_url_keywords: List[str] = [
+        'google-analytics', 'googletagmanager', 'doubleclick', 'googlesyndication',
+        'facebook', 'hotjar', 'clarity.ms'
+    ]
+    # Typical transfer sizes (bytes) used to estimate savings from blocked requests
+    blocked_resource_size_estimates: Dict[str, int] = {
+        'image': 25_000, 'font': 40_000, 'stylesheet': 30_000,
+        'media': 200_000, 'script': 50_000, 'other': 5_000
+    }
+    # Daemon mode (python -m app.daemon)
+    daemon_schedule: str = "0 0 1 * *"  # Same as the monthly workflow
+    daemon_host: str = "127.0.0.1"  # Trigger endpoint; keep it local
+    daemon_port: int = 8765
+    daemon_browser_recycle_scans: int = 50  # Relaunch Firefox after this many scans to bound memory
+    daemon_credential_refresh_minutes: int = 10  # Renew the Google token when it expires within this
     gcp_credentials: Dict = Field(default_factory=dict)
 
     class Config:
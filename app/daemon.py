@@ -0,0 +1,190 @@
+# app/daemon.py
+import asyncio
+import json
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+from .core.config import ScannerConfig, settings
+from .main import export_metrics, write_results
+from .services.cron_schedule import CronSchedule
+from .services.proxy_pool import ProxyPool
+from .services.scraper_service import WarmBrowser, run_scrapers
+from .services.sheets_service import SheetsService
+from .utils.logger import log
+from .utils.metrics import metrics
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+class ScanDaemon:
+    """
+    Long-running scanner. Keeps a warm browser and an authorized SheetsService between
+    runs, fires scanners on their cron schedules (UTC), and accepts on-demand runs on
+    a local HTTP endpoint:
+      POST /scan[?scanner=<name>...]  queue a run (all scanners by default)
+      GET  /health                    status, run counts and next scheduled times
+    Runs never overlap; a trigger during a run waits behind it.
+    """
+    def __init__(self, scanners: Optional[List[ScannerConfig]] = None, clock: Callable[[], datetime] = utc_now):
+        self.scanners = list(settings.scanners if scanners is None else scanners)
+        self.schedules = {scanner.name: CronSchedule(scanner.schedule or settings.daemon_schedule) for scanner in self.scanners}
+        self.clock = clock
+        self.warm: Optional[WarmBrowser] = None
+        self.sheets: Optional[SheetsService] = None
+        self.runs = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._run_lock = asyncio.Lock()
+        self._triggered: Set[asyncio.Task] = set()
+
+    async def start(self):
+        """Warms the browser (if any scanner needs one) and the Sheets client, then opens the endpoint."""
+        proxy_pool = None
+        if settings.use_proxies:
+            proxy_pool = ProxyPool.from_file()
+            await proxy_pool.refresh()
+        self.warm = WarmBrowser(proxy_pool)
+        if any(scanner.backend == "playwright" for scanner in self.scanners):
+            await self.warm.scraper()
+        self.sheets = await asyncio.to_thread(SheetsService)
+        self.server = await asyncio.start_server(self._handle_http, settings.daemon_host, settings.daemon_port)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        log.info(f"🛰️ Daemon listening on http://{host}:{port} with {len(self.scanners)} scanner(s).")
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for task in list(self._triggered):
+            task.cancel()
+        if self.warm is not None:
+            await self.warm.shutdown()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._schedule_loop()
+        finally:
+            await self.stop()
+
+    def next_runs(self) -> Dict[str, datetime]:
+        now = self.clock()
+        return {name: schedule.next_after(now) for name, schedule in self.schedules.items()}
+
+    async def _schedule_loop(self):
+        while True:
+            upcoming = self.next_runs()
+            fire_at = min(upcoming.values())
+            due = [scanner for scanner in self.scanners if upcoming[scanner.name] == fire_at]
+            log.info(f"⏰ Next scheduled run at {fire_at.isoformat()}: {', '.join(s.name for s in due)}")
+            await asyncio.sleep(max(0.0, (fire_at - self.clock()).total_seconds()))
+            await self.run_scan(due, reason="schedule")
+
+    def _prepare_sheets(self) -> SheetsService:
+        """Reuses the authorized service when there is one, otherwise signs in again."""
+        if self.sheets is None:
+            self.sheets = SheetsService()
+        else:
+            self.sheets.refresh()
+        self.sheets.prefetch_tables()
+        return self.sheets
+
+    async def run_scan(self, scanners: List[ScannerConfig], reason: str = "trigger") -> bool:
+        """
+        One run over `scanners` with the warm browser and Sheets client; the same
+        streaming pipeline as main(). A failed run drops the Sheets client so the
+        next run authenticates from scratch.
+        """
+        async with self._run_lock:
+            metrics.reset()
+            start_time = time.time()
+            log.info(f"--- Daemon run ({reason}): {len(scanners)} scanner(s) ---")
+            queue: asyncio.Queue = asyncio.Queue()
+            sheets_ready = asyncio.create_task(asyncio.to_thread(self._prepare_sheets))
+            writer = asyncio.create_task(write_results(queue, sheets_ready))
+            ok = False
+            try:
+                try:
+                    with metrics.span("scrape_all"):
+                        await run_scrapers(scanners, on_result=queue.put_nowait, warm=self.warm)
+                finally:
+                    queue.put_nowait(None)
+                with metrics.span("sheets_drain"):
+                    await writer
+                ok = True
+            except Exception as e:
+                log.error(f"❌ Daemon run ({reason}) failed: {e}")
+                traceback.print_exc()
+                self.sheets = None
+                writer.cancel()
+            finally:
+                export_metrics()
+                self.runs += 1
+                self.last_run = {
+                    'finished_at': self.clock().isoformat(), 'reason': reason, 'ok': ok,
+                    'scanners': [scanner.name for scanner in scanners],
+                    'seconds': round(time.time() - start_time, 3),
+                }
+            log.info(f"--- Daemon run finished in {time.time() - start_time:.2f} seconds ---")
+            return ok
+
+    def trigger(self, names: Optional[List[str]] = None) -> List[ScannerConfig]:
+        """Queues a run of the named scanners (all when none are given)."""
+        scanners = [scanner for scanner in self.scanners if not names or scanner.name in names]
+        task = asyncio.create_task(self.run_scan(scanners, reason="trigger"))
+        self._triggered.add(task)
+        task.add_done_callback(self._triggered.discard)
+        return scanners
+
+    def _route(self, method: str, target: str) -> Tuple[int, Dict[str, Any]]:
+        url = urlparse(target)
+        if url.path == "/health":
+            if method != "GET":
+                return 405, {'error': "use GET"}
+            return 200, {
+                'running': self._run_lock.locked(),
+                'queued': len(self._triggered),
+                'runs': self.runs,
+                'last_run': self.last_run,
+                'browser_scans': self.warm.scans if self.warm else 0,
+                'next_runs': {name: at.isoformat() for name, at in self.next_runs().items()},
+            }
+        if url.path == "/scan":
+            if method != "POST":
+                return 405, {'error': "use POST"}
+            names = parse_qs(url.query).get('scanner', [])
+            unknown = sorted(set(names) - set(self.schedules))
+            if unknown:
+                return 404, {'error': f"unknown scanner(s): {', '.join(unknown)}"}
+            return 202, {'queued': [scanner.name for scanner in self.trigger(names)]}
+        return 404, {'error': "not found"}
+
+    async def _handle_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Minimal HTTP/1.1: reads the request line, skips headers and body, answers JSON and closes."""
+        try:
+            request_line = (await reader.readline()).decode('latin-1')
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            method, target, _ = request_line.split(' ', 2)
+            status, body = self._route(method, target)
+        except ValueError:
+            status, body = 400, {'error': "bad request"}
+        payload = json.dumps(body).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode('latin-1') + payload
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(ScanDaemon().serve_forever())
+    except KeyboardInterrupt:
+        log.info("👋 Daemon stopped.")
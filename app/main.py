@@ -1,59 +1,286 @@
 # app/main.py
+import argparse
 import asyncio
+import multiprocessing
 import time
-from .core.config import settings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from .core.config import ScannerConfig, settings
 from .services.scraper_service import run_scrapers
 from .services.sheets_service import SheetsService
+from .services.price_history_service import PriceHistoryService
+from .services.checkpoint_service import ScanCheckpoint
+from .services.history_store import ScanHistoryStore
+from .services.formula_service import get_formula_strategy
+from .services.sheet_layout import build_table_layouts
+from .services.shard_service import clear_artifacts, load_artifacts, parse_shard, shard_scanners, write_artifact
 from .utils.logger import log
+from .utils.metrics import metrics
+
+async def scrape_with_checkpoint(scanners: List[ScannerConfig], on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    """
+    Scrapes only the scanners without a checkpoint from today, checkpointing each new result
+    as it arrives. `on_result` receives every result (cached or fresh) as soon as it is ready.
+    """
+    checkpoint = ScanCheckpoint()
+    checkpoint.prune()
+    results = [checkpoint.load(scanner) for scanner in scanners]
+    if on_result:
+        for result in results:
+            if result is not None:
+                on_result(result)
+
+    def checkpoint_and_forward(result: Dict[str, Any]):
+        checkpoint.save(result)
+        if on_result:
+            on_result(result)
+
+    pending = [i for i, result in enumerate(results) if result is None]
+    if pending:
+        scraped = await run_scrapers([scanners[i] for i in pending], on_result=checkpoint_and_forward)
+        for i, result in zip(pending, scraped):
+            results[i] = result
+    return results
+
+async def process_results(scraped_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Turns scan results into sheet rows, looking up last month's high/low
+    for all of their symbols in one batch.
+    """
+    price_levels = {}
+    if settings.price_columns == "values":
+        symbols = [row[1] for result in scraped_results if result for row in result.get('data') or []]
+        if symbols:
+            price_levels = await asyncio.to_thread(PriceHistoryService().get_previous_month_high_low, symbols)
+
+    formulas = get_formula_strategy()
+    layouts = {layout.scanner_name: layout for layout in build_table_layouts(settings.scanners)}
+    processed_results = []
+    for result in scraped_results:
+        scanner_name = result['scanner'].name
+        processed_stock_data = []
+        for stock_data in result.get('data') or []:
+            stock_name, symbol, price, volume = stock_data
+            if formulas is None:
+                buy_price, stop_loss = price_levels.get(symbol, ("", ""))
+            else:
+                buy_price, stop_loss = formulas.row_cells(layouts[scanner_name])
+            processed_stock_data.append([stock_name, symbol, price, volume, buy_price, stop_loss, ""])
+        
+        processed_results.append({"scanner_name": scanner_name, "data": processed_stock_data})
+        log.info(f"Processed {len(processed_stock_data)} new stocks for '{scanner_name}'.")
+    return processed_results
+
+def open_sheets() -> SheetsService:
+    """Authenticates, opens the worksheets and prefetches every table (blocking)."""
+    with metrics.span("sheets_setup"):
+        sheets_service = SheetsService()
+        sheets_service.prefetch_tables()
+    return sheets_service
+
+async def write_results(queue: asyncio.Queue, sheets_ready: Awaitable[SheetsService]):
+    """
+    Consumer: writes each scanner's table as soon as its result is queued, then adds
+    the result to the scan history. A None item marks the end of the scan;
+    formatting is applied once at the end.
+    """
+    sheets_service = await sheets_ready
+    history = ScanHistoryStore()
+    while True:
+        result = await queue.get()
+        if result is None:
+            break
+        processed = await process_results([result])
+        with metrics.span("sheets_table", scanner=processed[0]['scanner_name']):
+            await asyncio.to_thread(sheets_service.write_table, processed[0])
+        if settings.sheets_dry_run:
+            continue
+        # Stored after the write, so an interrupted run still sees these symbols as new
+        try:
+            await asyncio.to_thread(history.append, [result])
+        except (OSError, ValueError) as e:
+            log.warning(f"Could not store scan history for {processed[0]['scanner_name']}: {e}")
+    await asyncio.to_thread(sheets_service.format_worksheets)
+    sheets_service.scheduler.log_summary()
+    log.info("✅ Google Sheet update finished successfully!")
+
+async def write_all(results: List[Dict[str, Any]], sheets_ready: Awaitable[SheetsService]):
+    """Writes already-collected scan results through the streaming writer."""
+    queue: asyncio.Queue = asyncio.Queue()
+    for result in results:
+        queue.put_nowait(result)
+    queue.put_nowait(None)
+    await write_results(queue, sheets_ready)
+
+def export_metrics():
+    """Writes this run's JSON report and Prometheus textfile; never fails the run."""
+    try:
+        json_path, prom_path = metrics.export(settings.metrics_dir)
+        log.info(f"📊 Run metrics written to {json_path} and {prom_path}")
+    except OSError as e:
+        log.warning(f"Could not write run metrics: {e}")
+
+def clean_dismissed():
+    """
+    Clean-only mode: drops 'Dismissed' rows from every table without launching a browser.
+    """
+    start_time = time.time()
+    log.info("--- Starting Dismissed Stock Cleanup ---")
+    try:
+        with metrics.span("clean_dismissed"):
+            sheets_service = SheetsService()
+            sheets_service.clean_dismissed_stocks()
+            sheets_service.scheduler.log_summary()
+    finally:
+        export_metrics()
+    log.info(f"\n--- Cleanup Finished in {time.time() - start_time:.2f} seconds ---")
 
 async def main():
     """
     Main asynchronous function to run the automation process.
+    Sheets authentication and the table read run while scanners are scraping,
+    and each table is written as soon as its scanner completes.
     """
     start_time = time.time()
     
     log.info("--- Starting Monthly Stock Scan and Update ---")
-    
-    # 1. Scrape data from all configured scanners
-    scraped_results = await run_scrapers(settings.scanners)
 
-    # 2. Process each scanner result to generate formulas
-    processed_results = []
-    for table_index, result in enumerate(scraped_results):
-        if not (result and result.get('data')):
-            processed_results.append({"scanner_name": result['scanner'].name if result else "Unknown", "data": []})
-            continue
+    queue: asyncio.Queue = asyncio.Queue()
+    sheets_ready = asyncio.create_task(asyncio.to_thread(open_sheets))
+    writer = asyncio.create_task(write_results(queue, sheets_ready))
 
-        processed_stock_data = []
-        for stock_data in result['data']:
-            stock_name, symbol, price, volume = stock_data
-            
-            name_col = 'A' if table_index == 0 else 'J'
-            symbol_col = 'B' if table_index == 0 else 'K'
-            
-            name_cell = f'INDIRECT("{name_col}" & ROW())'
-            symbol_cell = f'INDIRECT("{symbol_col}" & ROW())'
-            
-            high_date_range = f'"high", EOMONTH(TODAY(), -2) + 1, EOMONTH(TODAY(), -1)'
-            low_date_range = f'"low", EOMONTH(TODAY(), -2) + 1, EOMONTH(TODAY(), -1)'
-
-            fetch_high = f'IFERROR(MAX(QUERY(GOOGLEFINANCE("NSE:"&{symbol_cell}, {high_date_range}), "SELECT Col2")), IFERROR(MAX(QUERY(GOOGLEFINANCE("BOM:"&{symbol_cell}, {high_date_range}), "SELECT Col2")), ""))'
-            fetch_low = f'IFERROR(MIN(QUERY(GOOGLEFINANCE("NSE:"&{symbol_cell}, {low_date_range}), "SELECT Col2")), IFERROR(MIN(QUERY(GOOGLEFINANCE("BOM:"&{symbol_cell}, {low_date_range}), "SELECT Col2")), ""))'
-            
-            buy_price_formula = f'=IF(NOT(ISBLANK({name_cell})), {fetch_high}, "")'
-            stop_loss_formula = f'=IF(NOT(ISBLANK({name_cell})), {fetch_low}, "")'
-            
-            processed_stock_data.append([stock_name, symbol, price, volume, buy_price_formula, stop_loss_formula, ""])
-        
-        processed_results.append({"scanner_name": result['scanner'].name, "data": processed_stock_data})
-        log.info(f"Processed {len(processed_stock_data)} new stocks for '{result['scanner'].name}'.")
-
-    # 3. Update Google Sheets (this will now clean and then append)
-    sheets_service = SheetsService()
-    sheets_service.update_scanned_stocks_report(processed_results)
+    # Producer: scrape all configured scanners (reusing today's checkpoints)
+    try:
+        try:
+            with metrics.span("scrape_all"):
+                await scrape_with_checkpoint(settings.scanners, on_result=queue.put_nowait)
+        finally:
+            queue.put_nowait(None)
+        with metrics.span("sheets_drain"):
+            await writer
+    finally:
+        export_metrics()
 
     log.info(f"\n--- Automation Finished in {time.time() - start_time:.2f} seconds ---")
 
+async def scrape_shard(index: int, count: int, directory: Optional[str] = None) -> str:
+    """
+    Shard mode: scrapes this shard's subset of the scanners and writes the results
+    to an artifact for the merge stage. Does not touch Google Sheets.
+    """
+    scanners = shard_scanners(settings.scanners, index, count)
+    log.info(f"--- Shard {index}/{count}: scraping {len(scanners)} of {len(settings.scanners)} scanner(s) ---")
+    with metrics.span("scrape_all", shard=f"{index}/{count}"):
+        results = await scrape_with_checkpoint(scanners)
+    return write_artifact(results, index, count, directory)
+
+def scrape_shard_process(index: int, count: int, directory: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Process-pool entry point: one shard with its own event loop and browser.
+    Returns the artifact path and the shard's metrics report for the parent to merge.
+    """
+    # A pool worker can run more than one shard; each report covers only its own
+    metrics.reset()
+    path = asyncio.run(scrape_shard(index, count, directory))
+    return path, metrics.report()
+
+async def merge_shards(directory: Optional[str] = None):
+    """
+    Merge stage: combines every shard artifact and performs a single Sheets update.
+    """
+    start_time = time.time()
+    log.info("--- Merging Shard Results into Google Sheets ---")
+    try:
+        results = load_artifacts(directory)
+        sheets_ready = asyncio.create_task(asyncio.to_thread(open_sheets))
+        with metrics.span("sheets_drain"):
+            await write_all(results, sheets_ready)
+    finally:
+        export_metrics()
+    log.info(f"\n--- Merge Finished in {time.time() - start_time:.2f} seconds ---")
+
+async def run_sharded(workers: int, directory: Optional[str] = None):
+    """
+    Local sharding: scrapes `workers` shards in separate processes, each with its own
+    browser, then merges their artifacts. Sheets setup overlaps the scrape, as in main().
+    A failed shard is logged and its tables are left unchanged.
+    """
+    start_time = time.time()
+    log.info(f"--- Starting Sharded Scan across {workers} worker process(es) ---")
+    clear_artifacts(directory)
+    sheets_ready = asyncio.create_task(asyncio.to_thread(open_sheets))
+    loop = asyncio.get_running_loop()
+    try:
+        # spawn, not fork: the Sheets setup thread is already running in this process
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            with metrics.span("scrape_all", workers=workers):
+                outcomes = await asyncio.gather(
+                    *[loop.run_in_executor(pool, scrape_shard_process, i, workers, directory) for i in range(workers)],
+                    return_exceptions=True,
+                )
+        for i, outcome in enumerate(outcomes):
+            if isinstance(outcome, BaseException):
+                metrics.incr("shard_failures")
+                log.error(f"❌ Shard {i}/{workers} failed: {outcome}")
+            else:
+                metrics.merge(outcome[1], shard=f"{i}/{workers}")
+
+        results = load_artifacts(directory)
+        with metrics.span("sheets_drain"):
+            await write_all(results, sheets_ready)
+    finally:
+        export_metrics()
+
+    log.info(f"\n--- Sharded Automation Finished in {time.time() - start_time:.2f} seconds ---")
+
+def _shard_arg(value: str):
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def _positive_int(value: str) -> int:
+    if not value.isdigit() or int(value) < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value!r}")
+    return int(value)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Scrape ChartInk scanners into Google Sheets.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        '--clean-dismissed', action='store_true',
+        help="Only remove rows marked 'Dismissed' from the sheet; skips scraping entirely."
+    )
+    mode.add_argument(
+        '--shard', type=_shard_arg, metavar='i/N',
+        help="Scrape only shard i (0-based) of N and write its results to an artifact; skips Sheets."
+    )
+    mode.add_argument(
+        '--merge', action='store_true',
+        help="Combine the shard artifacts and update the sheet once."
+    )
+    mode.add_argument(
+        '--workers', type=_positive_int, metavar='K',
+        help="Scrape K shards in parallel processes, then merge them."
+    )
+    parser.add_argument(
+        '--artifact-dir', default=None,
+        help=f"Directory for shard artifacts (default: {settings.shard_artifact_dir})."
+    )
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    # No longer need argparse, we can run the main function directly
-    asyncio.run(main())
\ No newline at end of file
+    args = parse_args()
+    if args.clean_dismissed:
+        clean_dismissed()
+    elif args.shard:
+        try:
+            asyncio.run(scrape_shard(*args.shard, directory=args.artifact_dir))
+        finally:
+            export_metrics()
+    elif args.merge:
+        asyncio.run(merge_shards(args.artifact_dir))
+    elif args.workers:
+        asyncio.run(run_sharded(args.workers, args.artifact_dir))
+    else:
+        asyncio.run(main())
@@ -0,0 +1,123 @@
+# app/services/browser_pool.py
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+from playwright.async_api import Browser, BrowserContext, Route
+from ..core.config import settings
+from .proxy_pool import ProxyPool
+from ..utils.logger import log
+
+class BlockedResourceStats:
+    """Counts requests blocked for a single scan and estimates the bytes saved."""
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+
+    def record(self, resource_type: str):
+        estimates = settings.blocked_resource_size_estimates
+        self.requests += 1
+        self.bytes += estimates.get(resource_type, estimates.get('other', 0))
+
+class PooledContext:
+    """A browser context on loan from the pool, with stats for the current scan."""
+    def __init__(self, context: BrowserContext, proxy: Optional[str] = None):
+        self.context = context
+        self.proxy = proxy
+        self.stats = BlockedResourceStats()
+
+    async def handle_route(self, route: Route):
+        request = route.request
+        url = request.url.lower()
+        if request.resource_type in settings.blocked_resource_types or any(k in url for k in settings.blocked_url_keywords):
+            self.stats.record(request.resource_type)
+            await route.abort()
+        else:
+            await route.continue_()
+
+class BrowserContextPool:
+    """
+    A bounded pool of reusable browser contexts.
+    Contexts are created lazily up to `size`, keep their cookies between scans,
+    and block resource types the scraper does not need. With a proxy pool, each
+    context is pinned to one proxy and replaced when that proxy's circuit opens.
+    """
+    def __init__(self, browser: Browser, size: int = None, proxy_pool: Optional[ProxyPool] = None):
+        self.browser = browser
+        self.size = size or settings.max_concurrent_scans
+        self.proxy_pool = proxy_pool
+        self._idle: List[PooledContext] = []
+        self._contexts: List[PooledContext] = []
+        self._reserved = 0
+        self._available = asyncio.Condition()
+
+    @asynccontextmanager
+    async def acquire(self, label: str = "scan") -> AsyncIterator[PooledContext]:
+        """
+        Leases a context for one scan, waiting if all contexts are busy.
+        """
+        pooled = await self._checkout()
+        pooled.stats = BlockedResourceStats()
+        healthy = True
+        try:
+            yield pooled
+            if pooled.proxy:
+                self.proxy_pool.record_success(pooled.proxy)
+        except Exception:
+            if pooled.proxy:
+                self.proxy_pool.record_failure(pooled.proxy)
+                healthy = not self.proxy_pool.stats[pooled.proxy].is_open(self.proxy_pool.clock())
+            raise
+        finally:
+            log.info(
+                f"🧱 {label}: blocked {pooled.stats.requests} requests "
+                f"(~{pooled.stats.bytes / 1024:.0f} KB saved)"
+            )
+            if healthy:
+                await self._checkin(pooled)
+            else:
+                await self._discard(pooled)
+
+    async def _checkout(self) -> PooledContext:
+        async with self._available:
+            while not self._idle and self._reserved >= self.size:
+                await self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            # Reserve the slot before awaiting so concurrent callers cannot overshoot
+            self._reserved += 1
+
+        try:
+            proxy = self.proxy_pool.acquire() if self.proxy_pool else None
+            options = {"proxy": ProxyPool.playwright_proxy(proxy)} if proxy else {}
+            context = await self.browser.new_context(**options)
+            pooled = PooledContext(context, proxy)
+            await context.route("**/*", pooled.handle_route)
+        except BaseException:
+            async with self._available:
+                self._reserved -= 1
+                self._available.notify()
+            raise
+        self._contexts.append(pooled)
+        return pooled
+
+    async def _checkin(self, pooled: PooledContext):
+        async with self._available:
+            self._idle.append(pooled)
+            self._available.notify()
+
+    async def _discard(self, pooled: PooledContext):
+        log.info(f"♻️ Retiring browser context pinned to failing proxy {pooled.proxy}.")
+        self._contexts.remove(pooled)
+        try:
+            await pooled.context.close()
+        finally:
+            async with self._available:
+                self._reserved -= 1
+                self._available.notify()
+
+    async def close(self):
+        for pooled in self._contexts:
+            await pooled.context.close()
+        self._contexts.clear()
+        self._idle.clear()
+        self._reserved = 0
@@ -0,0 +1,57 @@
+# app/services/checkpoint_service.py
+import hashlib
+import json
+import os
+import shutil
+from datetime import date
+from typing import Any, Dict, Optional
+from ..core.config import ScannerConfig, settings
+from ..utils.logger import log
+
+class ScanCheckpoint:
+    """
+    Stores scraped results per scanner URL and date, so a rerun on the same day
+    (e.g. after a Sheets failure) reuses them instead of scraping again.
+    """
+    def __init__(self, directory: Optional[str] = None, today: Optional[date] = None):
+        self.directory = directory or settings.checkpoint_dir
+        self.today = (today or date.today()).isoformat()
+
+    def _path(self, scanner: ScannerConfig) -> str:
+        key = hashlib.sha1(scanner.url.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, self.today, f"{key}.json")
+
+    def load(self, scanner: ScannerConfig) -> Optional[Dict[str, Any]]:
+        path = self._path(scanner)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding='utf-8') as f:
+                saved = json.load(f)
+            result = {"scanner": scanner, "headers": saved['headers'], "data": saved['data']}
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            # Scraping again is the safe fallback for a half-written checkpoint
+            log.warning(f"Ignoring unreadable checkpoint for {scanner.name} ({path}): {e}")
+            return None
+        log.info(f"♻️ Reusing today's checkpoint for {scanner.name} ({len(result['data'])} rows).")
+        return result
+
+    def save(self, result: Dict[str, Any]):
+        """Checkpoints a scan result; empty results are not saved so they are retried."""
+        if not (result and result.get('data')):
+            return
+        scanner = result['scanner']
+        path = self._path(scanner)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"scanner_url": scanner.url, "headers": result['headers'], "data": result['data']}, f)
+        os.replace(tmp_path, path)
+
+    def prune(self):
+        """Removes checkpoints from previous days."""
+        if not os.path.isdir(self.directory):
+            return
+        for entry in os.listdir(self.directory):
+            if entry != self.today:
+                shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
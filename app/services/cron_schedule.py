@@ -0,0 +1,70 @@
+# app/services/cron_schedule.py
+from datetime import date, datetime, time, timedelta
+from typing import List
+
+class CronSchedule:
+    """
+    A standard five-field cron expression (minute hour day-of-month month day-of-week)
+    with *, lists, ranges and steps. As in cron, when both day fields are restricted
+    a day matching either of them fires; Sunday is 0 or 7.
+    """
+    FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression needs 5 fields, got {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, days, months, weekdays = (
+            self._parse(part, low, high, expression) for part, (low, high) in zip(parts, self.FIELDS)
+        )
+        self.days, self.months = set(days), set(months)
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day, self.any_weekday = parts[2] == '*', parts[4] == '*'
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int, expression: str) -> List[int]:
+        values = set()
+        for part in field.split(','):
+            spec, slash, step = part.partition('/')
+            try:
+                step = int(step) if slash else 1
+                if spec == '*':
+                    start, end = low, high
+                elif '-' in spec:
+                    start, end = (int(value) for value in spec.split('-'))
+                else:
+                    start = int(spec)
+                    end = high if slash else start
+            except ValueError:
+                raise ValueError(f"Invalid cron field {field!r} in {expression!r}")
+            if step < 1 or not low <= start <= end <= high:
+                raise ValueError(f"Cron field {field!r} is out of range in {expression!r}")
+            values.update(range(start, end + 1, step))
+        return sorted(values)
+
+    def _day_matches(self, day: date) -> bool:
+        day_of_month = day.day in self.days
+        day_of_week = day.isoweekday() % 7 in self.weekdays
+        if self.any_day and self.any_weekday:
+            return True
+        if self.any_day:
+            return day_of_week
+        if self.any_weekday:
+            return day_of_month
+        return day_of_month or day_of_week
+
+    def next_after(self, moment: datetime) -> datetime:
+        """The first matching minute strictly after `moment`, in the same timezone."""
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        # Five years covers schedules that only fire on February 29th
+        for _ in range(366 * 5):
+            if day.month in self.months and self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = datetime.combine(day, time(hour, minute), tzinfo=moment.tzinfo)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"Cron expression {self.expression!r} never fires")
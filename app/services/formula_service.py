@@ -0,0 +1,129 @@
+# app/services/formula_service.py
+from datetime import date
+from typing import Dict, Optional, Tuple
+import pandas as pd
+from ..core.config import settings
+from .sheet_layout import TableLayout
+
+# Column offsets inside a table: Stock Name, Symbol, ..., Buying Price, Stoploss
+NAME_OFFSET = 0
+SYMBOL_OFFSET = 1
+BUY_OFFSET = 4
+STOP_OFFSET = 5
+
+def previous_month_bounds(today: Optional[date] = None) -> Tuple[date, date]:
+    """First and last day of the previous calendar month."""
+    month = pd.Period(today or date.today(), freq='M') - 1
+    return month.start_time.date(), month.end_time.date()
+
+def _date_literal(day: date) -> str:
+    return f"DATE({day.year}, {day.month}, {day.day})"
+
+def _level(symbol: str, aggregate: str, attribute: str, start: str, end: str) -> str:
+    """High or low of `symbol` between two dates on NSE, falling back to BSE, else blank."""
+    lookups = [
+        f'{aggregate}(INDEX(GOOGLEFINANCE("{exchange}:"&{symbol}, {attribute}, {start}, {end}), 0, 2))'
+        for exchange in ("NSE", "BOM")
+    ]
+    return f'IFERROR({lookups[0]}, IFERROR({lookups[1]}, ""))'
+
+class FormulaStrategy:
+    """
+    Decides what goes into the Buying Price and Stoploss columns.
+    `row_cells` fills those cells on every data row; `header_cells` puts formulas
+    into the header row that fill the whole column on their own.
+    """
+    name = ""
+
+    def row_cells(self, layout: TableLayout) -> Tuple[str, str]:
+        return "", ""
+
+    def header_cells(self, layout: TableLayout) -> Dict[int, str]:
+        return {}
+
+class PerRowFormulas(FormulaStrategy):
+    """
+    The original mode: a full GOOGLEFINANCE formula on every row. Uses volatile
+    INDIRECT/TODAY, so every edit recalculates every lookup.
+    """
+    name = "per_row"
+
+    def row_cells(self, layout: TableLayout) -> Tuple[str, str]:
+        name_col = layout.col_char_at(NAME_OFFSET)
+        symbol_col = layout.col_char_at(SYMBOL_OFFSET)
+
+        name_cell = f'INDIRECT("{name_col}" & ROW())'
+        symbol_cell = f'INDIRECT("{symbol_col}" & ROW())'
+
+        high_date_range = f'"high", EOMONTH(TODAY(), -2) + 1, EOMONTH(TODAY(), -1)'
+        low_date_range = f'"low", EOMONTH(TODAY(), -2) + 1, EOMONTH(TODAY(), -1)'
+
+        fetch_high = f'IFERROR(MAX(QUERY(GOOGLEFINANCE("NSE:"&{symbol_cell}, {high_date_range}), "SELECT Col2")), IFERROR(MAX(QUERY(GOOGLEFINANCE("BOM:"&{symbol_cell}, {high_date_range}), "SELECT Col2")), ""))'
+        fetch_low = f'IFERROR(MIN(QUERY(GOOGLEFINANCE("NSE:"&{symbol_cell}, {low_date_range}), "SELECT Col2")), IFERROR(MIN(QUERY(GOOGLEFINANCE("BOM:"&{symbol_cell}, {low_date_range}), "SELECT Col2")), ""))'
+
+        buy_price_formula = f'=IF(NOT(ISBLANK({name_cell})), {fetch_high}, "")'
+        stop_loss_formula = f'=IF(NOT(ISBLANK({name_cell})), {fetch_low}, "")'
+        return buy_price_formula, stop_loss_formula
+
+class ArrayFormulas(FormulaStrategy):
+    """
+    One BYROW formula per column, in the header cell, covering every data row.
+    Dates are literals for the previous month, so nothing is volatile; the two
+    formulas only change (and are rewritten) when the month rolls over.
+    """
+    name = "array"
+
+    def __init__(self, today: Optional[date] = None):
+        self.start, self.end = previous_month_bounds(today)
+
+    def _symbols(self, layout: TableLayout) -> str:
+        symbol_col = layout.col_char_at(SYMBOL_OFFSET)
+        # Open-ended, so the formula keeps covering the table as the grid grows
+        return f"{symbol_col}{settings.data_start_row}:{symbol_col}"
+
+    def _lookup(self, attribute: str) -> str:
+        aggregate = "MAX" if attribute == "high" else "MIN"
+        return _level("s", aggregate, f'"{attribute}"', _date_literal(self.start), _date_literal(self.end))
+
+    def header_cells(self, layout: TableLayout) -> Dict[int, str]:
+        cells = {}
+        for offset, attribute in ((BUY_OFFSET, "high"), (STOP_OFFSET, "low")):
+            cells[offset] = (
+                f'={{"{layout.headers[offset]}"; '
+                f'BYROW({self._symbols(layout)}, LAMBDA(s, IF(s = "", "", {self._lookup(attribute)})))}}'
+            )
+        return cells
+
+class NamedFunctionFormulas(ArrayFormulas):
+    """
+    Like ArrayFormulas, but the lookup lives in a sheet-level named function so the
+    header formulas stay a few dozen characters long. The Sheets API cannot create
+    named functions: add it once under Data > Named functions using `definition()`.
+    """
+    name = "named_function"
+
+    def __init__(self, function_name: Optional[str] = None, today: Optional[date] = None):
+        super().__init__(today)
+        self.function_name = function_name or settings.formula_named_function
+
+    def _lookup(self, attribute: str) -> str:
+        return f'{self.function_name}(s, "{attribute}", {_date_literal(self.start)}, {_date_literal(self.end)})'
+
+    @staticmethod
+    def definition() -> str:
+        """Formula definition for the named function, with arguments symbol, attribute, start_date, end_date."""
+        high = _level("symbol", "MAX", "attribute", "start_date", "end_date")
+        low = _level("symbol", "MIN", "attribute", "start_date", "end_date")
+        return f'=IF(symbol = "", "", IF(attribute = "high", {high}, {low}))'
+
+STRATEGIES = {strategy.name: strategy for strategy in (PerRowFormulas, ArrayFormulas, NamedFunctionFormulas)}
+
+def get_formula_strategy(name: Optional[str] = None) -> Optional[FormulaStrategy]:
+    """
+    The configured strategy, or None when the price columns hold plain values.
+    """
+    if name is None:
+        if settings.price_columns != "formulas":
+            return None
+        name = settings.formula_strategy
+    return STRATEGIES[name]()
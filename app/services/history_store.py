@@ -0,0 +1,151 @@
+# app/services/history_store.py
+import argparse
+import glob
+import os
+import re
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+import pandas as pd
+from ..core.config import settings
+from ..utils.logger import log
+
+INDEX_COLUMNS = ['scanner', 'symbol', 'month', 'first_seen', 'last_seen', 'days']
+
+def _slug(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'scanner'
+
+def _numeric(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(values.astype(str).str.replace(',', '', regex=False), errors='coerce')
+
+def _write_parquet(frame: pd.DataFrame, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frame.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+
+class ScanHistoryStore:
+    """
+    Local history of every scan, as Parquet files partitioned by scanner and month:
+    `<dir>/scanner=<slug>/month=YYYY-MM/<YYYY-MM-DD>.parquet`, one file per scan day.
+    A symbol index (one row per scanner, symbol and month) answers membership and
+    history questions without opening the partitions.
+    """
+    INDEX_FILE = "symbol_index.parquet"
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or settings.history_dir
+        self.index = self._load_index()
+
+    def _load_index(self) -> pd.DataFrame:
+        path = os.path.join(self.directory, self.INDEX_FILE)
+        if not os.path.exists(path):
+            return pd.DataFrame({column: pd.Series(dtype='int64' if column == 'days' else 'object') for column in INDEX_COLUMNS})
+        return pd.read_parquet(path)
+
+    def _partition_dir(self, scanner: str, month: str) -> str:
+        return os.path.join(self.directory, f"scanner={_slug(scanner)}", f"month={month}")
+
+    def append(self, results: Iterable[Dict[str, Any]], scanned_on: Optional[date] = None) -> int:
+        """
+        Stores scan results as the snapshot for `scanned_on` (default today) and updates
+        the index. A same-day rerun replaces that day's snapshot. Returns the rows stored.
+        """
+        scanned_on = scanned_on or date.today()
+        month = scanned_on.strftime('%Y-%m')
+        stored = 0
+        for result in results:
+            rows = [row[:4] for row in (result or {}).get('data') or [] if len(row) > 1 and row[1]]
+            if not rows:
+                continue
+            scanner = result['scanner'].name
+            frame = pd.DataFrame(rows, columns=['name', 'symbol', 'price', 'volume']).drop_duplicates('symbol')
+            frame['price'] = _numeric(frame['price'])
+            frame['volume'] = _numeric(frame['volume'])
+            frame.insert(0, 'scanned_on', scanned_on.isoformat())
+            frame.insert(1, 'scanner', scanner)
+            _write_parquet(frame, os.path.join(self._partition_dir(scanner, month), f"{scanned_on.isoformat()}.parquet"))
+            self._reindex(scanner, month)
+            stored += len(frame)
+        if stored:
+            _write_parquet(self.index, os.path.join(self.directory, self.INDEX_FILE))
+            log.info(f"🗄️ Stored {stored} scanned row(s) for {scanned_on.isoformat()} in {self.directory}.")
+        return stored
+
+    def _reindex(self, scanner: str, month: str):
+        """Rebuilds the index rows of one scanner/month partition from its day files."""
+        paths = glob.glob(os.path.join(self._partition_dir(scanner, month), "*.parquet"))
+        days = pd.concat([pd.read_parquet(path, columns=['scanned_on', 'symbol']) for path in paths])
+        entries = days.groupby('symbol')['scanned_on'].agg(first_seen='min', last_seen='max', days='nunique').reset_index()
+        entries.insert(0, 'scanner', scanner)
+        entries.insert(2, 'month', month)
+        kept = self.index[~((self.index['scanner'] == scanner) & (self.index['month'] == month))]
+        self.index = pd.concat([kept, entries[INDEX_COLUMNS]], ignore_index=True) if len(kept) else entries[INDEX_COLUMNS]
+
+    def _entries(self, symbol: Optional[str] = None, scanner: Optional[str] = None, month: Optional[str] = None) -> pd.DataFrame:
+        mask = pd.Series(True, index=self.index.index)
+        for column, value in (('symbol', symbol), ('scanner', scanner), ('month', month)):
+            if value is not None:
+                mask &= self.index[column] == value
+        return self.index[mask]
+
+    def has_scanner(self, scanner: str) -> bool:
+        return bool((self.index['scanner'] == scanner).any())
+
+    def contains(self, symbol: str, scanner: Optional[str] = None, month: Optional[str] = None) -> bool:
+        """Whether `symbol` was ever scanned (optionally by one scanner, in one month)."""
+        return not self._entries(symbol, scanner, month).empty
+
+    def months_seen(self, symbol: str, scanner: Optional[str] = None) -> List[str]:
+        """Months (YYYY-MM) in which `symbol` appeared, e.g. to count months in the IPO scanner."""
+        return sorted(self._entries(symbol, scanner)['month'].unique())
+
+    def symbols(self, scanner: Optional[str] = None, month: Optional[str] = None) -> List[str]:
+        return sorted(self._entries(scanner=scanner, month=month)['symbol'].unique())
+
+    def entered(self, month: str, scanner: Optional[str] = None) -> List[str]:
+        """Symbols whose first appearance in a scanner (or in `scanner`) falls in `month`."""
+        entries = self._entries(scanner=scanner)
+        first_months = entries.groupby(['scanner', 'symbol'])['month'].min()
+        return sorted(first_months[first_months == month].index.get_level_values('symbol').unique())
+
+    def unseen(self, scanner: str, symbols: Iterable[str]) -> List[str]:
+        """The given symbols that `scanner` has never returned before, in input order."""
+        seen = set(self._entries(scanner=scanner)['symbol'])
+        return [symbol for symbol in dict.fromkeys(symbols) if symbol not in seen]
+
+    def history(self, symbol: str, scanner: Optional[str] = None) -> pd.DataFrame:
+        """Every stored row for `symbol`, reading only the partitions the index points to."""
+        frames = []
+        for (scanner_name, month), _ in self._entries(symbol, scanner).groupby(['scanner', 'month']):
+            for path in sorted(glob.glob(os.path.join(self._partition_dir(scanner_name, month), "*.parquet"))):
+                frame = pd.read_parquet(path, filters=[('symbol', '==', symbol)])
+                frames.append(frame[frame['scanner'] == scanner_name])
+        if not frames:
+            return pd.DataFrame(columns=['scanned_on', 'scanner', 'name', 'symbol', 'price', 'volume'])
+        return pd.concat(frames, ignore_index=True).sort_values(['scanned_on', 'scanner'], ignore_index=True)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Query the local scan history.")
+    parser.add_argument('--dir', default=None, help=f"History directory (default: {settings.history_dir}).")
+    commands = parser.add_subparsers(dest='command', required=True)
+    months = commands.add_parser('months', help="Months in which a symbol appeared.")
+    months.add_argument('symbol')
+    months.add_argument('--scanner')
+    entered = commands.add_parser('entered', help="Symbols that first appeared in a month.")
+    entered.add_argument('--month', default=date.today().strftime('%Y-%m'))
+    entered.add_argument('--scanner')
+    history = commands.add_parser('history', help="Every stored row for a symbol.")
+    history.add_argument('symbol')
+    history.add_argument('--scanner')
+    args = parser.parse_args(argv)
+
+    store = ScanHistoryStore(args.dir)
+    if args.command == 'months':
+        seen = store.months_seen(args.symbol, args.scanner)
+        print(f"{args.symbol}: {len(seen)} month(s){': ' + ', '.join(seen) if seen else ''}")
+    elif args.command == 'entered':
+        print("\n".join(store.entered(args.month, args.scanner)))
+    else:
+        print(store.history(args.symbol, args.scanner).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# app/services/http_scan_service.py
+import asyncio
+import html
+import json
+import re
+from typing import Dict, Any, List, Optional
+from urllib.parse import urljoin
+import requests
+from ..core.config import ScannerConfig, settings
+from .proxy_pool import ProxyPool
+from ..utils.logger import log
+from ..utils.metrics import metrics
+
+class HttpScanError(Exception):
+    """Raised when a scan cannot be completed over plain HTTP."""
+
+class HttpScanService:
+    """
+    Runs ChartInk scans without a browser by posting the screener's scan clause
+    directly to the scan-processing endpoint.
+    """
+    PROCESS_PATH = "/screener/process"
+    USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0"
+
+    CSRF_PATTERN = re.compile(r'<meta\s+name="csrf-token"\s+content="([^"]+)"', re.IGNORECASE)
+    SCAN_CLAUSE_PATTERNS = [
+        re.compile(r'<textarea[^>]*(?:name|id)="scan_clause"[^>]*>(.*?)</textarea>', re.IGNORECASE | re.DOTALL),
+        re.compile(r'<input[^>]*name="scan_clause"[^>]*value="([^"]*)"', re.IGNORECASE),
+        re.compile(r'"scan_clause"\s*:\s*"((?:[^"\\]|\\.)*)"'),
+    ]
+
+    def __init__(self, timeout_seconds: Optional[int] = None, proxy_pool: Optional[ProxyPool] = None):
+        self.timeout_seconds = timeout_seconds or settings.http_timeout_seconds
+        self.proxy_pool = proxy_pool
+
+    async def scrape_single_url(self, scanner: ScannerConfig) -> Optional[Dict[str, Any]]:
+        """
+        Scrapes a ChartInk screener over HTTP.
+        Returns None on failure so the caller can fall back to Playwright.
+        """
+        log.info(f"🌐 Starting HTTP scan for: {scanner.name} ({scanner.url})")
+        try:
+            with metrics.span("http_scan", scanner=scanner.name):
+                rows = await asyncio.to_thread(self._run_scan, scanner.url)
+        except Exception as e:
+            log.warning(f"⚠️ HTTP scan failed for {scanner.name}: {e}")
+            return None
+
+        log.info(f"✅ Successfully fetched {len(rows)} entries over HTTP from {scanner.name}")
+        return {"scanner": scanner, "headers": settings.table_headers, "data": rows}
+
+    def _run_scan(self, url: str) -> List[List[str]]:
+        proxy = self.proxy_pool.acquire() if self.proxy_pool else None
+        try:
+            rows = self._fetch_rows(url, proxy)
+        except Exception:
+            if proxy:
+                self.proxy_pool.record_failure(proxy)
+            raise
+        if proxy:
+            self.proxy_pool.record_success(proxy)
+        return rows
+
+    def _fetch_rows(self, url: str, proxy: Optional[str]) -> List[List[str]]:
+        with requests.Session() as session:
+            session.headers.update({"User-Agent": self.USER_AGENT})
+            if proxy:
+                session.proxies.update(ProxyPool.requests_proxies(proxy))
+
+            page = session.get(url, timeout=self.timeout_seconds)
+            page.raise_for_status()
+            csrf_token = self._extract_csrf_token(page.text)
+            scan_clause = self._extract_scan_clause(page.text)
+
+            response = session.post(
+                urljoin(url, self.PROCESS_PATH),
+                data={"scan_clause": scan_clause},
+                headers={
+                    "X-CSRF-TOKEN": csrf_token,
+                    "X-Requested-With": "XMLHttpRequest",
+                    "Referer": url,
+                },
+                timeout=self.timeout_seconds,
+            )
+            response.raise_for_status()
+            payload = response.json()
+            metrics.incr("http_requests", 2)
+            metrics.incr("http_response_bytes", len(page.content) + len(response.content))
+
+        if "data" not in payload:
+            raise HttpScanError(f"Unexpected scan response keys: {sorted(payload)}")
+        return [self._to_row(record) for record in payload["data"]]
+
+    def _extract_csrf_token(self, page_html: str) -> str:
+        match = self.CSRF_PATTERN.search(page_html)
+        if not match:
+            raise HttpScanError("CSRF token not found on screener page.")
+        return match.group(1)
+
+    def _extract_scan_clause(self, page_html: str) -> str:
+        for pattern in self.SCAN_CLAUSE_PATTERNS:
+            match = pattern.search(page_html)
+            if match and match.group(1).strip():
+                clause = match.group(1)
+                if pattern.pattern.startswith('"scan_clause"'):
+                    # JSON-encoded value: undo backslash escapes
+                    clause = json.loads(f'"{clause}"')
+                return html.unescape(clause).strip()
+        raise HttpScanError("Scan clause not found on screener page.")
+
+    @staticmethod
+    def _to_row(record: Dict[str, Any]) -> List[str]:
+        # Same column order as the Playwright table extraction: Stock Name, Symbol, Price, Volume
+        return [
+            str(record.get("name", "")),
+            str(record.get("nsecode") or record.get("bsecode") or ""),
+            str(record.get("close", "")),
+            str(record.get("volume", "")),
+        ]
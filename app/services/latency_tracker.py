@@ -0,0 +1,71 @@
+# app/services/latency_tracker.py
+import json
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+from ..core.config import settings
+from ..utils.logger import log
+
+class LatencyTracker:
+    """
+    Recent successful scrape durations per scanner, persisted between runs.
+    Each scanner's p95 sets when a slow attempt is hedged and when it is abandoned.
+    Several processes (shard workers) may share the file; each save merges its new
+    samples into what is on disk instead of overwriting it.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.scan_latency_path
+        self.samples: Dict[str, List[float]] = self._read()
+        self._unsaved: Dict[str, List[float]] = {}
+
+    def _read(self) -> Dict[str, List[float]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return dict(json.load(f))
+        except (OSError, ValueError, TypeError) as e:
+            # Only a timing hint: scans fall back to the fixed budget until history builds up again
+            log.warning(f"Ignoring unreadable scan latencies in {self.path}: {e}")
+            return {}
+
+    def record(self, scanner_name: str, seconds: float):
+        for samples in (self.samples.setdefault(scanner_name, []), self._unsaved.setdefault(scanner_name, [])):
+            samples.append(round(seconds, 3))
+            del samples[:-settings.scan_latency_window]
+
+    def p95(self, scanner_name: str) -> Optional[float]:
+        """Nearest-rank 95th percentile, or None until there are enough samples."""
+        samples = sorted(self.samples.get(scanner_name, []))
+        if len(samples) < settings.scan_latency_min_samples:
+            return None
+        return samples[math.ceil(0.95 * len(samples)) - 1]
+
+    def budget(self, scanner_name: str) -> Tuple[float, float]:
+        """
+        (hedge_after, timeout) in seconds for one attempt. Without history the attempt
+        gets the fixed `scan_timeout_seconds` and is hedged halfway through it.
+        """
+        p95 = self.p95(scanner_name)
+        if p95 is None:
+            timeout = float(settings.scan_timeout_seconds)
+            return timeout / 2, timeout
+        timeout = min(max(p95 * settings.scan_timeout_p95_factor, settings.scan_timeout_min_seconds), settings.scan_timeout_max_seconds)
+        hedge_after = min(max(p95, settings.scan_hedge_min_seconds), timeout / 2)
+        return hedge_after, timeout
+
+    def save(self):
+        """Adds the samples recorded since the last save to the file's current contents."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        merged = self._read()
+        for scanner_name, new_samples in self._unsaved.items():
+            samples = merged.setdefault(scanner_name, [])
+            samples.extend(new_samples)
+            del samples[:-settings.scan_latency_window]
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(merged, f)
+        os.replace(tmp_path, self.path)
+        self.samples, self._unsaved = merged, {}
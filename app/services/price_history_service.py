@@ -1,54 +1,156 @@
-# # app/services/price_history_service.py
-# import yfinance as yf
-# import requests
-# from typing import Tuple, Optional
-# from ..utils.logger import log
-# import time
-
-# class PriceHistoryService:
-#     """
-#     Fetches historical stock data using a robust yfinance approach.
-#     """
-#     def get_last_month_ohl(self, symbol: str) -> Optional[Tuple[float, float]]:
-#         """
-#         Gets the previous full calendar month's high and low for a given stock symbol.
-#         It uses yf.Ticker().history() and includes an enhanced retry mechanism for CI/CD environments.
-#         """
-#         cleaned_symbol = symbol.replace('&', '-').upper()
-#         ticker_symbol = f"{cleaned_symbol}.NS"
-        
-#         # Enhanced retry logic for cloud environments
-#         max_attempts = 4
-#         initial_delay_seconds = 5
-
-#         for attempt in range(max_attempts):
-#             try:
-#                 # Let yfinance handle its own session management
-#                 ticker = yf.Ticker(ticker_symbol)
-                
-#                 # Fetch the last 2 months of data on a monthly interval.
-#                 hist = ticker.history(period="2mo", interval="1mo")
-                
-#                 if not hist.empty and len(hist) >= 2:
-#                     # The previous month's data is the second to last row
-#                     last_month_data = hist.iloc[-2]
-#                     high = round(last_month_data['High'], 2)
-#                     low = round(last_month_data['Low'], 2)
-#                     log.info(f"✅ [Attempt {attempt + 1}] Fetched H/L for {ticker_symbol}: High={high}, Low={low}")
-#                     return high, low
-#                 elif not hist.empty:
-#                     log.warning(f"⚠️ [Attempt {attempt + 1}] Only one month of data returned for {ticker_symbol}.")
-#                 else:
-#                     log.warning(f"⚠️ [Attempt {attempt + 1}] No historical data returned for {ticker_symbol}.")
-            
-#             except Exception as e:
-#                 log.error(f"❌ Error fetching data for {ticker_symbol} on attempt {attempt + 1}. Reason: {e}")
-
-#             # If it's not the last attempt, wait before retrying
-#             if attempt < max_attempts - 1:
-#                 delay = initial_delay_seconds * (attempt + 1) # Increasing delay (5s, 10s, 15s)
-#                 log.info(f"Retrying for {ticker_symbol} in {delay} seconds...")
-#                 time.sleep(delay)
-
-#         log.error(f"❌ All {max_attempts} attempts failed for {ticker_symbol}. Could not retrieve OHLC data.")
-#         return None
\ No newline at end of file
+# app/services/price_history_service.py
+import json
+import os
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+import yfinance as yf
+from ..core.config import settings
+from ..utils.logger import log
+from ..utils.metrics import metrics
+
+class YFinanceProvider:
+    """
+    Downloads daily OHLC data for many tickers in one bulk request.
+    """
+    def fetch_daily(self, tickers: List[str], start: date, end: date) -> pd.DataFrame:
+        """
+        Returns daily bars indexed by date, with (field, ticker) column pairs
+        such as ('High', 'RELIANCE.NS'). `end` is inclusive.
+        """
+        frame = yf.download(
+            tickers, start=start.isoformat(), end=(end + timedelta(days=1)).isoformat(),
+            interval='1d', group_by='column', auto_adjust=False, progress=False, threads=True
+        )
+        if not isinstance(frame.columns, pd.MultiIndex):
+            # Single-ticker downloads come back with flat columns
+            frame.columns = pd.MultiIndex.from_product([frame.columns, tickers])
+        return frame
+
+def monthly_high_low(daily: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Resamples daily bars to calendar months for every ticker at once.
+    Returns (highs, lows), each indexed by month start with one column per ticker.
+    """
+    daily = daily.copy()
+    daily.index = pd.to_datetime(daily.index)
+    highs = daily['High'].resample('MS').max()
+    lows = daily['Low'].resample('MS').min()
+    return highs, lows
+
+class PriceHistoryService:
+    """
+    Batch engine for monthly high/low prices.
+    Results are cached on disk per month and symbol, so later runs only fetch what is missing.
+    """
+    EXCHANGE_SUFFIXES = [".NS", ".BO"]  # NSE first, then BSE
+
+    def __init__(self, provider=None, cache_dir: Optional[str] = None):
+        self.provider = provider or YFinanceProvider()
+        self.cache_dir = cache_dir or settings.price_cache_dir
+
+    def get_previous_month_high_low(self, symbols: Iterable[str], today: Optional[date] = None) -> Dict[str, Tuple[float, float]]:
+        """
+        Gets the previous full calendar month's high and low for every symbol.
+        Symbols without data on either exchange are left out of the result.
+        """
+        today = today or date.today()
+        previous_month = (pd.Period(today, freq='M') - 1)
+        return self.get_monthly_high_low(symbols, [previous_month])[str(previous_month)]
+
+    def get_monthly_high_low(self, symbols: Iterable[str], months: List[pd.Period]) -> Dict[str, Dict[str, Tuple[float, float]]]:
+        """
+        Returns {'YYYY-MM': {symbol: (high, low)}} for the requested complete months,
+        downloading only the symbol/month pairs that are not cached yet.
+        """
+        symbols = list(dict.fromkeys(s for s in symbols if s))
+        cache = {str(month): self._load_month(month) for month in months}
+        missing = [s for s in symbols if any(s not in cache[str(month)] for month in months)]
+
+        if missing:
+            missing_months = [m for m in months if any(s not in cache[str(m)] for s in missing)]
+            log.info(f"📈 Fetching price history for {len(missing)} symbol(s) over {len(missing_months)} month(s); {len(symbols) - len(missing)} cached.")
+            fetched = self._fetch(missing, min(missing_months).start_time.date(), max(missing_months).end_time.date())
+            for month in missing_months:
+                key = str(month)
+                new_entries = {s: v for s, v in fetched.get(key, {}).items() if s not in cache[key]}
+                if new_entries:
+                    cache[key].update(new_entries)
+                    self._save_month(month, cache[key])
+        else:
+            log.info(f"📈 Price history for all {len(symbols)} symbol(s) served from cache.")
+
+        return {key: {s: tuple(entries[s]) for s in symbols if s in entries} for key, entries in cache.items()}
+
+    def _fetch(self, symbols: List[str], start: date, end: date) -> Dict[str, Dict[str, Tuple[float, float]]]:
+        """Bulk-downloads each exchange in turn, only retrying symbols the previous one lacked."""
+        results: Dict[str, Dict[str, Tuple[float, float]]] = {}
+        remaining = list(symbols)
+        for suffix in self.EXCHANGE_SUFFIXES:
+            if not remaining:
+                break
+            tickers = {self._to_ticker(symbol, suffix): symbol for symbol in remaining}
+            daily = self._download(list(tickers), start, end)
+            if daily is None or daily.empty:
+                continue
+
+            highs, lows = monthly_high_low(daily)
+            found = set()
+            for month_start in highs.index:
+                key = str(pd.Period(month_start, freq='M'))
+                month_highs = highs.loc[month_start].dropna()
+                month_lows = lows.loc[month_start].dropna()
+                for ticker in month_highs.index.intersection(month_lows.index):
+                    symbol = tickers.get(ticker)
+                    if symbol is None:
+                        continue
+                    results.setdefault(key, {})[symbol] = (round(float(month_highs[ticker]), 2), round(float(month_lows[ticker]), 2))
+                    found.add(symbol)
+            remaining = [s for s in remaining if s not in found]
+
+        if remaining:
+            log.warning(f"⚠️ No price history for {len(remaining)} symbol(s): {', '.join(remaining[:10])}")
+        return results
+
+    def _download(self, tickers: List[str], start: date, end: date) -> Optional[pd.DataFrame]:
+        for attempt in range(settings.retry_attempts):
+            try:
+                with metrics.span("price_download", tickers=len(tickers)):
+                    return self.provider.fetch_daily(tickers, start, end)
+            except Exception as e:
+                log.error(f"❌ Bulk price download failed on attempt {attempt + 1}: {e}")
+                if attempt < settings.retry_attempts - 1:
+                    metrics.incr("retries", stage="price_history")
+                    delay = settings.retry_delay_seconds * (attempt + 1)
+                    log.info(f"Retrying bulk download in {delay} seconds...")
+                    time.sleep(delay)
+        return None
+
+    @staticmethod
+    def _to_ticker(symbol: str, suffix: str) -> str:
+        return f"{symbol.replace('&', '-').upper()}{suffix}"
+
+    def _month_path(self, month: pd.Period) -> str:
+        return os.path.join(self.cache_dir, f"{month}.json")
+
+    def _load_month(self, month: pd.Period) -> Dict[str, List[float]]:
+        path = self._month_path(month)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                return dict(json.load(f))
+        except (OSError, ValueError, TypeError) as e:
+            # Treated as a miss; the month is fetched again and the file rewritten
+            log.warning(f"Ignoring unreadable price cache {path}: {e}")
+            return {}
+
+    def _save_month(self, month: pd.Period, entries: Dict[str, Tuple[float, float]]):
+        # Only completed months are requested, so cached values never go stale
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._month_path(month)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({s: list(v) for s, v in entries.items()}, f)
+        os.replace(tmp_path, path)
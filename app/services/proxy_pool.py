@@ -0,0 +1,211 @@
+# app/services/proxy_pool.py
+import asyncio
+import itertools
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+from ..core.config import settings
+from ..utils.logger import log
+
+class ProxyStats:
+    """Health record for one proxy: smoothed latency, outcomes, and circuit-breaker state."""
+    LATENCY_SMOOTHING = 0.3
+
+    def __init__(self, address: str, latency: Optional[float] = None, successes: int = 0, failures: int = 0,
+                 consecutive_failures: int = 0, open_until: float = 0.0, last_checked: float = 0.0):
+        self.address = address
+        self.latency = latency
+        self.successes = successes
+        self.failures = failures
+        self.consecutive_failures = consecutive_failures
+        self.open_until = open_until
+        self.last_checked = last_checked
+
+    @property
+    def success_rate(self) -> float:
+        # Laplace smoothing so a single probe does not dominate
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+    @property
+    def score(self) -> float:
+        """Higher is better: reliable and fast proxies rank first."""
+        if self.latency is None:
+            return 0.0
+        return self.success_rate / (self.latency + 0.05)
+
+    def is_open(self, now: float) -> bool:
+        return self.open_until > now
+
+    def record_success(self, latency: Optional[float], now: float):
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.last_checked = now
+        if latency is not None:
+            self.latency = latency if self.latency is None else (
+                self.LATENCY_SMOOTHING * latency + (1 - self.LATENCY_SMOOTHING) * self.latency
+            )
+
+    def record_failure(self, now: float):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_checked = now
+        if self.consecutive_failures >= settings.proxy_failure_threshold:
+            self.open_until = now + settings.proxy_cooldown_seconds
+
+    def to_dict(self) -> Dict:
+        return dict(self.__dict__)
+
+class ProxyPool:
+    """
+    Rotating pool of HTTP proxies loaded from `proxies.txt`.
+    Proxies are probed concurrently, ranked by latency and success rate, and
+    circuit-broken after repeated failures. Scores persist between runs so
+    startup only re-probes stale entries.
+    """
+    def __init__(self, addresses: List[str], scores_path: Optional[str] = None, clock: Callable[[], float] = time.time):
+        self.scores_path = scores_path or settings.proxy_scores_path
+        self.clock = clock
+        self.stats: Dict[str, ProxyStats] = {address: ProxyStats(address) for address in addresses}
+        self._rotation = itertools.count()
+        self._load_scores()
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None, **kwargs) -> "ProxyPool":
+        path = path or settings.proxies_file
+        with open(path, encoding='utf-8') as f:
+            addresses = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        return cls(list(dict.fromkeys(addresses)), **kwargs)
+
+    async def refresh(self):
+        """
+        Probes stale proxies when there are not enough recently verified healthy ones.
+        """
+        now = self.clock()
+        fresh_after = now - settings.proxy_rescore_hours * 3600
+        healthy = [s for s in self.stats.values() if s.last_checked >= fresh_after and s.latency is not None and not s.is_open(now)]
+        if len(healthy) >= settings.proxy_top_k:
+            log.info(f"🛰️ {len(healthy)} healthy proxies from saved scores; skipping probes.")
+            return
+
+        stale = [s for s in self.stats.values() if s.last_checked < fresh_after]
+        # Re-validate previously good proxies first, then unknown ones, then past failures
+        stale.sort(key=lambda s: (s.latency is None, s.last_checked > 0 and s.latency is None, -s.score))
+        await self.health_check([s.address for s in stale[:settings.proxy_probe_limit]])
+
+    async def health_check(self, addresses: List[str]):
+        """
+        Probes the given proxies concurrently and records latency or failure for each.
+        """
+        if not addresses:
+            return
+        semaphore = asyncio.Semaphore(settings.proxy_probe_concurrency)
+
+        async def probe(address: str):
+            async with semaphore:
+                latency = await self._probe(address)
+            if latency is None:
+                self.record_failure(address)
+            else:
+                self.record_success(address, latency)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[probe(address) for address in addresses])
+        healthy = sum(1 for a in addresses if self.stats[a].consecutive_failures == 0)
+        log.info(f"🛰️ Probed {len(addresses)} proxies in {time.perf_counter() - started:.1f}s; {healthy} healthy.")
+        self.save()
+
+    async def _probe(self, address: str) -> Optional[float]:
+        """
+        Opens an HTTPS tunnel to the probe target through the proxy.
+        Returns the round-trip latency in seconds, or None on failure.
+        """
+        host, _, port = address.rpartition(':')
+        started = time.perf_counter()
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, int(port)), timeout=settings.proxy_probe_timeout_seconds
+            )
+            target = settings.proxy_probe_target
+            writer.write(f"CONNECT {target} HTTP/1.1\r\nHost: {target}\r\n\r\n".encode())
+            await writer.drain()
+            status_line = await asyncio.wait_for(reader.readline(), timeout=settings.proxy_probe_timeout_seconds)
+            parts = status_line.decode(errors='replace').split()
+            if len(parts) < 2 or parts[1] != '200':
+                return None
+            return time.perf_counter() - started
+        except (OSError, ValueError, asyncio.TimeoutError):
+            return None
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def acquire(self) -> Optional[str]:
+        """
+        Returns one of the fastest healthy proxies, rotating among the top candidates.
+        """
+        now = self.clock()
+        candidates = sorted(
+            (s for s in self.stats.values() if s.latency is not None and not s.is_open(now)),
+            key=lambda s: s.score, reverse=True
+        )[:settings.proxy_top_k]
+        if not candidates:
+            return None
+        return candidates[next(self._rotation) % len(candidates)].address
+
+    def record_success(self, address: str, latency: Optional[float] = None):
+        self.stats[address].record_success(latency, self.clock())
+
+    def record_failure(self, address: str):
+        stats = self.stats[address]
+        stats.record_failure(self.clock())
+        if stats.is_open(self.clock()) and stats.consecutive_failures == settings.proxy_failure_threshold:
+            log.warning(f"🚫 Proxy {address} circuit opened after {stats.consecutive_failures} failures.")
+
+    @staticmethod
+    def playwright_proxy(address: str) -> Dict[str, str]:
+        return {"server": f"http://{address}"}
+
+    @staticmethod
+    def requests_proxies(address: str) -> Dict[str, str]:
+        return {"http": f"http://{address}", "https": f"http://{address}"}
+
+    def _read_scores(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.scores_path):
+            return {}
+        try:
+            with open(self.scores_path, encoding='utf-8') as f:
+                saved = json.load(f)
+            # Validated up front so a bad entry cannot fail the run later
+            for data in saved.values():
+                ProxyStats(**data)
+            return saved
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            # A damaged file only costs a fresh health check
+            log.warning(f"Ignoring unreadable proxy scores in {self.scores_path}: {e}")
+            return {}
+
+    def _load_scores(self):
+        for address, data in self._read_scores().items():
+            if address in self.stats:
+                self.stats[address] = ProxyStats(**data)
+
+    def save(self):
+        """
+        Merges this pool's checked proxies into the scores file. Shard workers save
+        at about the same time, so per proxy the most recently checked record wins
+        rather than the last process to write.
+        """
+        directory = os.path.dirname(self.scores_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        merged = self._read_scores()
+        for address, stats in self.stats.items():
+            if stats.last_checked and stats.last_checked >= merged.get(address, {}).get('last_checked', 0):
+                merged[address] = stats.to_dict()
+        tmp_path = f"{self.scores_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(merged, f)
+        os.replace(tmp_path, self.scores_path)
@@ -1,95 +1,364 @@
 # app/services/scraper_service.py
 import asyncio
-import traceback
-from typing import Dict, Any, List
-from playwright.async_api import async_playwright, TimeoutError, Page, Browser
+import random
+import time
+from typing import Callable, Dict, Any, List, Optional
+from playwright.async_api import async_playwright, TimeoutError, Page
 # Use relative imports
 from ..core.config import ScannerConfig, settings
+from .browser_pool import BrowserContextPool
+from .http_scan_service import HttpScanService
+from .latency_tracker import LatencyTracker
+from .proxy_pool import ProxyPool
 from ..utils.logger import log
+from ..utils.metrics import metrics
+
+class ScanStalledError(Exception):
+    """The results grid never rendered rows or a 'no results' message in time."""
 
 class ScraperService:
     """
     A service class to handle web scraping operations with Playwright.
     """
-    def __init__(self, browser: Browser):
-        self.browser = browser
+    # Stock Name, Symbol, Price, Volume
+    COLUMN_INDEXES = [1, 2, 5, 6]
+    PAGE_SIZE_SELECTOR = '.dataTables_length select, select[name$="_length"]'
+
+    EXTRACT_PAGE_JS = """
+    (columns) => {
+        const minCells = Math.max(...columns) + 1;
+        const rows = Array.from(document.querySelectorAll('table tbody tr'))
+            .map(row => Array.from(row.querySelectorAll('td')))
+            .filter(cells => cells.length >= minCells)
+            .map(cells => columns.map(i => cells[i].innerText));
+        const next = Array.from(document.querySelectorAll('button'))
+            .find(button => button.innerText.toLowerCase().includes('next'));
+        const body = document.querySelector('table tbody');
+        const empty = Boolean(document.querySelector('table tbody .dataTables_empty'))
+            || /no (data|records|stocks|results)/i.test(body ? body.innerText : '');
+        return {rows, hasNext: Boolean(next && !next.disabled), empty};
+    }
+    """
+
+    SHOW_ALL_JS = """
+    (selector) => {
+        for (const select of document.querySelectorAll(selector)) {
+            const option = Array.from(select.options)
+                .find(o => o.value === '-1' || o.text.trim().toLowerCase() === 'all');
+            if (option) {
+                select.value = option.value;
+                select.dispatchEvent(new Event('change', {bubbles: true}));
+                return true;
+            }
+        }
+        return false;
+    }
+    """
+
+    def __init__(self, pool: BrowserContextPool, latencies: Optional[LatencyTracker] = None):
+        self.pool = pool
+        self.latencies = latencies or LatencyTracker()
 
     async def scrape_single_url(self, scanner: ScannerConfig) -> Dict[str, Any]:
         """
         Scrapes all visible columns and pages from a single ChartInk URL.
+        Timeouts come from the scanner's latency history, and an attempt slower than
+        its p95 is hedged. The result's `status` separates a scan with no matches
+        ("empty") from a page that never rendered ("stalled") or kept erroring ("failed").
         """
         log.info(f"🚀 Starting scrape for: {scanner.name} ({scanner.url})")
-        
+        hedge_after, timeout = self.latencies.budget(scanner.name)
+        status = "failed"
+
         for attempt in range(settings.retry_attempts):
             try:
-                page = await self.browser.new_page()
-                
-                await page.goto(scanner.url, timeout=90000, wait_until='domcontentloaded')
-                await page.locator('div[title="Click to run scan"]').click()
-                
-                scraped_rows = await self._extract_data_from_pages(page)
-                
-                await page.close()
-                log.info(f"✅ Successfully scraped {len(scraped_rows)} entries from {scanner.name}")
-                return {"scanner": scanner, "headers": settings.table_headers, "data": scraped_rows}
+                with metrics.span("scrape", scanner=scanner.name):
+                    scraped_rows = await self._hedged(scanner, hedge_after, timeout)
+                if scraped_rows:
+                    log.info(f"✅ Successfully scraped {len(scraped_rows)} entries from {scanner.name}")
+                    return self._result(scanner, scraped_rows, "ok")
+                log.info(f"📭 {scanner.name} ran and returned no results.")
+                return self._result(scanner, [], "empty")
 
-            except TimeoutError:
-                log.warning(f"⏱️ Timeout error on attempt {attempt + 1} for {scanner.name}. The screener might have no results.")
-                await page.close()
-                return {"scanner": scanner, "headers": settings.table_headers, "data": []}
+            except (TimeoutError, ScanStalledError) as e:
+                status = "stalled"
+                metrics.incr("stalled_scans", scanner=scanner.name)
+                log.warning(f"⏱️ {scanner.name} stalled on attempt {attempt + 1} ({timeout:.0f}s budget): {e}")
             except Exception as e:
+                status = "failed"
                 log.error(f"❌ Error on attempt {attempt + 1} for {scanner.name}: {e}")
-                if attempt < settings.retry_attempts - 1:
-                    log.info(f"Retrying in {settings.retry_delay_seconds} seconds...")
-                    await asyncio.sleep(settings.retry_delay_seconds)
-                else:
-                    log.error(f"❌ All {settings.retry_attempts} attempts failed for {scanner.name}.")
-                    traceback.print_exc()
-                    return {"scanner": scanner, "headers": settings.table_headers, "data": []}
-        
-        return {"scanner": scanner, "headers": settings.table_headers, "data": []}
 
-    async def _extract_data_from_pages(self, page: Page) -> List[List[str]]:
+            if attempt < settings.retry_attempts - 1:
+                delay = settings.retry_delay_seconds * 2 ** attempt + random.uniform(0, 1)
+                metrics.incr("retries", stage="scrape", scanner=scanner.name)
+                log.info(f"Retrying in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+
+        log.error(f"❌ All {settings.retry_attempts} attempts for {scanner.name} ended {status}.")
+        return self._result(scanner, [], status)
+
+    @staticmethod
+    def _result(scanner: ScannerConfig, rows: List[List[str]], status: str) -> Dict[str, Any]:
+        return {"scanner": scanner, "headers": settings.table_headers, "data": rows, "status": status}
+
+    async def _hedged(self, scanner: ScannerConfig, hedge_after: float, timeout: float) -> List[List[str]]:
+        """
+        Runs one attempt. If it is still going `hedge_after` seconds after it got a
+        context, a second attempt starts in another context; the first to succeed wins
+        and the other is cancelled. Raises the primary attempt's error when both fail.
+        """
+        acquired = asyncio.Event()
+        primary = asyncio.create_task(self._attempt(scanner, timeout, "primary", acquired))
+        pending = {primary}
+        try:
+            # Waiting for a free context is not slowness in the scan, so it does not start the hedge clock
+            holding = asyncio.create_task(acquired.wait())
+            try:
+                await asyncio.wait({primary, holding}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                holding.cancel()
+            done, _ = await asyncio.wait(pending, timeout=hedge_after)
+            if done:
+                return primary.result()
+
+            log.info(f"🐢 {scanner.name} passed its {hedge_after:.0f}s hedge threshold; starting a second attempt.")
+            metrics.incr("hedged_scans", scanner=scanner.name)
+            hedge = asyncio.create_task(self._attempt(scanner, timeout, "hedge"))
+            pending.add(hedge)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            metrics.incr("hedge_wins", scanner=scanner.name)
+                        return task.result()
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _attempt(self, scanner: ScannerConfig, timeout: float, label: str,
+                       acquired: Optional[asyncio.Event] = None) -> List[List[str]]:
+        """
+        One scrape in its own pooled context and page. The `timeout` budget and the
+        recorded latency both start once a context is held (`acquired` is set then),
+        and the whole attempt is abandoned when the budget runs out.
+        """
+        async with self.pool.acquire(scanner.name if label == "primary" else f"{scanner.name} ({label})") as pooled:
+            if acquired is not None:
+                acquired.set()
+            started = time.perf_counter()
+            try:
+                scraped_rows = await asyncio.wait_for(self._scrape_page(pooled, scanner, started + timeout), timeout)
+            except asyncio.TimeoutError:
+                raise ScanStalledError(f"attempt ran past its {timeout:.0f}s budget")
+            elapsed = time.perf_counter() - started
+        self.latencies.record(scanner.name, elapsed)
+        return scraped_rows
+
+    async def _scrape_page(self, pooled, scanner: ScannerConfig, deadline: float) -> List[List[str]]:
+        page = await pooled.context.new_page()
+        try:
+            with metrics.span("page_goto", scanner=scanner.name):
+                await page.goto(scanner.url, timeout=self._remaining_ms(deadline), wait_until='domcontentloaded')
+                await page.locator('div[title="Click to run scan"]').click(timeout=self._remaining_ms(deadline))
+
+            with metrics.span("extract", scanner=scanner.name):
+                return await self._extract_data_from_pages(page, scanner.name, deadline)
+        finally:
+            await page.close()
+            # new_page, goto, click and close
+            metrics.incr("browser_round_trips", 4, scanner=scanner.name)
+
+    @staticmethod
+    def _remaining_ms(deadline: Optional[float]) -> float:
+        """Milliseconds left before `deadline` (a perf_counter time) for one browser wait; 30s without one."""
+        if deadline is None:
+            return 30000.0
+        return max(1000.0, (deadline - time.perf_counter()) * 1000)
+
+    async def _extract_data_from_pages(self, page: Page, scanner_name: str = "", deadline: Optional[float] = None) -> List[List[str]]:
         """
         Extracts table data, handling pagination.
+        Each page is read with a single in-page evaluation instead of per-cell calls.
+        Every wait gets what is left before `deadline` rather than a fresh timeout.
+        Returns [] only when the grid shows its "no results" message; a grid that never
+        renders rows raises ScanStalledError.
         """
         scraped_rows = []
+        round_trips = 1
+        if await self._show_all_rows(page, deadline):
+            round_trips += 1
+            log.info("📜 Results grid switched to show all rows; pagination skipped.")
+
+        page_number = 0
         while True:
-            await page.wait_for_selector("table tbody tr", timeout=30000)
-            
-            rows = await page.query_selector_all("table tbody tr")
-            for row in rows:
-                cells = await row.query_selector_all("td")
-                # 👇 Updated logic to cherry-pick columns by index
-                # This ensures we only get 'Stock Name', 'Symbol', 'Price', and 'Volume'
-                if len(cells) >= 7:
-                    row_data = [
-                        await cells[1].inner_text(), # Stock Name
-                        await cells[2].inner_text(), # Symbol
-                        await cells[5].inner_text(), # Price
-                        await cells[6].inner_text(), # Volume
-                    ]
-                    scraped_rows.append(row_data)
-
-            next_button = page.locator('button:has-text("Next")')
-            if await next_button.count() == 0 or await next_button.is_disabled():
+            page_number += 1
+            started = time.perf_counter()
+
+            timeout_ms = self._remaining_ms(deadline)
+            try:
+                await page.wait_for_selector("table tbody tr", timeout=timeout_ms)
+            except TimeoutError:
+                raise ScanStalledError(f"no result rows after {timeout_ms / 1000:.0f}s on page {page_number}")
+            snapshot = await page.evaluate(self.EXTRACT_PAGE_JS, self.COLUMN_INDEXES)
+            if page_number == 1 and not snapshot['rows'] and not snapshot.get('empty'):
+                raise ScanStalledError("results table has neither rows nor a 'no results' message")
+            scraped_rows.extend(snapshot['rows'])
+            round_trips += 2
+
+            log.info(
+                f"📄 Page {page_number}: extracted {len(snapshot['rows'])} rows in "
+                f"{time.perf_counter() - started:.3f}s (2 browser round trips)"
+            )
+
+            if not snapshot['hasNext']:
                 break
-            
-            await next_button.click()
-            await page.wait_for_load_state('networkidle')
+
+            await page.locator('button:has-text("Next")').click(timeout=self._remaining_ms(deadline))
+            await page.wait_for_load_state('networkidle', timeout=self._remaining_ms(deadline))
+            round_trips += 2
         
+        log.info(f"📊 Extracted {len(scraped_rows)} rows from {page_number} page(s) in {round_trips} browser round trips.")
+        metrics.incr("browser_round_trips", round_trips, scanner=scanner_name)
+        metrics.incr("result_pages", page_number, scanner=scanner_name)
         return scraped_rows
 
-async def run_scrapers(scanners: List[ScannerConfig]) -> List[Dict[str, Any]]:
+    async def _show_all_rows(self, page: Page, deadline: Optional[float] = None) -> bool:
+        """
+        Raises the results grid page size to "All" when it offers that option.
+        """
+        if not await page.evaluate(self.SHOW_ALL_JS, self.PAGE_SIZE_SELECTOR):
+            return False
+        await page.wait_for_load_state('networkidle', timeout=self._remaining_ms(deadline))
+        return True
+
+class WarmBrowser:
+    """
+    Keeps one Firefox and its context pool alive across runs (daemon mode).
+    The browser is relaunched after `daemon_browser_recycle_scans` scans, or when it
+    has disconnected, to bound memory growth.
+    """
+    def __init__(self, proxy_pool: Optional[ProxyPool] = None):
+        self.proxy_pool = proxy_pool
+        self.scans = 0
+        self._playwright = None
+        self._browser = None
+        self._service: Optional[ScraperService] = None
+
+    async def scraper(self) -> ScraperService:
+        if self._service is not None:
+            if self.scans >= settings.daemon_browser_recycle_scans:
+                log.info(f"♻️ Recycling the browser after {self.scans} scans.")
+                await self.close()
+            elif not self._browser.is_connected():
+                log.warning("♻️ Browser disconnected; relaunching.")
+                await self.close()
+        if self._service is None:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            with metrics.span("browser_launch"):
+                self._browser = await self._playwright.firefox.launch()
+            self._service = ScraperService(BrowserContextPool(self._browser, proxy_pool=self.proxy_pool))
+            self.scans = 0
+        return self._service
+
+    async def close(self):
+        """Closes the browser; the next `scraper()` call launches a fresh one."""
+        service, browser = self._service, self._browser
+        self._service = self._browser = None
+        if service is not None:
+            try:
+                await service.pool.close()
+                await browser.close()
+            except Exception as e:
+                log.warning(f"Could not close the browser cleanly: {e}")
+
+    async def shutdown(self):
+        await self.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+async def run_scrapers(scanners: List[ScannerConfig], on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+                       warm: Optional[WarmBrowser] = None) -> List[Dict[str, Any]]:
     """
-    Initializes Playwright, runs all scrapers concurrently, and returns results.
+    Runs HTTP-backed scanners first, then launches Playwright only for the
+    scanners that need it (or whose HTTP scan failed). Results keep input order.
+    `on_result` is called with each final result as soon as its scanner finishes.
+    With a WarmBrowser, its browser and proxy pool are reused instead of launched.
     """
+    results: Dict[int, Dict[str, Any]] = {}
+
+    proxy_pool = warm.proxy_pool if warm else None
+    if proxy_pool is None and settings.use_proxies:
+        proxy_pool = ProxyPool.from_file()
+        await proxy_pool.refresh()
+
+    try:
+        http_indexes = [i for i, scanner in enumerate(scanners) if scanner.backend == "http"]
+        if http_indexes:
+            http_service = HttpScanService(proxy_pool=proxy_pool)
+
+            async def scrape_http(i: int):
+                result = await http_service.scrape_single_url(scanners[i])
+                if result is not None:
+                    results[i] = result
+                    if on_result:
+                        on_result(result)
+                else:
+                    metrics.incr("http_fallbacks", scanner=scanners[i].name)
+                    log.info(f"↩️ Falling back to Playwright for {scanners[i].name}")
+
+            await asyncio.gather(*[scrape_http(i) for i in http_indexes])
+
+        browser_indexes = [i for i in range(len(scanners)) if i not in results]
+        if browser_indexes:
+            browser_results = await _run_playwright_scrapers([scanners[i] for i in browser_indexes], proxy_pool, on_result, warm)
+            results.update(zip(browser_indexes, browser_results))
+    finally:
+        if proxy_pool:
+            proxy_pool.save()
+
+    return [results[i] for i in range(len(scanners))]
+
+async def _run_playwright_scrapers(scanners: List[ScannerConfig], proxy_pool: Optional[ProxyPool] = None,
+                                   on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                   warm: Optional[WarmBrowser] = None) -> List[Dict[str, Any]]:
+    """
+    Initializes Playwright (or borrows the warm browser), runs the given scrapers
+    through a bounded context pool, and returns results.
+    """
+    if warm is not None:
+        service = await warm.scraper()
+        try:
+            return await _scrape_all(service, scanners, on_result)
+        finally:
+            warm.scans += len(scanners)
+
     async with async_playwright() as p:
-        browser = await p.firefox.launch()
-        service = ScraperService(browser)
-        
-        tasks = [service.scrape_single_url(scanner) for scanner in scanners]
-        results = await asyncio.gather(*tasks)
+        with metrics.span("browser_launch"):
+            browser = await p.firefox.launch()
+        pool = BrowserContextPool(browser, proxy_pool=proxy_pool)
+        results = await _scrape_all(ScraperService(pool), scanners, on_result)
         
+        await pool.close()
         await browser.close()
-        return results
\ No newline at end of file
+        return results
+
+async def _scrape_all(service: ScraperService, scanners: List[ScannerConfig],
+                      on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    async def scrape(scanner: ScannerConfig) -> Dict[str, Any]:
+        result = await service.scrape_single_url(scanner)
+        if on_result:
+            on_result(result)
+        return result
+
+    try:
+        return await asyncio.gather(*[scrape(scanner) for scanner in scanners])
+    finally:
+        try:
+            service.latencies.save()
+        except OSError as e:
+            log.warning(f"Could not save scan latencies: {e}")
@@ -0,0 +1,99 @@
+# app/services/shard_service.py
+import glob
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from ..core.config import ScannerConfig, settings
+from ..utils.logger import log
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parses "i/N" (0-based i) into (i, N)."""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be between 0 and N-1, got {value!r}")
+    return index, count
+
+def _scanner_key(scanner: ScannerConfig) -> str:
+    return hashlib.sha1(scanner.url.encode('utf-8')).hexdigest()
+
+def shard_scanners(scanners: List[ScannerConfig], index: int, count: int) -> List[ScannerConfig]:
+    """
+    The scanners that belong to shard `index` of `count`, in config order.
+    Scanners are sorted by a hash of their URL and dealt round-robin, so every job
+    computes the same split and shard sizes differ by at most one.
+    """
+    chosen = {id(scanner) for scanner in sorted(scanners, key=_scanner_key)[index::count]}
+    return [scanner for scanner in scanners if id(scanner) in chosen]
+
+def artifact_path(directory: str, index: int, count: int) -> str:
+    return os.path.join(directory, f"shard-{index}-of-{count}.json.gz")
+
+def clear_artifacts(directory: Optional[str] = None):
+    """Removes shard artifacts left by an earlier run."""
+    for path in glob.glob(os.path.join(directory or settings.shard_artifact_dir, "shard-*-of-*.json.gz")):
+        os.remove(path)
+
+def write_artifact(results: List[Dict[str, Any]], index: int, count: int, directory: Optional[str] = None) -> str:
+    """Writes one shard's results as gzipped JSON; replaced atomically so the merge never reads a partial file."""
+    directory = directory or settings.shard_artifact_dir
+    os.makedirs(directory, exist_ok=True)
+    payload = {
+        "shard": index,
+        "shards": count,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "results": [
+            {"scanner_url": result['scanner'].url, "headers": result['headers'], "data": result['data']}
+            for result in results
+        ],
+    }
+    path = artifact_path(directory, index, count)
+    with gzip.open(path + ".tmp", 'wt', encoding='utf-8') as f:
+        json.dump(payload, f, separators=(',', ':'))
+    os.replace(path + ".tmp", path)
+    rows = sum(len(result['data']) for result in results)
+    log.info(f"📦 Shard {index}/{count}: wrote {len(results)} result(s), {rows} rows to {path} ({os.path.getsize(path)} bytes).")
+    return path
+
+def load_artifacts(directory: Optional[str] = None, scanners: Optional[List[ScannerConfig]] = None) -> List[Dict[str, Any]]:
+    """
+    Reads every shard artifact under `directory` and returns scan results in config order.
+    Missing shards and uncovered scanners are logged and skipped, so one failed shard
+    does not hold back the tables of the others.
+    """
+    directory = directory or settings.shard_artifact_dir
+    scanners = settings.scanners if scanners is None else scanners
+    paths = sorted(glob.glob(os.path.join(directory, "**", "shard-*-of-*.json.gz"), recursive=True))
+    if not paths:
+        raise FileNotFoundError(f"No shard artifacts found in {directory}")
+
+    saved_by_url: Dict[str, Dict[str, Any]] = {}
+    shards_seen: Dict[int, set] = {}
+    for path in paths:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            payload = json.load(f)
+        shards_seen.setdefault(payload['shards'], set()).add(payload['shard'])
+        for saved in payload['results']:
+            saved_by_url[saved['scanner_url']] = saved
+
+    if len(shards_seen) > 1:
+        log.warning(f"⚠️ Artifacts in {directory} come from different shard counts: {sorted(shards_seen)}.")
+    for count, seen in shards_seen.items():
+        missing = sorted(set(range(count)) - seen)
+        if missing:
+            log.warning(f"⚠️ Missing artifacts for shard(s) {missing} of {count}; their tables are left unchanged.")
+
+    results = []
+    for scanner in scanners:
+        saved = saved_by_url.get(scanner.url)
+        if saved is None:
+            log.warning(f"⚠️ No shard artifact covers {scanner.name}; skipping its table.")
+            continue
+        results.append({"scanner": scanner, "headers": saved['headers'], "data": saved['data']})
+    log.info(f"🧩 Merged {len(paths)} shard artifact(s) covering {len(results)} of {len(scanners)} scanner(s).")
+    return results
@@ -0,0 +1,73 @@
+# app/services/sheet_diff.py
+from itertools import zip_longest
+from typing import Any, Iterable, List, Tuple
+
+class CellBlock:
+    """A rectangle of changed cells, relative to the top-left of the compared grid."""
+    def __init__(self, row: int, col: int, values: List[List[Any]]):
+        self.row = row
+        self.col = col
+        self.values = values
+
+    @property
+    def height(self) -> int:
+        return len(self.values)
+
+    @property
+    def width(self) -> int:
+        return len(self.values[0]) if self.values else 0
+
+    def __repr__(self):
+        return f"CellBlock(row={self.row}, col={self.col}, size={self.height}x{self.width})"
+
+def _cell_key(value: Any) -> str:
+    """Comparable form of a cell value; Sheets returns numbers where we may hold strings."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+def _changed_runs(old_row: List[Any], new_row: List[Any], width: int) -> List[Tuple[int, int]]:
+    """Column runs [start, end) where the two rows differ."""
+    runs = []
+    start = None
+    for col in range(width):
+        old = old_row[col] if col < len(old_row) else ''
+        new = new_row[col] if col < len(new_row) else ''
+        if _cell_key(old) != _cell_key(new):
+            if start is None:
+                start = col
+        elif start is not None:
+            runs.append((start, col))
+            start = None
+    if start is not None:
+        runs.append((start, width))
+    return runs
+
+def diff_grid(existing: Iterable[List[Any]], desired: Iterable[List[Any]], width: int) -> List[CellBlock]:
+    """
+    Computes the minimal set of rectangular writes that turns `existing` into `desired`.
+    Rows present only in `existing` are blanked. Consecutive rows changing the same
+    column span are coalesced into one block. Both grids are consumed row by row,
+    so `desired` can be a generator.
+    """
+    blocks: List[CellBlock] = []
+    open_blocks = {}  # (start, end) -> block still growing downwards
+
+    for row, (old_row, new_row) in enumerate(zip_longest(existing, desired, fillvalue=[])):
+        runs = _changed_runs(old_row, new_row, width)
+
+        still_open = {}
+        for start, end in runs:
+            values = [new_row[col] if col < len(new_row) else '' for col in range(start, end)]
+            block = open_blocks.get((start, end))
+            if block is not None and block.row + block.height == row:
+                block.values.append(values)
+            else:
+                block = CellBlock(row, start, [values])
+                blocks.append(block)
+            still_open[(start, end)] = block
+        open_blocks = still_open
+
+    return blocks
@@ -0,0 +1,81 @@
+# app/services/sheet_formatting.py
+import hashlib
+import json
+from typing import Any, Dict, List
+from .sheet_layout import TableLayout
+
+FINGERPRINT_KEY = "chartink_format_fingerprint"
+
+TITLE_FORMAT = {
+    'backgroundColor': {'red': 0.2, 'green': 0.2, 'blue': 0.2},
+    'textFormat': {'bold': True, 'foregroundColor': {'red': 1, 'green': 1, 'blue': 1}, 'fontSize': 12},
+}
+HEADER_FORMAT = {
+    'backgroundColor': {'red': 0.9, 'green': 0.9, 'blue': 0.9},
+    'textFormat': {'bold': True},
+}
+NUMBER_FORMAT = {'numberFormat': {'type': 'NUMBER', 'pattern': "#,##,##0.00"}}
+
+def _grid_range(sheet_id: int, start_col: int, end_col: int, start_row: int = None, end_row: int = None) -> Dict[str, int]:
+    """GridRange with 0-based, end-exclusive indexes; rows are omitted for whole columns."""
+    grid_range = {'sheetId': sheet_id, 'startColumnIndex': start_col, 'endColumnIndex': end_col}
+    if start_row is not None:
+        grid_range.update({'startRowIndex': start_row, 'endRowIndex': end_row})
+    return grid_range
+
+def _repeat_cell(grid_range: Dict[str, int], cell_format: Dict[str, Any]) -> Dict[str, Any]:
+    return {'repeatCell': {
+        'range': grid_range,
+        'cell': {'userEnteredFormat': cell_format},
+        'fields': f"userEnteredFormat({','.join(cell_format)})",
+    }}
+
+def build_format_requests(sheet_id: int, layouts: List[TableLayout]) -> List[Dict[str, Any]]:
+    """
+    Compiles the frozen rows, title merges, title/header styles, number formats and
+    column sizing for one worksheet into batchUpdate requests.
+    The status column is never formatted.
+    """
+    requests = [{'updateSheetProperties': {
+        'properties': {'sheetId': sheet_id, 'gridProperties': {'frozenRowCount': 2}},
+        'fields': 'gridProperties.frozenRowCount',
+    }}]
+
+    for layout in layouts:
+        first_col = layout.start_col - 1
+        status_col = first_col + layout.status_col_index
+        title_range = _grid_range(sheet_id, first_col, first_col + layout.width, 0, 1)
+
+        requests.append({'mergeCells': {'range': title_range, 'mergeType': 'MERGE_ALL'}})
+        requests.append(_repeat_cell(title_range, TITLE_FORMAT))
+        requests.append(_repeat_cell(_grid_range(sheet_id, first_col, status_col, 1, 2), HEADER_FORMAT))
+        # Number columns: Price through Stoploss
+        requests.append(_repeat_cell(_grid_range(sheet_id, first_col + 2, status_col), NUMBER_FORMAT))
+
+    requests.append({'autoResizeDimensions': {'dimensions': {
+        'sheetId': sheet_id, 'dimension': 'COLUMNS', 'startIndex': 0,
+        'endIndex': max(layout.end_col for layout in layouts),
+    }}})
+    return requests
+
+def fingerprint(requests: List[Dict[str, Any]]) -> str:
+    """Stable hash of the formatting requests, stored on the sheet to detect layout changes."""
+    return hashlib.sha256(json.dumps(requests, sort_keys=True).encode('utf-8')).hexdigest()
+
+def fingerprint_request(sheet_id: int, value: str, exists: bool) -> Dict[str, Any]:
+    """Creates or updates the sheet-level developer metadata holding the fingerprint."""
+    if exists:
+        return {'updateDeveloperMetadata': {
+            'dataFilters': [{'developerMetadataLookup': {
+                'metadataKey': FINGERPRINT_KEY,
+                'metadataLocation': {'sheetId': sheet_id},
+            }}],
+            'developerMetadata': {'metadataValue': value},
+            'fields': 'metadataValue',
+        }}
+    return {'createDeveloperMetadata': {'developerMetadata': {
+        'metadataKey': FINGERPRINT_KEY,
+        'metadataValue': value,
+        'location': {'sheetId': sheet_id},
+        'visibility': 'DOCUMENT',
+    }}}
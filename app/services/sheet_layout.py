@@ -0,0 +1,59 @@
+# app/services/sheet_layout.py
+from typing import List, Optional
+from gspread.utils import rowcol_to_a1, absolute_range_name
+from ..core.config import ScannerConfig, settings
+
+def col_char(col: int) -> str:
+    """Converts a 1-based column index to its letter(s), e.g. 10 -> 'J'."""
+    return rowcol_to_a1(1, col)[:-1]
+
+class TableLayout:
+    """
+    Position of one scanner's table on the spreadsheet.
+    Tables sharing a worksheet sit side by side, separated by `table_gap_columns`.
+    """
+    def __init__(self, scanner_name: str, worksheet_name: str, start_col: int, headers: List[str]):
+        self.scanner_name = scanner_name
+        self.worksheet_name = worksheet_name
+        self.start_col = start_col
+        self.headers = headers
+        self.width = len(headers)
+        self.end_col = start_col + self.width - 1
+        self.status_col_index = headers.index('Status') if 'Status' in headers else self.width - 1
+
+    @property
+    def start_col_char(self) -> str:
+        return col_char(self.start_col)
+
+    @property
+    def end_col_char(self) -> str:
+        return col_char(self.end_col)
+
+    def col_char_at(self, offset: int) -> str:
+        """Letter of the column `offset` positions into the table."""
+        return col_char(self.start_col + offset)
+
+    def a1(self, first_row: int, last_row: Optional[int] = None, first_offset: int = 0, last_offset: Optional[int] = None) -> str:
+        """A1 range (without sheet name) covering the given rows and table columns."""
+        last_row = first_row if last_row is None else last_row
+        last_offset = self.width - 1 if last_offset is None else last_offset
+        return f"{self.col_char_at(first_offset)}{first_row}:{self.col_char_at(last_offset)}{last_row}"
+
+    def range(self, first_row: int, last_row: Optional[int] = None, first_offset: int = 0, last_offset: Optional[int] = None) -> str:
+        """Sheet-qualified A1 range, as used by the values batch endpoints."""
+        return absolute_range_name(self.worksheet_name, self.a1(first_row, last_row, first_offset, last_offset))
+
+def build_table_layouts(scanners: List[ScannerConfig], headers: List[str] = None) -> List[TableLayout]:
+    """
+    Derives one table layout per configured scanner, in scanner order.
+    """
+    headers = headers or settings.table_headers
+    layouts = []
+    tables_per_sheet = {}
+    for scanner in scanners:
+        worksheet_name = scanner.worksheet or settings.worksheet_name
+        position = tables_per_sheet.get(worksheet_name, 0)
+        tables_per_sheet[worksheet_name] = position + 1
+        start_col = 1 + position * (len(headers) + settings.table_gap_columns)
+        layouts.append(TableLayout(scanner.name, worksheet_name, start_col, headers))
+    return layouts
@@ -0,0 +1,265 @@
+# app/services/sheets_scheduler.py
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import gspread
+from ..core.config import settings
+from ..utils.logger import log
+from ..utils.metrics import metrics
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    Thread-safe token bucket holding up to one minute of quota and refilling continuously.
+    Tokens are reserved up front, so concurrent callers queue fairly behind each other.
+    """
+    def __init__(self, per_minute: int, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes one token and returns how many seconds the caller must wait for it."""
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class SchedulerStats:
+    """Per-kind counters for calls made, throttling and retries."""
+    def __init__(self):
+        self.calls = 0
+        self.throttled = 0
+        self.throttle_seconds = 0.0
+        self.retries = 0
+        self.backoff_seconds = 0.0
+        self.coalesced = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls, 'throttled': self.throttled, 'throttle_seconds': round(self.throttle_seconds, 3),
+            'retries': self.retries, 'backoff_seconds': round(self.backoff_seconds, 3), 'coalesced': self.coalesced,
+        }
+
+class _Pending:
+    """A batchUpdate body waiting for its turn, possibly merged with others."""
+    def __init__(self, body: Dict[str, Any], label: str):
+        self.body = body
+        self.label = label
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+_project_buckets: Dict[str, TokenBucket] = {}
+_project_lock = threading.Lock()
+
+def project_buckets() -> Dict[str, TokenBucket]:
+    """Per-project quota buckets, shared by every scheduler in this process."""
+    with _project_lock:
+        if not _project_buckets:
+            _project_buckets['read'] = TokenBucket(settings.sheets_read_quota_per_project)
+            _project_buckets['write'] = TokenBucket(settings.sheets_write_quota_per_project)
+        return _project_buckets
+
+def _status(error: gspread.exceptions.APIError) -> Optional[int]:
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) or getattr(error, 'code', None)
+
+class SheetsRequestScheduler:
+    """
+    Gateway for every Sheets API call.
+    - Token buckets hold reads and writes to the per-user and per-project quotas.
+    - 429 and 5xx responses are retried with exponential backoff and jitter.
+    - batchUpdate calls queued against the same spreadsheet while one is waiting
+      are merged into a single request. Value writes keep up to
+      `sheets_write_concurrency` requests in flight per spreadsheet; structural
+      batchUpdates go one at a time so they apply in order.
+    """
+    def __init__(self, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep,
+                 project: Optional[Dict[str, TokenBucket]] = None):
+        self.sleep = sleep
+        self.buckets = {
+            'read': [TokenBucket(settings.sheets_read_quota_per_user, clock)],
+            'write': [TokenBucket(settings.sheets_write_quota_per_user, clock)],
+        }
+        for kind, bucket in (project if project is not None else project_buckets()).items():
+            self.buckets[kind].append(bucket)
+        self.stats = {'read': SchedulerStats(), 'write': SchedulerStats()}
+        self._lock = threading.Lock()
+        self._queues: Dict[Tuple[str, str], List[_Pending]] = {}
+        self._leaders: Dict[Tuple[str, str], int] = {}
+
+    def read(self, label: str, fn: Callable, *args, **kwargs) -> Any:
+        return self._execute('read', label, fn, args, kwargs)
+
+    def write(self, label: str, fn: Callable, *args, **kwargs) -> Any:
+        return self._execute('write', label, fn, args, kwargs)
+
+    def batch_update(self, spreadsheet, body: Dict[str, Any], label: str = "format") -> Dict[str, Any]:
+        """spreadsheet.batch_update, merged with other queued structural requests."""
+        return self._coalesced(spreadsheet, 'batch_update', body, label)
+
+    def values_batch_update(self, spreadsheet, body: Dict[str, Any], label: str = "write") -> Dict[str, Any]:
+        """spreadsheet.values_batch_update, merged with other queued value writes."""
+        return self._coalesced(spreadsheet, 'values_batch_update', body, label)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {kind: stats.as_dict() for kind, stats in self.stats.items()}
+
+    def log_summary(self):
+        for kind, stats in self.summary().items():
+            if stats['calls']:
+                log.info(
+                    f"🚦 Sheets {kind}s: {stats['calls']} call(s), {stats['throttled']} throttled "
+                    f"({stats['throttle_seconds']:.1f}s), {stats['retries']} retried ({stats['backoff_seconds']:.1f}s), "
+                    f"{stats['coalesced']} merged."
+                )
+
+    def _throttle(self, kind: str):
+        wait = max(bucket.reserve() for bucket in self.buckets[kind])
+        if wait <= 0:
+            return
+        with self._lock:
+            self.stats[kind].throttled += 1
+            self.stats[kind].throttle_seconds += wait
+        metrics.incr("sheets_throttle_seconds", wait, kind=kind)
+        self.sleep(wait)
+
+    def _execute(self, kind: str, label: str, fn: Callable, args: tuple, kwargs: Dict[str, Any], throttled: bool = False) -> Any:
+        attempt = 0
+        while True:
+            if not throttled:
+                self._throttle(kind)
+            throttled = False
+            with self._lock:
+                self.stats[kind].calls += 1
+            metrics.incr("sheets_api_calls", kind=label)
+            try:
+                return fn(*args, **kwargs)
+            except gspread.exceptions.APIError as e:
+                status = _status(e)
+                if status not in RETRYABLE_STATUS or attempt >= settings.sheets_max_retries:
+                    raise
+                delay = min(settings.sheets_backoff_max_seconds,
+                            settings.sheets_backoff_base_seconds * 2 ** attempt + random.uniform(0, 1))
+                attempt += 1
+                with self._lock:
+                    self.stats[kind].retries += 1
+                    self.stats[kind].backoff_seconds += delay
+                metrics.incr("retries", stage="sheets", kind=label)
+                metrics.incr("sheets_backoff_seconds", delay, kind=kind)
+                log.warning(f"⏳ Sheets {label} call failed with HTTP {status}; retry {attempt}/{settings.sheets_max_retries} in {delay:.1f}s.")
+                self.sleep(delay)
+
+    def _coalesced(self, spreadsheet, method: str, body: Dict[str, Any], label: str) -> Dict[str, Any]:
+        key = (spreadsheet.id, method)
+        pending = _Pending(body, label)
+        with self._lock:
+            self._queues.setdefault(key, []).append(pending)
+            limit = settings.sheets_write_concurrency if method == 'values_batch_update' else 1
+            lead = self._leaders.get(key, 0) < limit
+            if lead:
+                self._leaders[key] = self._leaders.get(key, 0) + 1
+        if lead:
+            self._drain(spreadsheet, method, key)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _drain(self, spreadsheet, method: str, key: Tuple[str, str]):
+        """
+        Sends queued bodies until the queue is empty, alongside any other drains of the same queue.
+        The leader slot is given back under the same lock that saw the queue empty, so a
+        caller queueing at that moment either is picked up here or becomes a leader itself.
+        """
+        released = False
+        try:
+            while True:
+                with self._lock:
+                    released = self._release_if_idle(key)
+                if released:
+                    return
+                # Wait for quota first, so everything queued meanwhile joins this request
+                self._throttle('write')
+                with self._lock:
+                    # Another drain may have emptied the queue while this one waited for quota
+                    released = self._release_if_idle(key)
+                    if not released:
+                        batch = self._take_batch(method, self._queues[key])
+                        if len(batch) > 1:
+                            self.stats['write'].coalesced += len(batch) - 1
+                if released:
+                    return
+                if len(batch) > 1:
+                    metrics.incr("sheets_coalesced_calls", len(batch) - 1, kind=method)
+
+                merged = self._merge(method, batch)
+                try:
+                    response = self._execute('write', batch[0].label, getattr(spreadsheet, method), (merged,), {}, throttled=True)
+                except BaseException as e:
+                    for pending in batch:
+                        pending.error = e
+                        pending.done.set()
+                    continue
+                self._split(method, batch, response)
+        finally:
+            if not released:
+                with self._lock:
+                    self._leaders[key] -= 1
+
+    def _release_if_idle(self, key: Tuple[str, str]) -> bool:
+        """Ends a drain whose queue is empty by giving back its leader slot. Call with the lock held."""
+        if self._queues.get(key):
+            return False
+        self._leaders[key] -= 1
+        return True
+
+    @staticmethod
+    def _take_batch(method: str, queue: List[_Pending]) -> List[_Pending]:
+        """Pops the longest mergeable prefix of the queue, bounded by the write chunk size."""
+        batch = [queue.pop(0)]
+        if method == 'values_batch_update':
+            cells = lambda p: sum(len(w['values']) * len(w['values'][0]) for w in p.body['data'] if w['values'])
+            total = cells(batch[0])
+            while queue and queue[0].body.get('valueInputOption') == batch[0].body.get('valueInputOption') \
+                    and total + cells(queue[0]) <= settings.sheets_write_chunk_cells:
+                total += cells(queue[0])
+                batch.append(queue.pop(0))
+        else:
+            while queue:
+                batch.append(queue.pop(0))
+        return batch
+
+    @staticmethod
+    def _merge(method: str, batch: List[_Pending]) -> Dict[str, Any]:
+        if len(batch) == 1:
+            return batch[0].body
+        if method == 'values_batch_update':
+            return {**batch[0].body, 'data': [write for pending in batch for write in pending.body['data']]}
+        return {'requests': [request for pending in batch for request in pending.body['requests']]}
+
+    @staticmethod
+    def _split(method: str, batch: List[_Pending], response: Any):
+        """Hands each caller the part of a merged response that belongs to it."""
+        if len(batch) == 1 or not isinstance(response, dict):
+            for pending in batch:
+                pending.result = response
+                pending.done.set()
+            return
+        key, items = ('responses', 'data') if method == 'values_batch_update' else ('replies', 'requests')
+        parts = response.get(key, [])
+        start = 0
+        for pending in batch:
+            count = len(pending.body[items])
+            pending.result = {**response, key: parts[start:start + count]}
+            start += count
+            pending.done.set()
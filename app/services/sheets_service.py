@@ -1,22 +1,54 @@
 # app/services/sheets_service.py
+import itertools
 import os
+import json
 import gspread
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+from gspread.utils import a1_to_rowcol, absolute_range_name, rowcol_to_a1
+from google.auth.transport.requests import Request
 from google.oauth2.service_account import Credentials
-from gspread_formatting import (
-    CellFormat, Color, TextFormat, set_frozen,
-    format_cell_range, NumberFormat
-)
 from ..core.config import settings
+from .formula_service import BUY_OFFSET, STOP_OFFSET, NamedFunctionFormulas, get_formula_strategy
+from .history_store import ScanHistoryStore
+from .sheet_diff import diff_grid
+from .sheet_formatting import FINGERPRINT_KEY, build_format_requests, fingerprint, fingerprint_request
+from .sheet_layout import TableLayout, build_table_layouts
+from .sheets_scheduler import SheetsRequestScheduler
 from ..utils.logger import log
+from ..utils.metrics import metrics
+
+def _parse_range(range_name: str) -> Tuple[str, Tuple[int, int], Tuple[int, int]]:
+    """Splits "'Sheet'!A3:D4" into the worksheet title and its first and last (row, col)."""
+    title, cells = range_name.rsplit('!', 1)
+    first, _, last = cells.partition(':')
+    return title.strip("'").replace("''", "'"), a1_to_rowcol(first), a1_to_rowcol(last or first)
 
 class SheetsService:
     SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
 
-    def __init__(self):
-        self.client = self._authenticate()
-        self.spreadsheet = self.client.open(settings.sheet_name)
-        self.worksheet = self._get_or_create_worksheet()
+    def __init__(self, client: gspread.Client = None, scheduler: SheetsRequestScheduler = None, history: ScanHistoryStore = None):
+        self.scheduler = scheduler or SheetsRequestScheduler()
+        # Loaded before this run is stored, so it tells which symbols are new
+        self.history = history or (ScanHistoryStore() if settings.sheets_append_new_only else None)
+        with metrics.span("sheets_auth"):
+            self.client = client or self._authenticate()
+        with metrics.span("sheets_open"):
+            # Drive lookup by name plus the spreadsheet fetch
+            self.spreadsheet = self.scheduler.read("open", self.client.open, settings.sheet_name)
+        self.layouts = build_table_layouts(settings.scanners)
+        self.formulas = get_formula_strategy()
+        if isinstance(self.formulas, NamedFunctionFormulas):
+            log.info(
+                f"🧮 Price columns call the named function {self.formulas.function_name}(symbol, attribute, start_date, end_date); "
+                f"define it once under Data > Named functions as: {self.formulas.definition()}"
+            )
+        self.worksheets = self._get_or_create_worksheets()
+        if not settings.sheets_dry_run:
+            # Tables added to the config may sit past the grid's last column, where even reads fail
+            self._ensure_grid([{'range': layout.range(1)} for layout in self.layouts])
+        self._prefetched_tables: Dict[str, List[List[Any]]] = {}
 
     def _authenticate(self):
         log.info("🔒 Authenticating with Google Sheets...")
@@ -31,113 +63,447 @@ class SheetsService:
             creds = Credentials.from_service_account_file(credentials_file, scopes=self.SCOPES)
         return gspread.authorize(creds)
 
-    def _get_or_create_worksheet(self) -> gspread.Worksheet:
+    def refresh(self):
+        """
+        Readies a long-lived service (daemon mode) for another run: renews the access
+        token shortly before it expires, then re-reads worksheet metadata and the scan
+        history, which may have changed since the last run. The formula strategy is
+        rebuilt too, since its date range is last month's as of when it was made.
+        """
+        credentials = getattr(self.client.http_client, 'auth', None)
+        expiry = getattr(credentials, 'expiry', None)
+        margin = timedelta(minutes=settings.daemon_credential_refresh_minutes)
+        # google-auth keeps expiry as naive UTC
+        if credentials is not None and (expiry is None or expiry - margin <= datetime.now(timezone.utc).replace(tzinfo=None)):
+            with metrics.span("sheets_auth"):
+                credentials.refresh(Request())
+            log.info("🔑 Refreshed Google credentials.")
+        self.formulas = get_formula_strategy()
+        self.worksheets = self._get_or_create_worksheets()
+        self._prefetched_tables = {}
+        if self.history is not None:
+            self.history = ScanHistoryStore(self.history.directory)
+
+    def _get_or_create_worksheets(self) -> Dict[str, gspread.Worksheet]:
+        # One metadata read gives every tab plus its stored formatting fingerprint
+        metadata = self.scheduler.read(
+            "metadata", self.spreadsheet.fetch_sheet_metadata, params={'fields': 'sheets(properties,developerMetadata)'}
+        )
+        worksheets = {}
+        self.format_fingerprints = {}
+        self.row_counts: Dict[str, int] = {}
+        self.col_counts: Dict[str, int] = {}
+        for sheet in metadata.get('sheets', []):
+            worksheet = gspread.Worksheet(self.spreadsheet, sheet['properties'], self.spreadsheet.id, self.spreadsheet.client)
+            worksheets[worksheet.title] = worksheet
+            grid = sheet['properties'].get('gridProperties', {})
+            self.row_counts[worksheet.title] = grid.get('rowCount', settings.sheets_new_worksheet_rows)
+            self.col_counts[worksheet.title] = grid.get('columnCount', 26)
+            for meta in sheet.get('developerMetadata', []):
+                if meta.get('metadataKey') == FINGERPRINT_KEY:
+                    self.format_fingerprints[worksheet.title] = meta.get('metadataValue')
+
+        for layout in self.layouts:
+            if layout.worksheet_name not in worksheets:
+                log.info(f"Worksheet '{layout.worksheet_name}' not found. Creating it.")
+                cols = max([50] + [other.end_col for other in self.layouts if other.worksheet_name == layout.worksheet_name])
+                worksheets[layout.worksheet_name] = self.scheduler.write(
+                    "write", self.spreadsheet.add_worksheet,
+                    title=layout.worksheet_name, rows=str(settings.sheets_new_worksheet_rows), cols=str(cols)
+                )
+                self.row_counts[layout.worksheet_name] = settings.sheets_new_worksheet_rows
+                self.col_counts[layout.worksheet_name] = cols
+        return worksheets
+
+    def clean_dismissed_stocks(self, dry_run: bool = None) -> Dict[str, Any]:
+        """
+        Removes rows marked 'Dismissed' from every table and compacts the rest,
+        without scraping or re-applying formatting.
+        """
+        log.info("🧹 Cleaning dismissed stocks only.")
+        return self.update_scanned_stocks_report([], dry_run=dry_run, apply_formatting=False)
+
+    def update_scanned_stocks_report(self, all_scraped_data: List[Dict[str, Any]], dry_run: bool = None, apply_formatting: bool = True) -> Dict[str, Any]:
+        """
+        Merges the scraped results into their tables and writes only the cells that changed.
+        In dry-run mode the planned writes are logged and returned without touching the sheet.
+        """
+        dry_run = settings.sheets_dry_run if dry_run is None else dry_run
+        log.info(f"--- Starting Google Sheet Update{' (dry run)' if dry_run else ''} ---")
+
+        results_by_name = {result.get('scanner_name'): result for result in all_scraped_data if result}
+        unknown = set(results_by_name) - {layout.scanner_name for layout in self.layouts}
+        if unknown:
+            log.warning(f"No table configured for scanner(s): {', '.join(sorted(map(str, unknown)))}")
+
+        # 1. Read every table in a single request
+        existing_tables = self._read_tables(self.layouts)
+
+        # 2. Merge each table and diff it against what is already on the sheet
+        value_ranges = []
+        for layout, existing_grid in zip(self.layouts, existing_tables):
+            result = results_by_name.get(layout.scanner_name) or {}
+            value_ranges.extend(self._plan_table(layout, existing_grid, result.get('data') or []))
+
+        # 3. Send only the changed ranges in a single request
+        plan = self._send_writes(value_ranges, dry_run)
+        if dry_run:
+            return plan
+
+        # Re-apply titles, headers, and formatting (excluding status column)
+        if apply_formatting:
+            self._format_worksheets()
+        log.info("✅ Google Sheet update finished successfully!")
+        return plan
+
+    def prefetch_tables(self):
+        """
+        Reads every table in one batch ahead of `write_table` calls, e.g. while scanners are still running.
+        Tables written in append-only mode are not read. If the read fails, each
+        `write_table` call reads its own table instead.
+        """
+        layouts = [layout for layout in self.layouts if not self._appends_only(layout)]
         try:
-            return self.spreadsheet.worksheet(settings.worksheet_name)
-        except gspread.exceptions.WorksheetNotFound:
-            log.info(f"Worksheet '{settings.worksheet_name}' not found. Creating it.")
-            worksheet = self.spreadsheet.add_worksheet(title=settings.worksheet_name, rows="1000", cols="50")
-            self._format_worksheet(num_tables=2)
-            return worksheet
-
-    def update_scanned_stocks_report(self, all_scraped_data: List[Dict[str, Any]]):
-        log.info("--- Starting Google Sheet Update ---")
-        
-        table_defs = [
-            {'start_col_char': 'A', 'end_col_char': 'G', 'status_col_index': 6},
-            {'start_col_char': 'J', 'end_col_char': 'P', 'status_col_index': 6}
-        ]
+            grids = self._read_tables(layouts)
+        except gspread.exceptions.APIError:
+            log.warning("Prefetch failed; tables will be read one at a time as they are written.")
+            self._prefetched_tables = {}
+            return
+        self._prefetched_tables = dict(zip((layout.scanner_name for layout in layouts), grids))
+        log.info(f"📥 Prefetched {len(self._prefetched_tables)} table(s).")
+
+    def write_table(self, result: Dict[str, Any], dry_run: bool = None) -> Dict[str, Any]:
+        """
+        Merges and writes a single scanner's table as soon as its result is ready.
+        Uses the prefetched contents when available, otherwise reads just this table;
+        if that read fails, the error is raised and nothing is written.
+        """
+        dry_run = settings.sheets_dry_run if dry_run is None else dry_run
+        scanner_name = result.get('scanner_name')
+        layout = next((layout for layout in self.layouts if layout.scanner_name == scanner_name), None)
+        if layout is None:
+            log.warning(f"No table configured for scanner: {scanner_name}")
+            return self._describe_writes([])
+
+        if self._appends_only(layout):
+            return self._append_new_rows(layout, result.get('data') or [], dry_run)
+
+        if scanner_name in self._prefetched_tables:
+            existing_grid = self._prefetched_tables.pop(scanner_name)
+        else:
+            existing_grid = self._read_tables([layout])[0]
+
+        value_ranges = self._plan_table(layout, existing_grid, result.get('data') or [])
+        return self._send_writes(value_ranges, dry_run)
+
+    def format_worksheets(self, dry_run: bool = None):
+        """Applies formatting once all tables are written; a dry run leaves the sheet untouched."""
+        dry_run = settings.sheets_dry_run if dry_run is None else dry_run
+        if dry_run:
+            log.info("📝 [dry run] formatting skipped.")
+            return
+        self._format_worksheets()
+
+    def _appends_only(self, layout: TableLayout) -> bool:
+        """Append-only mode needs earlier history for the scanner; its first run does a full merge."""
+        return bool(settings.sheets_append_new_only and self.history and self.history.has_scanner(layout.scanner_name))
+
+    def _append_new_rows(self, layout: TableLayout, new_rows: List[List[Any]], dry_run: bool) -> Dict[str, Any]:
+        """
+        Appends the rows whose symbols the scan history has never seen for this scanner.
+        Sheets finds the end of the table itself, so nothing is read back; OVERWRITE keeps
+        tables beside this one in place.
+        """
+        unseen = set(self.history.unseen(layout.scanner_name, (row[1] for row in new_rows)))
+        rows = [row for row in new_rows if row[1] in unseen]
+        log.info(f"🆕 '{layout.scanner_name}': {len(rows)} new symbol(s) per scan history; appending without a read.")
+        if not rows:
+            return self._describe_writes([])
+
+        anchor = layout.range(settings.data_start_row - 1)
+        plan = self._describe_writes([{'range': anchor, 'values': rows}])
+        if dry_run:
+            log.info(f"📝 [dry run] append after {anchor}: {plan['cells']} cell(s)")
+            return plan
+        body = {'values': rows}
+        with metrics.span("sheets_write", chunks=1):
+            self.scheduler.write(
+                "append", self.spreadsheet.values_append, anchor,
+                params={'valueInputOption': 'USER_ENTERED', 'insertDataOption': 'OVERWRITE'}, body=body
+            )
+        metrics.incr("sheets_payload_bytes", len(json.dumps(body).encode('utf-8')), direction="up")
+        return plan
 
-        for i, result in enumerate(all_scraped_data):
-            if i >= len(table_defs):
-                break
-            
-            table_def = table_defs[i]
-            scanner_name = result.get('scanner_name', f'Scanner {i+1}')
-            
+    def _plan_table(self, layout: TableLayout, existing_grid: List[List[Any]], new_rows: List[List[Any]]) -> List[Dict[str, Any]]:
+        stock_count = [0]
+
+        def counted(rows: Iterator[List[Any]]) -> Iterator[List[Any]]:
+            for row in rows:
+                stock_count[0] += 1
+                yield row
+
+        final_stocks = counted(self._merge_table(layout, existing_grid, new_rows))
+        table_writes = self._table_writes(layout, existing_grid, final_stocks)
+        log.info(
+            f"✅ Prepared '{layout.scanner_name}' with {stock_count[0]} stocks "
+            f"({sum(len(w['values']) * len(w['values'][0]) for w in table_writes)} changed cells)."
+        )
+        return table_writes
+
+    def _send_writes(self, value_ranges: List[Dict[str, Any]], dry_run: bool) -> Dict[str, Any]:
+        plan = self._describe_writes(value_ranges)
+        if dry_run:
+            for write in plan['ranges']:
+                log.info(f"📝 [dry run] {write['range']}: {write['cells']} cell(s)")
+            log.info(f"📝 [dry run] {len(plan['ranges'])} range(s), {plan['cells']} cell(s), {plan['payload_bytes']} payload bytes.")
+            return plan
+
+        chunks = self._chunk_writes(value_ranges)
+        if chunks:
+            self._ensure_grid(value_ranges)
+            with metrics.span("sheets_write", chunks=len(chunks)):
+                if len(chunks) == 1:
+                    self._write_chunk(chunks[0])
+                else:
+                    # Chunks cover disjoint ranges, so they can be in flight together
+                    with ThreadPoolExecutor(max_workers=settings.sheets_write_concurrency) as pool:
+                        list(pool.map(self._write_chunk, chunks))
+        log.info(
+            f"📤 Wrote {len(value_ranges)} range(s), {plan['cells']} cell(s), {plan['payload_bytes']} bytes"
+            f" in {len(chunks)} request(s)."
+        )
+        return plan
+
+    def _write_chunk(self, chunk: List[Dict[str, Any]]):
+        body = {'valueInputOption': 'USER_ENTERED', 'data': chunk}
+        self.scheduler.values_batch_update(self.spreadsheet, body)
+        metrics.incr("sheets_payload_bytes", len(json.dumps(body).encode('utf-8')), direction="up")
+
+    @staticmethod
+    def _chunk_writes(value_ranges: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Splits the writes into requests of at most `sheets_write_chunk_cells` cells,
+        cutting tall ranges into row slices where needed.
+        """
+        limit = settings.sheets_write_chunk_cells
+        chunks: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        current_cells = 0
+        for write in value_ranges:
+            title, (first_row, first_col), (_, last_col) = _parse_range(write['range'])
+            width = last_col - first_col + 1
+            rows_per_slice = max(1, limit // width)
+            for start in range(0, len(write['values']), rows_per_slice):
+                values = write['values'][start:start + rows_per_slice]
+                cells = len(values) * width
+                if current and current_cells + cells > limit:
+                    chunks.append(current)
+                    current, current_cells = [], 0
+                if start == 0 and len(values) == len(write['values']):
+                    current.append(write)
+                else:
+                    top = first_row + start
+                    a1 = f"{rowcol_to_a1(top, first_col)}:{rowcol_to_a1(top + len(values) - 1, last_col)}"
+                    current.append({'range': absolute_range_name(title, a1), 'values': values})
+                current_cells += cells
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _ensure_grid(self, value_ranges: List[Dict[str, Any]]):
+        """
+        Grows worksheets whose grid is too short or too narrow for the given ranges, in one batchUpdate.
+        """
+        needed: Dict[str, Tuple[int, int]] = {}
+        for write in value_ranges:
+            title, _, (last_row, last_col) = _parse_range(write['range'])
+            rows, cols = needed.get(title, (0, 0))
+            needed[title] = (max(rows, last_row), max(cols, last_col))
+
+        requests = []
+        for title, (last_row, last_col) in needed.items():
+            grid = {}
+            if last_row > self.row_counts.get(title, last_row):
+                # Grow in whole read pages so the next few runs do not need to resize again
+                page = settings.sheets_read_chunk_rows
+                grid['rowCount'] = -(-last_row // page) * page + page
+                log.info(f"📏 Growing '{title}' from {self.row_counts[title]} to {grid['rowCount']} rows.")
+                self.row_counts[title] = grid['rowCount']
+            if last_col > self.col_counts.get(title, last_col):
+                grid['columnCount'] = last_col
+                log.info(f"📏 Widening '{title}' from {self.col_counts[title]} to {last_col} columns.")
+                self.col_counts[title] = last_col
+            if grid:
+                requests.append({'updateSheetProperties': {
+                    'properties': {'sheetId': self.worksheets[title].id, 'gridProperties': grid},
+                    'fields': ','.join(f'gridProperties.{field}' for field in grid),
+                }})
+
+        if requests:
+            self.scheduler.batch_update(self.spreadsheet, {'requests': requests}, label="resize")
+
+    def _read_tables(self, layouts: List[TableLayout]) -> List[List[List[Any]]]:
+        """
+        Reads every table, including its title and header rows, one page of
+        `sheets_read_chunk_rows` rows at a time. Each page is a single values batch-get
+        covering the tables that filled the previous page, until every table has ended.
+        A failed read raises rather than returning tables that look empty.
+        """
+        page = settings.sheets_read_chunk_rows
+        grids: List[List[List[Any]]] = [[] for _ in layouts]
+        pending = list(range(len(layouts)))
+        first_row = 1
+        while pending:
+            ranges = [layouts[i].range(first_row, first_row + page - 1) for i in pending]
             try:
-                read_range = f"{table_def['start_col_char']}3:{table_def['end_col_char']}1000"
-                existing_values = self.worksheet.get(read_range, value_render_option='FORMULA')
+                with metrics.span("sheets_read", first_row=first_row):
+                    response = self.scheduler.read(
+                        "read", self.spreadsheet.values_batch_get, ranges, params={'valueRenderOption': 'FORMULA'}
+                    )
             except gspread.exceptions.APIError as e:
-                log.error(f"Could not read from sheet for {scanner_name}: {e}")
-                existing_values = []
-            
-            num_existing_rows = len(existing_values)
-
-            # Map existing stocks by symbol, preserving their status
-            existing_stocks_map = {}
-            for row in existing_values:
-                if len(row) > 1 and row[1]:
-                    symbol = row[1]
-                    # Create a full row with blank strings for missing cells
-                    full_row = row + [''] * (len(settings.table_headers) - len(row))
-                    status = full_row[table_def['status_col_index']]
-                    existing_stocks_map[symbol] = {'row_data': full_row, 'status': status}
-
-            # Prepare a clean list of final stocks, excluding dismissed ones
-            final_stock_list = []
-            dismissed_count = 0
-            
-            # Process existing stocks
-            for symbol, data in existing_stocks_map.items():
-                if data['status'].strip().lower() == 'dismissed':
-                    dismissed_count += 1
-                    continue
-                final_stock_list.append(data['row_data'])
-
-            if dismissed_count > 0:
-                log.info(f"Identified {dismissed_count} 'Dismissed' stock(s) for removal in '{scanner_name}'.")
-
-            # Add new stocks
-            if result and result.get('data'):
-                for new_stock in result['data']:
-                    symbol = new_stock[1]
-                    if symbol not in existing_stocks_map:
-                        final_stock_list.append(new_stock)
-
-            # --- KEY CHANGE: Overwrite and then clear leftovers ---
-            # 1. Update the main data block
-            if final_stock_list:
-                update_range = f"{table_def['start_col_char']}3:{table_def['end_col_char']}{len(final_stock_list) + 2}"
-                self.worksheet.update(update_range, final_stock_list, value_input_option='USER_ENTERED')
-            
-            # 2. Clear any leftover rows if the new list is shorter than the old one
-            num_final_rows = len(final_stock_list)
-            if num_existing_rows > num_final_rows:
-                clear_start_row = 3 + num_final_rows
-                clear_end_row = 3 + num_existing_rows
-                leftover_range = f"{table_def['start_col_char']}{clear_start_row}:{table_def['end_col_char']}{clear_end_row}"
-                log.info(f"Clearing leftover data in range: {leftover_range}")
-                self.worksheet.batch_clear([leftover_range])
-
-            log.info(f"✅ Updated sheet for '{scanner_name}' with {len(final_stock_list)} stocks.")
+                # Diffing against a table that was never read would overwrite rows blindly
+                log.error(f"Could not read existing tables from sheet: {e}")
+                raise
+            metrics.incr("sheets_payload_bytes", len(json.dumps(response).encode('utf-8')), direction="down")
 
-        # Re-apply titles, headers, and formatting (excluding status column)
-        self._format_worksheet(num_tables=len(all_scraped_data))
-        log.info("✅ Google Sheet update finished successfully!")
+            # Trailing empty rows are trimmed, so a full page means the table may go on
+            still_pending = []
+            for i, value_range in zip(pending, response.get('valueRanges', [])):
+                rows = value_range.get('values', [])
+                grids[i].extend(rows)
+                if len(rows) == page:
+                    still_pending.append(i)
+            pending = still_pending
+            first_row += page
+        return grids
 
-    def _format_worksheet(self, num_tables: int):
-        log.info("🎨 Applying formatting...")
-        title_format = CellFormat(backgroundColor=Color(0.2, 0.2, 0.2), textFormat=TextFormat(bold=True, foregroundColor=Color(1, 1, 1), fontSize=12))
-        header_format = CellFormat(backgroundColor=Color(0.9, 0.9, 0.9), textFormat=TextFormat(bold=True))
-        
-        table_ranges = [
-            # Ranges updated to EXCLUDE the status column from any formatting
-            {'title_hdr': 'A{row}:F{row}', 'nums': 'C:F', 'title_merge': 'A1:G1'},
-            {'title_hdr': 'J{row}:O{row}', 'nums': 'L:O', 'title_merge': 'J1:P1'}
+    def _merge_table(self, layout: TableLayout, existing_grid: List[List[Any]], new_rows: List[List[Any]]) -> Iterator[List[Any]]:
+        """
+        Keeps existing stocks (with their status), drops dismissed ones,
+        and appends newly scanned symbols. Blank Buying Price and Stoploss cells of
+        a stock scanned again are filled from its new row, so a failed first lookup
+        is retried. Rows are yielded one at a time, so no second copy of the table is built.
+        """
+        # Index existing stocks by symbol; a repeated symbol keeps its first position and last row
+        positions: Dict[Any, int] = {}
+        for index in range(settings.data_start_row - 1, len(existing_grid)):
+            row = existing_grid[index]
+            if len(row) > 1 and row[1]:
+                positions[row[1]] = index
+
+        rescanned = {row[1]: row for row in new_rows}
+        dismissed_count = 0
+        for index in positions.values():
+            row = existing_grid[index]
+            # Create a full row with blank strings for missing cells
+            full_row = row + [''] * (layout.width - len(row))
+            if str(full_row[layout.status_col_index]).strip().lower() == 'dismissed':
+                dismissed_count += 1
+                continue
+            new_stock = rescanned.get(full_row[1])
+            if new_stock is not None:
+                for offset in (BUY_OFFSET, STOP_OFFSET):
+                    if full_row[offset] in ('', None) and new_stock[offset] not in ('', None):
+                        full_row[offset] = new_stock[offset]
+            yield full_row
+
+        if dismissed_count > 0:
+            log.info(f"Identified {dismissed_count} 'Dismissed' stock(s) for removal in '{layout.scanner_name}'.")
+
+        # Add new stocks
+        for new_stock in new_rows:
+            if new_stock[1] not in positions:
+                yield new_stock
+
+    def _table_writes(self, layout: TableLayout, existing_grid: List[List[Any]], final_stocks: Iterable[List[Any]]) -> List[Dict[str, Any]]:
+        """
+        Builds the value ranges for one table: only the cells of the title, header and
+        data rows that differ from the sheet, with leftover rows blanked.
+        """
+        title_row = [layout.scanner_name] + [''] * (layout.width - 1)
+        header_row = list(layout.headers)
+        header_formulas = self.formulas.header_cells(layout) if self.formulas else {}
+        for offset, formula in header_formulas.items():
+            header_row[offset] = formula
+        padding = [[]] * max(0, settings.data_start_row - 3)
+        desired_grid = itertools.chain([title_row, header_row], padding, final_stocks)
+        if header_formulas:
+            desired_grid = self._keep_spilled_cells(existing_grid, desired_grid, header_formulas, layout.width)
+
+        writes = []
+        for block in diff_grid(existing_grid, desired_grid, layout.width):
+            first_row = block.row + 1
+            writes.append({
+                'range': layout.range(first_row, first_row + block.height - 1, block.col, block.col + block.width - 1),
+                'values': block.values,
+            })
+        return writes
+
+    @staticmethod
+    def _keep_spilled_cells(existing_grid: List[List[Any]], desired_grid: Iterable[List[Any]], header_formulas: Dict[int, str], width: int) -> Iterator[List[Any]]:
+        """
+        Leaves the data cells under header array formulas as they are, so their output
+        can spill; only leftover per-row formulas there are cleared. Where the header
+        formula is new or has changed, the values below it cannot be its output (they may
+        be written prices or another formula's spill), so the whole column is cleared.
+        """
+        old_header = existing_grid[1] if len(existing_grid) > 1 else []
+        replaced = {
+            offset for offset, formula in header_formulas.items()
+            if (old_header[offset] if offset < len(old_header) else '') != formula
+        }
+        for row, (old_row, new_row) in enumerate(itertools.zip_longest(existing_grid, desired_grid)):
+            if row < settings.data_start_row - 1:
+                yield new_row or []
+                continue
+            old_row = old_row or []
+            new_row = list(new_row or [])
+            new_row += [''] * (width - len(new_row))
+            for offset in header_formulas:
+                old = old_row[offset] if offset < len(old_row) else ''
+                new_row[offset] = '' if offset in replaced or str(old).startswith('=') else old
+            yield new_row
+
+    @staticmethod
+    def _describe_writes(value_ranges: List[Dict[str, Any]]) -> Dict[str, Any]:
+        body = {'valueInputOption': 'USER_ENTERED', 'data': value_ranges}
+        ranges = [
+            {'range': write['range'], 'cells': len(write['values']) * len(write['values'][0])}
+            for write in value_ranges
         ]
+        return {
+            'ranges': ranges,
+            'cells': sum(write['cells'] for write in ranges),
+            'payload_bytes': len(json.dumps(body).encode('utf-8')) if value_ranges else 0,
+        }
+
+    def _format_worksheets(self):
+        """
+        Applies all formatting in a single batchUpdate, skipping worksheets whose
+        stored fingerprint shows the layout is already in place.
+        """
+        requests = []
+        for worksheet_name, worksheet in self.worksheets.items():
+            layouts = [layout for layout in self.layouts if layout.worksheet_name == worksheet_name]
+            if not layouts:
+                continue
 
-        set_frozen(self.worksheet, rows=2)
+            sheet_requests = build_format_requests(worksheet.id, layouts)
+            layout_fingerprint = fingerprint(sheet_requests)
+            stored_fingerprint = self.format_fingerprints.get(worksheet_name)
+            if stored_fingerprint == layout_fingerprint:
+                continue
 
-        for i in range(num_tables):
-            # Update titles and headers
-            self.worksheet.merge_cells(table_ranges[i]['title_merge'], merge_type='MERGE_ALL')
-            format_cell_range(self.worksheet, table_ranges[i]['title_merge'], title_format)
-            format_cell_range(self.worksheet, table_ranges[i]['title_hdr'].format(row=2), header_format)
-            
-            # Format number columns
-            num_format = NumberFormat(type='NUMBER', pattern="#,##,##0.00")
-            format_cell_range(self.worksheet, table_ranges[i]['nums'], CellFormat(numberFormat=num_format))
+            requests.extend(sheet_requests)
+            requests.append(fingerprint_request(worksheet.id, layout_fingerprint, exists=stored_fingerprint is not None))
+            self.format_fingerprints[worksheet_name] = layout_fingerprint
 
-        self.worksheet.columns_auto_resize(0, 20)
-        log.info("✨ Formatting applied successfully, status column untouched.")
\ No newline at end of file
+        if not requests:
+            log.info("🎨 Formatting unchanged; skipping.")
+            return
+
+        log.info("🎨 Applying formatting...")
+        with metrics.span("sheets_format"):
+            self.scheduler.batch_update(self.spreadsheet, {'requests': requests}, label="format")
+        metrics.incr("sheets_payload_bytes", len(json.dumps(requests).encode('utf-8')), direction="up")
+        log.info(f"✨ Formatting applied in one batch ({len(requests)} requests), status column untouched.")
@@ -0,0 +1,143 @@
+# app/utils/metrics.py
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Tuple
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Dict[str, Any]) -> LabelSet:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _prom_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ""
+    def escape(value: str) -> str:
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels) + "}"
+
+class RunMetrics:
+    """
+    Lightweight per-run tracing: timed spans for each stage and scanner, plus
+    counters for browser round trips, Sheets API calls, payload bytes and retries.
+    Safe to use from worker threads.
+    """
+    PREFIX = "chartink"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self._origin = time.perf_counter()
+            self.spans: List[Dict[str, Any]] = []
+            self.counters: Dict[Tuple[str, LabelSet], float] = {}
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[None]:
+        """Times the enclosed block; failures are recorded with ok=False."""
+        started = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            with self._lock:
+                self.spans.append({
+                    'name': name,
+                    'labels': dict(_labels(labels)),
+                    'start': round(started - self._origin, 6),
+                    'duration': round(duration, 6),
+                    'ok': ok,
+                })
+
+    def incr(self, name: str, value: float = 1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'started_at': datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+                'duration': round(time.perf_counter() - self._origin, 6),
+                'spans': list(self.spans),
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+            }
+
+    def merge(self, report: Dict[str, Any], **labels):
+        """
+        Folds another process's `report()` into this run, e.g. a shard worker's.
+        Its spans and counters gain `labels`; span starts are shifted onto this run's clock.
+        """
+        offset = datetime.fromisoformat(report['started_at']).timestamp() - self.started_at
+        extra = dict(_labels(labels))
+        with self._lock:
+            for span in report['spans']:
+                self.spans.append({**span, 'labels': {**span['labels'], **extra}, 'start': round(span['start'] + offset, 6)})
+            for counter in report['counters']:
+                key = (counter['name'], _labels({**counter['labels'], **extra}))
+                self.counters[key] = self.counters.get(key, 0) + counter['value']
+
+    def to_prometheus(self) -> str:
+        """Renders the run in Prometheus textfile-collector format."""
+        report = self.report()
+        lines = [
+            f"# TYPE {self.PREFIX}_run_duration_seconds gauge",
+            f"{self.PREFIX}_run_duration_seconds {report['duration']}",
+            f"# TYPE {self.PREFIX}_run_timestamp_seconds gauge",
+            f"{self.PREFIX}_run_timestamp_seconds {self.started_at:.0f}",
+        ]
+
+        span_totals: Dict[LabelSet, List[float]] = {}
+        for span in report['spans']:
+            key = _labels({'span': span['name'], **span['labels']})
+            totals = span_totals.setdefault(key, [0.0, 0, 0])
+            totals[0] += span['duration']
+            totals[1] += 1
+            totals[2] += 0 if span['ok'] else 1
+        if span_totals:
+            for suffix, index, kind in (('seconds', 0, 'gauge'), ('count', 1, 'gauge'), ('failures', 2, 'gauge')):
+                lines.append(f"# TYPE {self.PREFIX}_span_{suffix} {kind}")
+                for key, totals in sorted(span_totals.items()):
+                    lines.append(f"{self.PREFIX}_span_{suffix}{_prom_labels(key)} {round(totals[index], 6)}")
+
+        seen = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = f"{self.PREFIX}_{name}_total"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{_prom_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory: str) -> Tuple[str, str]:
+        """
+        Writes `run-<timestamp>.json` and `chartink.prom` into `directory`.
+        The .prom file is replaced atomically so a textfile collector never reads a partial file.
+        """
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.fromtimestamp(self.started_at, timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        json_path = os.path.join(directory, f"run-{stamp}.json")
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+        prom_path = os.path.join(directory, f"{self.PREFIX}.prom")
+        with open(prom_path + ".tmp", 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(prom_path + ".tmp", prom_path)
+        return json_path, prom_path
+
+# Create a singleton metrics instance
+metrics = RunMetrics()
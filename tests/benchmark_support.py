@@ -0,0 +1,260 @@
+# tests/benchmark_support.py
+"""
+Offline stand-ins used by the benchmark suite: a local ChartInk server that serves
+the recorded screener fixtures, and an in-memory spreadsheet that behaves like
+gspread's values/batchUpdate API while counting calls and payload bytes.
+"""
+
+import copy
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+from typing import Any, Dict, List
+from unittest.mock import MagicMock
+from urllib.parse import parse_qs, urlparse
+
+import gspread
+from gspread.http_client import HTTPClient
+from gspread.utils import a1_to_rowcol
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+ROWS_PER_PAGE = 25
+CSRF_TOKEN = "benchmark-token"
+SCAN_CLAUSE = "( {cash} ( latest close > 100 and latest volume > 10000 ) )"
+
+def load_fixture(*parts: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, *parts), encoding='utf-8') as f:
+        return f.read()
+
+def screener_records(total: int) -> List[Dict[str, Any]]:
+    """Repeats the recorded scan results until `total` records with unique symbols exist."""
+    recorded = json.loads(load_fixture('chartink', 'process_records.json'))
+    records = []
+    for i in range(total):
+        record = dict(recorded[i % len(recorded)])
+        cycle = i // len(recorded)
+        if cycle:
+            record['nsecode'] = f"{record['nsecode']}{cycle}" if record['nsecode'] else ""
+            record['bsecode'] = f"{record['bsecode']}{cycle}"
+            record['name'] = f"{record['name']} {cycle}"
+        record['sr'] = i + 1
+        records.append(record)
+    return records
+
+class ChartInkFixtureHandler(BaseHTTPRequestHandler):
+    """
+    Serves `/screener/pages-<n>` as n result pages of ROWS_PER_PAGE rows, and the
+    matching JSON from the scan-processing endpoint (chosen by the Referer header).
+    """
+    template = Template(load_fixture('chartink', 'screener.html'))
+    lock = threading.Lock()
+    requests_served = 0
+    bytes_served = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    @staticmethod
+    def page_count(path: str) -> int:
+        name = urlparse(path).path.rstrip('/').rsplit('/', 1)[-1]
+        return int(name.split('-')[-1]) if name.startswith('pages-') else 1
+
+    def do_GET(self):
+        pages = self.page_count(self.path)
+        page = int(parse_qs(urlparse(self.path).query).get('page', ['1'])[0])
+        records = screener_records(pages * ROWS_PER_PAGE)[(page - 1) * ROWS_PER_PAGE:page * ROWS_PER_PAGE]
+        rows = "\n".join(
+            f"<tr><td>{r['sr']}</td><td>{r['name']}</td><td>{r['nsecode'] or r['bsecode']}</td>"
+            f"<td>P&amp;F | F.A</td><td>{r['per_chg']}%</td><td>{r['close']}</td><td>{r['volume']}</td></tr>"
+            for r in records
+        )
+        body = self.template.substitute(
+            csrf_token=CSRF_TOKEN, title=f"Benchmark {pages} pages",
+            scan_clause=SCAN_CLAUSE.replace('>', '&gt;'), rows=rows,
+            first=(page - 1) * ROWS_PER_PAGE + 1, last=(page - 1) * ROWS_PER_PAGE + len(records),
+            total=pages * ROWS_PER_PAGE, previous_page=page - 1, next_page=page + 1,
+            previous_disabled="disabled" if page == 1 else "", next_disabled="disabled" if page >= pages else "",
+        )
+        self._send(200, body, "text/html")
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("X-CSRF-TOKEN") != CSRF_TOKEN:
+            self._send(419, "{}", "application/json")
+            return
+        records = screener_records(self.page_count(self.headers.get("Referer", "")) * ROWS_PER_PAGE)
+        payload = {"draw": 1, "recordsTotal": len(records), "recordsFiltered": len(records), "data": records}
+        self._send(200, json.dumps(payload), "application/json")
+
+    def _send(self, status, body, content_type):
+        encoded = body.encode()
+        with self.lock:
+            ChartInkFixtureHandler.requests_served += 1
+            ChartInkFixtureHandler.bytes_served += len(encoded)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    @classmethod
+    def reset_counters(cls):
+        with cls.lock:
+            cls.requests_served = 0
+            cls.bytes_served = 0
+
+class ChartInkFixtureServer:
+    """Runs ChartInkFixtureHandler on a free local port in a background thread."""
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ChartInkFixtureHandler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def url(self, pages: int) -> str:
+        return f"{self.base_url}/screener/pages-{pages}"
+
+class InMemorySpreadsheet:
+    """
+    Just enough of gspread.Spreadsheet for SheetsService, backed by Python lists.
+    Every API method counts one call plus its JSON request and response bytes.
+    """
+    id = "in-memory-spreadsheet"
+
+    def __init__(self):
+        self.client = MagicMock(spec=HTTPClient)
+        self.grids: Dict[str, List[List[Any]]] = {}
+        self.sheets: List[Dict[str, Any]] = []
+        self.calls: Dict[str, int] = {}
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self.lock = threading.Lock()  # SheetsService may send write chunks concurrently
+
+    @property
+    def api_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset_counters(self):
+        self.calls.clear()
+        self.bytes_up = 0
+        self.bytes_down = 0
+
+    def _count(self, method: str, request: Any, response: Any) -> Any:
+        up = len(json.dumps(request).encode('utf-8')) if request is not None else 0
+        down = len(json.dumps(response).encode('utf-8')) if response is not None else 0
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            self.bytes_up += up
+            self.bytes_down += down
+        return response
+
+    def seed(self, title: str, rows: List[List[Any]]):
+        """Puts rows on a worksheet (creating it) without counting API calls."""
+        if title not in self.grids:
+            self._create(title)
+        self.grids[title] = [list(row) for row in rows]
+        grid = next(s for s in self.sheets if s['properties']['title'] == title)['properties']['gridProperties']
+        grid['rowCount'] = max(grid['rowCount'], len(rows))
+
+    def _create(self, title: str) -> Dict[str, Any]:
+        properties = {'sheetId': len(self.sheets) + 1, 'title': title, 'index': len(self.sheets),
+                      'gridProperties': {'rowCount': 1000, 'columnCount': 50}}
+        self.sheets.append({'properties': properties, 'developerMetadata': []})
+        self.grids[title] = []
+        return properties
+
+    def fetch_sheet_metadata(self, params=None):
+        return self._count('fetch_sheet_metadata', params, {'sheets': copy.deepcopy(self.sheets)})
+
+    def add_worksheet(self, title, rows, cols):
+        properties = self._create(title)
+        self._count('add_worksheet', {'title': title, 'rows': rows, 'cols': cols}, properties)
+        return gspread.Worksheet(self, properties, self.id, self.client)
+
+    def values_batch_get(self, ranges, params=None):
+        value_ranges = []
+        for a1 in ranges:
+            title, (first_row, first_col), (last_row, last_col) = self._parse(a1)
+            grid = self.grids.get(title, [])
+            rows = [
+                (row[first_col - 1:last_col] if len(row) >= first_col else [])
+                for row in grid[first_row - 1:last_row]
+            ]
+            rows = [self._rstrip(row) for row in rows]
+            while rows and not rows[-1]:
+                rows.pop()
+            value_range = {'range': a1, 'majorDimension': 'ROWS'}
+            if rows:
+                value_range['values'] = rows
+            value_ranges.append(value_range)
+        return self._count('values_batch_get', {'ranges': ranges, 'params': params},
+                           {'spreadsheetId': self.id, 'valueRanges': value_ranges})
+
+    def values_batch_update(self, body):
+        with self.lock:
+            self._apply_writes(body)
+        cells = sum(len(w['values']) * len(w['values'][0]) for w in body['data'])
+        return self._count('values_batch_update', body, {'totalUpdatedCells': cells})
+
+    def _apply_writes(self, body):
+        for write in body['data']:
+            title, (first_row, first_col), _ = self._parse(write['range'])
+            grid = self.grids.setdefault(title, [])
+            for r, values in enumerate(write['values']):
+                row_index = first_row - 1 + r
+                while len(grid) <= row_index:
+                    grid.append([])
+                row = grid[row_index]
+                row.extend([''] * (first_col - 1 + len(values) - len(row)))
+                row[first_col - 1:first_col - 1 + len(values)] = values
+
+    def batch_update(self, body):
+        for request in body.get('requests', []):
+            resize = request.get('updateSheetProperties', {}).get('properties')
+            if resize:
+                sheet = next(s for s in self.sheets if s['properties']['sheetId'] == resize['sheetId'])
+                sheet['properties']['gridProperties'].update(resize['gridProperties'])
+            metadata = request.get('createDeveloperMetadata', {}).get('developerMetadata')
+            if metadata:
+                sheet = next(s for s in self.sheets if s['properties']['sheetId'] == metadata['location']['sheetId'])
+                sheet['developerMetadata'] = [metadata]
+            update = request.get('updateDeveloperMetadata')
+            if update:
+                sheet_id = update['dataFilters'][0]['developerMetadataLookup']['metadataLocation']['sheetId']
+                for sheet in self.sheets:
+                    if sheet['properties']['sheetId'] == sheet_id:
+                        for meta in sheet['developerMetadata']:
+                            meta['metadataValue'] = update['developerMetadata']['metadataValue']
+        return self._count('batch_update', body, {'replies': [{} for _ in body.get('requests', [])]})
+
+    @staticmethod
+    def _rstrip(row: List[Any]) -> List[Any]:
+        row = list(row)
+        while row and row[-1] in ('', None):
+            row.pop()
+        return row
+
+    @staticmethod
+    def _parse(a1: str):
+        title, cells = a1.rsplit('!', 1)
+        first, _, last = cells.partition(':')
+        return title.strip("'").replace("''", "'"), a1_to_rowcol(first), a1_to_rowcol(last or first)
+
+class InMemoryClient:
+    """Stands in for gspread.Client; `open` always returns the same spreadsheet."""
+
+    def __init__(self, spreadsheet: InMemorySpreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def open(self, title):
+        return self.spreadsheet
@@ -0,0 +1,192 @@
+# tests/test_benchmarks.py
+"""
+Offline performance benchmarks. Scrapers run against recorded ChartInk fixtures served
+from a local HTTP server, and sheet updates run against an in-memory spreadsheet.
+Each scenario fails when it exceeds its stored baseline in fixtures/benchmark_baselines.json.
+
+    BENCHMARK_UPDATE_BASELINES=1 python -m pytest tests/test_benchmarks.py   # re-record baselines
+    BENCHMARK_TIME_FACTOR=3 python -m pytest tests/test_benchmarks.py        # slower machines
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+from app.core.config import ScannerConfig, settings
+from app.services import scraper_service
+from app.services.http_scan_service import HttpScanService
+from app.services.sheets_service import SheetsService
+from app.utils.metrics import metrics
+from tests.benchmark_support import (
+    FIXTURES_DIR, ROWS_PER_PAGE, ChartInkFixtureHandler, ChartInkFixtureServer,
+    InMemoryClient, InMemorySpreadsheet,
+)
+
+BASELINES_PATH = os.path.join(FIXTURES_DIR, 'benchmark_baselines.json')
+UPDATE_BASELINES = os.environ.get('BENCHMARK_UPDATE_BASELINES') == '1'
+TIME_FACTOR = float(os.environ.get('BENCHMARK_TIME_FACTOR', '1'))
+PAGE_COUNTS = [1, 10, 50]
+EXISTING_ROW_COUNTS = {'10': 10, '1k': 1_000, '10k': 10_000}
+
+_measured = {}
+
+def load_baselines():
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+def tearDownModule():
+    if not (UPDATE_BASELINES and _measured):
+        return
+    baselines = load_baselines()
+    for scenario, measured in _measured.items():
+        # Counts are exact, bytes get a little slack, wall time a lot
+        baselines[scenario] = {
+            key: (max(0.5, round(value * 3, 2)) if key == 'seconds'
+                  else math.ceil(value * 1.05) if key.startswith('bytes') else value)
+            for key, value in measured.items()
+        }
+    with open(BASELINES_PATH, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(baselines.items())), f, indent=2)
+        f.write("\n")
+
+class BenchmarkCase(unittest.TestCase):
+    baselines = load_baselines()
+
+    def assertWithinBaseline(self, scenario, measured):
+        """Compares every recorded figure with its baseline, or records it in update mode."""
+        print(f"\n[benchmark] {scenario}: {measured}")
+        if UPDATE_BASELINES:
+            _measured[scenario] = measured
+            return
+        self.assertIn(scenario, self.baselines, f"No baseline for {scenario}; run with BENCHMARK_UPDATE_BASELINES=1")
+        for key, limit in self.baselines[scenario].items():
+            if key == 'seconds':
+                limit *= TIME_FACTOR
+            self.assertLessEqual(measured[key], limit, f"{scenario}: {key}={measured[key]} exceeds baseline {limit}")
+
+class TestScraperBenchmarks(BenchmarkCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ChartInkFixtureServer().__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.__exit__(None, None, None)
+
+    def setUp(self):
+        ChartInkFixtureHandler.reset_counters()
+        metrics.reset()
+
+    def test_http_backend(self):
+        for pages in PAGE_COUNTS:
+            with self.subTest(pages=pages):
+                ChartInkFixtureHandler.reset_counters()
+                scanner = ScannerConfig(name=f"{pages} pages", url=self.server.url(pages), backend="http")
+
+                started = time.perf_counter()
+                result = asyncio.run(HttpScanService(timeout_seconds=10).scrape_single_url(scanner))
+                elapsed = time.perf_counter() - started
+
+                self.assertEqual(len(result['data']), pages * ROWS_PER_PAGE)
+                self.assertWithinBaseline(f"scrape_http_{pages}_pages", {
+                    'requests': ChartInkFixtureHandler.requests_served,
+                    'bytes_down': ChartInkFixtureHandler.bytes_served,
+                    'seconds': round(elapsed, 3),
+                })
+
+    def test_playwright_backend(self):
+        try:
+            from playwright.sync_api import sync_playwright
+            with sync_playwright() as p:
+                browser_installed = os.path.exists(p.firefox.executable_path)
+        except Exception:
+            browser_installed = False
+        if not browser_installed:
+            self.skipTest("Playwright Firefox is not installed (run `playwright install firefox`).")
+
+        for pages in PAGE_COUNTS:
+            with self.subTest(pages=pages):
+                metrics.reset()
+                ChartInkFixtureHandler.reset_counters()
+                scanner = ScannerConfig(name=f"{pages} pages", url=self.server.url(pages))
+
+                started = time.perf_counter()
+                results = asyncio.run(scraper_service._run_playwright_scrapers([scanner]))
+                elapsed = time.perf_counter() - started
+
+                self.assertEqual(len(results[0]['data']), pages * ROWS_PER_PAGE)
+                round_trips = sum(c['value'] for c in metrics.report()['counters'] if c['name'] == 'browser_round_trips')
+                self.assertWithinBaseline(f"scrape_playwright_{pages}_pages", {
+                    'browser_round_trips': round_trips,
+                    'requests': ChartInkFixtureHandler.requests_served,
+                    'seconds': round(elapsed, 3),
+                })
+
+class TestSheetsBenchmarks(BenchmarkCase):
+    NEW_ROWS = 50
+
+    def setUp(self):
+        self.scanners = [
+            ScannerConfig(name="Primary", url="https://chartink.com/screener/primary"),
+            ScannerConfig(name="Secondary", url="https://chartink.com/screener/secondary"),
+        ]
+
+    @staticmethod
+    def stock_row(i, status=''):
+        return [f"Stock {i}", f"SYM{i}", f"{100 + i % 900}.5", str(10_000 + i), '', '', status]
+
+    def seeded_spreadsheet(self, existing_rows):
+        """One worksheet with both tables side by side; every 20th stock is dismissed."""
+        rows = [["Primary"] + [''] * 8 + ["Secondary"], settings.table_headers + ['', ''] + settings.table_headers]
+        for i in range(existing_rows):
+            row = self.stock_row(i, 'Dismissed' if i % 20 == 0 else '')
+            rows.append(row + ['', ''] + row)
+        spreadsheet = InMemorySpreadsheet()
+        spreadsheet.seed(settings.worksheet_name, rows)
+        return spreadsheet
+
+    def scan_results(self, existing_rows):
+        # Half of the new scan overlaps existing (not dismissed) stocks, half is new
+        symbols = range(existing_rows - self.NEW_ROWS // 2, existing_rows + self.NEW_ROWS // 2)
+        data = [self.stock_row(i) for i in symbols if i >= existing_rows or (i >= 0 and i % 20)]
+        return [{'scanner_name': scanner.name, 'data': data} for scanner in self.scanners]
+
+    def test_update_scanned_stocks_report(self):
+        for label, existing_rows in EXISTING_ROW_COUNTS.items():
+            with self.subTest(existing_rows=existing_rows):
+                spreadsheet = self.seeded_spreadsheet(existing_rows)
+                results = self.scan_results(existing_rows)
+
+                with patch.object(settings, 'scanners', self.scanners):
+                    started = time.perf_counter()
+                    service = SheetsService(client=InMemoryClient(spreadsheet))
+                    service.update_scanned_stocks_report(results)
+                    elapsed = time.perf_counter() - started
+
+                    # A rerun with the same scan finds nothing left to write or format
+                    first_run = (spreadsheet.api_calls, spreadsheet.bytes_up, spreadsheet.bytes_down)
+                    spreadsheet.reset_counters()
+                    SheetsService(client=InMemoryClient(spreadsheet)).update_scanned_stocks_report(results)
+
+                table = spreadsheet.values_batch_get([f"'{settings.worksheet_name}'!A3:G{existing_rows + self.NEW_ROWS}"])['valueRanges'][0]['values']
+                expected = existing_rows - len(range(0, existing_rows, 20)) + self.NEW_ROWS // 2
+                self.assertEqual(len(table), expected)
+                self.assertNotIn('values_batch_update', spreadsheet.calls)
+                self.assertNotIn('batch_update', spreadsheet.calls)
+
+                self.assertWithinBaseline(f"sheets_update_{label}_rows", {
+                    'api_calls': first_run[0],
+                    'bytes_up': first_run[1],
+                    'bytes_down': first_run[2],
+                    'seconds': round(elapsed, 3),
+                })
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# tests/test_browser_pool.py
+
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.core.config import settings
+from app.services.browser_pool import BrowserContextPool
+from app.services.proxy_pool import ProxyPool
+
+class FakeContext:
+    def __init__(self):
+        self.route_handler = None
+        self.close = AsyncMock()
+
+    async def route(self, pattern, handler):
+        self.route_handler = handler
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.proxies = []
+
+    async def new_context(self, proxy=None):
+        context = FakeContext()
+        self.contexts.append(context)
+        self.proxies.append(proxy)
+        return context
+
+def fake_route(resource_type, url="https://chartink.com/asset"):
+    route = MagicMock()
+    route.request.resource_type = resource_type
+    route.request.url = url
+    route.abort = AsyncMock()
+    route.continue_ = AsyncMock()
+    return route
+
+class TestBrowserContextPool(unittest.TestCase):
+
+    def test_concurrency_is_capped_and_contexts_are_reused(self):
+        browser = FakeBrowser()
+        active = 0
+        peak = 0
+
+        async def scan(pool, i):
+            nonlocal active, peak
+            async with pool.acquire(f"scan {i}"):
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        async def run():
+            pool = BrowserContextPool(browser, size=2)
+            await asyncio.gather(*[scan(pool, i) for i in range(6)])
+            await pool.close()
+
+        asyncio.run(run())
+        self.assertEqual(peak, 2)
+        self.assertEqual(len(browser.contexts), 2)
+        for context in browser.contexts:
+            context.close.assert_awaited_once()
+
+    def test_unneeded_resources_are_blocked_and_counted_per_scan(self):
+        browser = FakeBrowser()
+
+        async def run():
+            pool = BrowserContextPool(browser, size=1)
+            async with pool.acquire("first") as pooled:
+                handler = browser.contexts[0].route_handler
+                image, doc = fake_route("image"), fake_route("document")
+                tracker = fake_route("script", "https://www.google-analytics.com/analytics.js")
+                for route in (image, doc, tracker):
+                    await handler(route)
+                first_stats = (pooled.stats.requests, pooled.stats.bytes)
+            async with pool.acquire("second") as pooled:
+                second_stats = (pooled.stats.requests, pooled.stats.bytes)
+            return image, doc, tracker, first_stats, second_stats
+
+        image, doc, tracker, first_stats, second_stats = asyncio.run(run())
+        image.abort.assert_awaited_once()
+        tracker.abort.assert_awaited_once()
+        doc.continue_.assert_awaited_once()
+        self.assertEqual(first_stats[0], 2)
+        self.assertGreater(first_stats[1], 0)
+        self.assertEqual(second_stats, (0, 0))
+
+    def test_context_is_replaced_when_its_proxy_circuit_opens(self):
+        browser = FakeBrowser()
+        proxy_pool = ProxyPool(["10.0.0.1:80", "10.0.0.2:80"], scores_path="/nonexistent/scores.json")
+        proxy_pool.record_success("10.0.0.1:80", 0.1)
+        proxy_pool.record_success("10.0.0.2:80", 0.9)
+
+        async def run():
+            pool = BrowserContextPool(browser, size=1, proxy_pool=proxy_pool)
+            with self.assertRaises(RuntimeError):
+                async with pool.acquire("failing"):
+                    raise RuntimeError("proxy refused")
+            async with pool.acquire("retry"):
+                pass
+
+        with patch.object(settings, "proxy_failure_threshold", 1):
+            asyncio.run(run())
+
+        self.assertEqual(browser.proxies, [{"server": "http://10.0.0.1:80"}, {"server": "http://10.0.0.2:80"}])
+        browser.contexts[0].close.assert_awaited_once()
+
+if __name__ == '__main__':
+    unittest.main()
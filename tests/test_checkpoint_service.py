@@ -0,0 +1,76 @@
+# tests/test_checkpoint_service.py
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch, AsyncMock
+
+from app import main as app_main
+from app.core.config import ScannerConfig, settings
+from app.services.checkpoint_service import ScanCheckpoint
+
+class TestScanCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.scanners = [
+            ScannerConfig(name="One", url="https://chartink.com/screener/one"),
+            ScannerConfig(name="Two", url="https://chartink.com/screener/two"),
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def result(self, scanner, rows):
+        return {"scanner": scanner, "headers": settings.table_headers, "data": rows}
+
+    def test_results_round_trip_by_url_and_date(self):
+        checkpoint = ScanCheckpoint(self.directory, today=date(2026, 10, 1))
+        checkpoint.save(self.result(self.scanners[0], [["A", "A", "1", "2"]]))
+        checkpoint.save(self.result(self.scanners[1], []))
+
+        loaded = ScanCheckpoint(self.directory, today=date(2026, 10, 1)).load(self.scanners[0])
+        self.assertIs(loaded["scanner"], self.scanners[0])
+        self.assertEqual(loaded["data"], [["A", "A", "1", "2"]])
+        self.assertIsNone(checkpoint.load(self.scanners[1]))
+        self.assertIsNone(ScanCheckpoint(self.directory, today=date(2026, 10, 2)).load(self.scanners[0]))
+
+    def test_damaged_checkpoint_counts_as_missing(self):
+        checkpoint = ScanCheckpoint(self.directory, today=date(2026, 10, 1))
+        checkpoint.save(self.result(self.scanners[0], [["A", "A", "1", "2"]]))
+        path = checkpoint._path(self.scanners[0])
+        self.assertEqual(os.listdir(os.path.dirname(path)), [os.path.basename(path)])
+        with open(path, "w") as f:
+            f.write('{"headers": ["Stock Name"], "data": [["A", ')
+        self.assertIsNone(checkpoint.load(self.scanners[0]))
+
+    def test_prune_removes_previous_days(self):
+        ScanCheckpoint(self.directory, today=date(2026, 9, 30)).save(self.result(self.scanners[0], [["A", "A", "1", "2"]]))
+        ScanCheckpoint(self.directory, today=date(2026, 10, 1)).prune()
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_rerun_only_scrapes_scanners_without_a_checkpoint(self):
+        ScanCheckpoint(self.directory).save(self.result(self.scanners[0], [["A", "A", "1", "2"]]))
+
+        async def fake_run_scrapers(scanners, on_result=None):
+            results = [self.result(s, [["B", "B", "3", "4"]]) for s in scanners]
+            for result in results:
+                on_result(result)
+            return results
+
+        with patch.object(settings, "checkpoint_dir", self.directory), \
+                patch.object(app_main, "run_scrapers", AsyncMock(side_effect=fake_run_scrapers)) as scrapers:
+            results = asyncio.run(app_main.scrape_with_checkpoint(self.scanners))
+            self.assertEqual(scrapers.await_args.args, ([self.scanners[1]],))
+
+            scrapers.reset_mock()
+            asyncio.run(app_main.scrape_with_checkpoint(self.scanners))
+            scrapers.assert_not_awaited()
+
+        self.assertEqual([r["data"][0][1] for r in results], ["A", "B"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+# tests/test_cron_schedule.py
+
+import unittest
+from datetime import datetime, timezone
+
+from app.services.cron_schedule import CronSchedule
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+class TestCronSchedule(unittest.TestCase):
+
+    def test_monthly_schedule_fires_on_the_first(self):
+        schedule = CronSchedule("0 0 1 * *")
+        self.assertEqual(schedule.next_after(utc(2026, 10, 17, 9, 30)), utc(2026, 11, 1, 0, 0))
+        # Strictly after: a run at the exact minute schedules the next month
+        self.assertEqual(schedule.next_after(utc(2026, 11, 1, 0, 0)), utc(2026, 12, 1, 0, 0))
+
+    def test_lists_ranges_and_steps(self):
+        schedule = CronSchedule("*/15 9-10,14 * * 1-5")
+        # Friday 10:50 -> Friday 14:00, then Monday 09:00 after the last slot
+        self.assertEqual(schedule.next_after(utc(2026, 10, 16, 10, 50)), utc(2026, 10, 16, 14, 0))
+        self.assertEqual(schedule.next_after(utc(2026, 10, 16, 14, 45)), utc(2026, 10, 19, 9, 0))
+
+    def test_restricted_day_fields_match_either(self):
+        schedule = CronSchedule("30 6 13 * 7")
+        # Sunday the 18th comes before the 13th of next month
+        self.assertEqual(schedule.next_after(utc(2026, 10, 14)), utc(2026, 10, 18, 6, 30))
+        self.assertEqual(CronSchedule("0 0 29 2 *").next_after(utc(2026, 3, 1)), utc(2028, 2, 29))
+
+    def test_invalid_expressions_are_rejected(self):
+        for expression in ("0 0 1 *", "60 * * * *", "* * 0 * *", "*/0 * * * *", "a * * * *", "5-1 * * * *"):
+            with self.assertRaises(ValueError):
+                CronSchedule(expression)
+
+if __name__ == '__main__':
+    unittest.main()
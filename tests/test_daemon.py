@@ -0,0 +1,214 @@
+# tests/test_daemon.py
+
+import asyncio
+import json
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app import daemon as app_daemon
+from app.core.config import ScannerConfig, settings
+from app.services import formula_service, scraper_service
+from app.services.scraper_service import WarmBrowser
+from app.services.sheets_service import SheetsService
+
+class FakeSheets:
+    """Stand-in for SheetsService that records which tables were written."""
+    created = 0
+
+    def __init__(self):
+        FakeSheets.created += 1
+        self.scheduler = MagicMock()
+        self.refreshes = 0
+        self.written = []
+
+    def refresh(self):
+        self.refreshes += 1
+
+    def prefetch_tables(self):
+        pass
+
+    def write_table(self, result):
+        self.written.append(result['scanner_name'])
+
+    def format_worksheets(self):
+        pass
+
+async def http(port, method, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+class TestScanDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.scanners = [
+            ScannerConfig(name="One", url="https://chartink.com/screener/one", backend="http"),
+            ScannerConfig(name="Two", url="https://chartink.com/screener/two", backend="http", schedule="30 9 * * 1-5"),
+        ]
+        self.scraped = []
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        FakeSheets.created = 0
+        for patcher in (
+            patch.object(settings, "scanners", self.scanners),
+            patch.object(settings, "daemon_port", 0),
+            patch.object(settings, "metrics_dir", directory.name),
+            patch.object(settings, "history_dir", directory.name),
+            patch.object(settings, "price_columns", "formulas"),
+            patch.object(app_daemon, "SheetsService", FakeSheets),
+            patch.object(app_daemon, "run_scrapers", self.fake_run_scrapers),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def fake_run_scrapers(self, scanners, on_result=None, warm=None):
+        self.scraped.append([s.name for s in scanners])
+        results = [{"scanner": s, "headers": settings.table_headers, "data": [["N", s.name.upper(), "1", "2"]]} for s in scanners]
+        for result in results:
+            on_result(result)
+        return results
+
+    def test_triggers_run_on_the_warm_clients(self):
+        async def run():
+            daemon = app_daemon.ScanDaemon(self.scanners)
+            await daemon.start()
+            port = daemon.server.sockets[0].getsockname()[1]
+            try:
+                first = await http(port, "POST", "/scan?scanner=Two")
+                second = await http(port, "POST", "/scan")
+                missing = await http(port, "POST", "/scan?scanner=Nope")
+                while daemon.runs < 2:
+                    await asyncio.sleep(0.01)
+                health = await http(port, "GET", "/health")
+            finally:
+                await daemon.stop()
+            return daemon, first, second, missing, health
+
+        daemon, first, second, missing, health = asyncio.run(run())
+        self.assertEqual(first, (202, {"queued": ["Two"]}))
+        self.assertEqual(second[1]["queued"], ["One", "Two"])
+        self.assertEqual(missing[0], 404)
+        self.assertEqual(self.scraped, [["Two"], ["One", "Two"]])
+        # One sign-in at start-up; later runs only refresh it
+        self.assertEqual(FakeSheets.created, 1)
+        self.assertEqual(daemon.sheets.refreshes, 2)
+        self.assertEqual(daemon.sheets.written, ["Two", "One", "Two"])
+        self.assertEqual(health[1]["runs"], 2)
+        self.assertTrue(health[1]["last_run"]["ok"])
+
+    def test_failed_run_signs_in_again_next_time(self):
+        async def run():
+            daemon = app_daemon.ScanDaemon(self.scanners)
+            daemon.sheets = FakeSheets()
+            daemon.sheets.refresh = MagicMock(side_effect=RuntimeError("token revoked"))
+            failed = await daemon.run_scan(self.scanners[:1])
+            recovered = await daemon.run_scan(self.scanners[:1])
+            return failed, recovered
+
+        with patch("traceback.print_exc"):
+            self.assertEqual(asyncio.run(run()), (False, True))
+        self.assertEqual(FakeSheets.created, 2)
+
+    def test_schedule_fires_only_the_scanners_that_are_due(self):
+        now = datetime(2026, 10, 16, 9, 29, 59, 950000, tzinfo=timezone.utc)  # Friday
+        daemon = app_daemon.ScanDaemon(self.scanners, clock=lambda: now)
+        self.assertEqual(daemon.next_runs(), {
+            "One": datetime(2026, 11, 1, tzinfo=timezone.utc),
+            "Two": datetime(2026, 10, 16, 9, 30, tzinfo=timezone.utc),
+        })
+
+        async def run():
+            daemon.run_scan = AsyncMock(side_effect=asyncio.CancelledError)
+            with self.assertRaises(asyncio.CancelledError):
+                await daemon._schedule_loop()
+            return daemon.run_scan.await_args
+
+        args = asyncio.run(run())
+        self.assertEqual([s.name for s in args.args[0]], ["Two"])
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.close = AsyncMock()
+
+    def is_connected(self):
+        return self.connected
+
+class TestWarmBrowser(unittest.TestCase):
+
+    def test_browser_is_reused_then_recycled(self):
+        playwright = MagicMock()
+        playwright.firefox.launch = AsyncMock(side_effect=lambda: FakeBrowser())
+        playwright.stop = AsyncMock()
+        starter = MagicMock()
+        starter.return_value.start = AsyncMock(return_value=playwright)
+
+        async def run():
+            warm = WarmBrowser()
+            first = await warm.scraper()
+            warm.scans += 2
+            self.assertIs(await warm.scraper(), first)
+            warm.scans += 1
+            recycled = await warm.scraper()
+            self.assertIsNot(recycled, first)
+            first.pool.browser.close.assert_awaited_once()
+
+            recycled.pool.browser.connected = False
+            self.assertIsNot(await warm.scraper(), recycled)
+            await warm.shutdown()
+
+        with patch.object(scraper_service, "async_playwright", starter), \
+                patch.object(settings, "daemon_browser_recycle_scans", 3):
+            asyncio.run(run())
+        self.assertEqual(playwright.firefox.launch.await_count, 3)
+        starter.return_value.start.assert_awaited_once()
+        playwright.stop.assert_awaited_once()
+
+class TestSheetsRefresh(unittest.TestCase):
+
+    def make_service(self, expiry):
+        client = MagicMock()
+        client.open.return_value.fetch_sheet_metadata.return_value = {'sheets': []}
+        client.http_client.auth.expiry = expiry
+        with patch.object(settings, 'scanners', [ScannerConfig(name="One", url="https://chartink.com/screener/one")]):
+            service = SheetsService(client=client)
+            service.refresh()
+        return client
+
+    def test_token_is_renewed_only_near_expiry(self):
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        fresh = self.make_service(now + timedelta(hours=1))
+        fresh.http_client.auth.refresh.assert_not_called()
+        self.assertEqual(fresh.open.return_value.fetch_sheet_metadata.call_count, 2)
+
+        expiring = self.make_service(now + timedelta(minutes=2))
+        expiring.http_client.auth.refresh.assert_called_once()
+
+    def test_formula_dates_follow_the_month_across_runs(self):
+        class Today(date):
+            current = date(2026, 9, 30)
+
+            @classmethod
+            def today(cls):
+                return cls.current
+
+        client = MagicMock()
+        client.open.return_value.fetch_sheet_metadata.return_value = {'sheets': []}
+        client.http_client.auth.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+        with patch.object(settings, 'scanners', [ScannerConfig(name="One", url="https://chartink.com/screener/one")]), \
+                patch.object(settings, 'price_columns', 'formulas'), patch.object(settings, 'formula_strategy', 'array'), \
+                patch.object(formula_service, 'date', Today):
+            service = SheetsService(client=client)
+            self.assertEqual(service.formulas.start, date(2026, 8, 1))
+            Today.current = date(2026, 10, 1)
+            service.refresh()
+        self.assertEqual((service.formulas.start, service.formulas.end), (date(2026, 9, 1), date(2026, 9, 30)))
+
+if __name__ == '__main__':
+    unittest.main()
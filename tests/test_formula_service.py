@@ -0,0 +1,119 @@
+# tests/test_formula_service.py
+
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from app.core.config import ScannerConfig, settings
+from app.services.formula_service import (
+    ArrayFormulas, NamedFunctionFormulas, PerRowFormulas, get_formula_strategy,
+)
+from app.services.sheet_layout import build_table_layouts
+from app.services.sheets_service import SheetsService
+from tests.test_sheets_service import make_service, table
+
+class TestFormulaStrategies(unittest.TestCase):
+
+    def setUp(self):
+        scanners = [
+            ScannerConfig(name="One", url="https://chartink.com/screener/one"),
+            ScannerConfig(name="Two", url="https://chartink.com/screener/two"),
+        ]
+        self.layouts = build_table_layouts(scanners)
+
+    def test_per_row_mode_keeps_the_legacy_formulas(self):
+        buy, stop = PerRowFormulas().row_cells(self.layouts[1])
+        self.assertTrue(buy.startswith('=IF(NOT(ISBLANK(INDIRECT("J" & ROW())))'))
+        self.assertIn('GOOGLEFINANCE("NSE:"&INDIRECT("K" & ROW()), "high", EOMONTH(TODAY(), -2) + 1', buy)
+        self.assertIn('MIN(QUERY(GOOGLEFINANCE("BOM:"&INDIRECT("K" & ROW()), "low"', stop)
+        self.assertEqual(PerRowFormulas().header_cells(self.layouts[1]), {})
+
+    def test_array_mode_puts_one_non_volatile_formula_in_each_header(self):
+        strategy = ArrayFormulas(today=date(2026, 3, 15))
+        self.assertEqual(strategy.row_cells(self.layouts[1]), ("", ""))
+
+        cells = strategy.header_cells(self.layouts[1])
+        self.assertEqual(sorted(cells), [4, 5])
+        buy, stop = cells[4], cells[5]
+        self.assertTrue(buy.startswith('={"Buying Price"; BYROW(K3:K, LAMBDA(s, IF(s = "", "", IFERROR(MAX('))
+        self.assertIn('"high", DATE(2026, 2, 1), DATE(2026, 2, 28)', buy)
+        self.assertIn('MIN(INDEX(GOOGLEFINANCE("BOM:"&s, "low"', stop)
+        for formula in (buy, stop):
+            self.assertNotIn('TODAY', formula)
+            self.assertNotIn('INDIRECT', formula)
+
+    def test_named_function_mode_calls_the_sheet_function(self):
+        strategy = NamedFunctionFormulas("PREV_LEVEL", today=date(2026, 1, 5))
+        buy = strategy.header_cells(self.layouts[0])[4]
+        self.assertEqual(buy, '={"Buying Price"; BYROW(B3:B, LAMBDA(s, IF(s = "", "", PREV_LEVEL(s, "high", DATE(2025, 12, 1), DATE(2025, 12, 31)))))}')
+
+        definition = NamedFunctionFormulas.definition()
+        self.assertTrue(definition.startswith('=IF(symbol = "", "", IF(attribute = "high", IFERROR(MAX('))
+        self.assertIn('GOOGLEFINANCE("NSE:"&symbol, attribute, start_date, end_date)', definition)
+
+    def test_strategy_follows_settings(self):
+        with patch.object(settings, 'price_columns', 'values'):
+            self.assertIsNone(get_formula_strategy())
+        with patch.object(settings, 'price_columns', 'formulas'), patch.object(settings, 'formula_strategy', 'per_row'):
+            self.assertIsInstance(get_formula_strategy(), PerRowFormulas)
+        self.assertIsInstance(get_formula_strategy('named_function'), NamedFunctionFormulas)
+
+class TestArrayFormulaWrites(unittest.TestCase):
+
+    def setUp(self):
+        self.scanners = [ScannerConfig(name="One", url="https://chartink.com/screener/one")]
+
+    def make_service(self, existing, strategy):
+        with patch.object(settings, 'price_columns', 'formulas'), patch.object(settings, 'formula_strategy', strategy):
+            return make_service(self.scanners, existing)
+
+    def written(self, spreadsheet):
+        return {d['range']: d['values'] for d in spreadsheet.values_batch_update.call_args.args[0]['data']}
+
+    def test_headers_get_array_formulas_and_old_row_formulas_are_cleared(self):
+        existing = {'valueRanges': [table(
+            'One',
+            ['Old', 'OLD', 1, 2, '=IF(NOT(ISBLANK(INDIRECT("A" & ROW()))), 1, "")', '=IF(0, 0, 0)', ''],
+            ['Spilled', 'SPL', 1, 2, 101.5, 90.25, ''],
+        )]}
+        service, spreadsheet = self.make_service(existing, 'array')
+        with patch.object(SheetsService, '_format_worksheets'):
+            service.update_scanned_stocks_report([])
+
+        headers, first_row, second_row = self.written(spreadsheet)["'Scanned Stocks'!E2:F4"]
+        self.assertTrue(headers[0].startswith('={"Buying Price"; BYROW(B3:B'))
+        self.assertTrue(headers[1].startswith('={"Stoploss"; BYROW(B3:B'))
+        # A new header formula clears everything below it, per-row formulas and written prices alike
+        self.assertEqual((first_row, second_row), (['', ''], ['', '']))
+        self.assertEqual(len(self.written(spreadsheet)), 1)
+
+    def test_values_spilled_by_an_unchanged_header_formula_are_left_alone(self):
+        service, _ = self.make_service({'valueRanges': [table('One')]}, 'array')
+        header = list(settings.table_headers)
+        for offset, formula in service.formulas.header_cells(service.layouts[0]).items():
+            header[offset] = formula
+        existing = {'valueRanges': [{'values': [
+            ['One'] + [''] * 6, header,
+            ['Spilled', 'SPL', 1, 2, 101.5, 90.25, ''], ['Stale', 'STL', 1, 2, '=IF(0, 0, 0)', 90.25, ''],
+        ]}]}
+        service, spreadsheet = self.make_service(existing, 'array')
+        with patch.object(SheetsService, '_format_worksheets'):
+            service.update_scanned_stocks_report([])
+
+        self.assertEqual(self.written(spreadsheet), {"'Scanned Stocks'!E4:E4": [['']]})
+
+    def test_array_formula_payload_does_not_grow_with_rows(self):
+        def formula_chars(rows, strategy):
+            service, spreadsheet = self.make_service({'valueRanges': [table('One')]}, strategy)
+            buy, stop = service.formulas.row_cells(service.layouts[0])
+            data = [[f'Stock {i}', f'SYM{i}', '1', '2', buy, stop, ''] for i in range(rows)]
+            with patch.object(SheetsService, '_format_worksheets'):
+                service.update_scanned_stocks_report([{'scanner_name': 'One', 'data': data}])
+            writes = spreadsheet.values_batch_update.call_args.args[0]['data']
+            return sum(len(v) for w in writes for row in w['values'] for v in row if str(v).startswith('='))
+
+        self.assertEqual(formula_chars(10, 'array'), formula_chars(500, 'array'))
+        self.assertGreater(formula_chars(500, 'per_row'), 100 * formula_chars(500, 'array'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+# tests/test_history_store.py
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from app.core.config import ScannerConfig
+from app.services.history_store import ScanHistoryStore, main
+
+IPO = ScannerConfig(name="Monthly stocks from last 5 years IPO", url="https://chartink.com/screener/ipo")
+NIFTY = ScannerConfig(name="Monthly stocks for Nifty 100", url="https://chartink.com/screener/nifty")
+
+def result(scanner, *symbols):
+    return {"scanner": scanner, "data": [[f"{s} Ltd", s, "1,234.50", "10000"] for s in symbols]}
+
+class TestScanHistoryStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        store = ScanHistoryStore(self.directory)
+        store.append([result(IPO, "AAA", "BBB"), result(NIFTY, "AAA")], scanned_on=date(2026, 8, 1))
+        store.append([result(IPO, "AAA", "CCC")], scanned_on=date(2026, 9, 1))
+        store.append([result(IPO, "AAA", "CCC"), result(NIFTY, "DDD"), result(NIFTY)], scanned_on=date(2026, 9, 15))
+
+    def test_partitions_by_scanner_and_month(self):
+        ipo_dir = os.path.join(self.directory, "scanner=monthly-stocks-from-last-5-years-ipo")
+        self.assertEqual(sorted(os.listdir(ipo_dir)), ["month=2026-08", "month=2026-09"])
+        self.assertEqual(sorted(os.listdir(os.path.join(ipo_dir, "month=2026-09"))),
+                         ["2026-09-01.parquet", "2026-09-15.parquet"])
+
+    def test_membership_and_month_counts_come_from_the_index(self):
+        store = ScanHistoryStore(self.directory)
+        self.assertEqual(store.months_seen("AAA", IPO.name), ["2026-08", "2026-09"])
+        self.assertEqual(store.months_seen("AAA", NIFTY.name), ["2026-08"])
+        self.assertTrue(store.contains("CCC", IPO.name, "2026-09"))
+        self.assertFalse(store.contains("CCC", NIFTY.name))
+        self.assertEqual(store.entered("2026-09"), ["CCC", "DDD"])
+        self.assertEqual(store.entered("2026-09", NIFTY.name), ["DDD"])
+        self.assertEqual(store.unseen(IPO.name, ["CCC", "EEE", "BBB", "EEE"]), ["EEE"])
+
+    def test_same_day_rerun_replaces_the_snapshot(self):
+        store = ScanHistoryStore(self.directory)
+        store.append([result(IPO, "AAA", "CCC")], scanned_on=date(2026, 9, 15))
+        entry = store.index[(store.index.symbol == "CCC") & (store.index.scanner == IPO.name)].iloc[0]
+        self.assertEqual((entry.first_seen, entry.last_seen, entry.days), ("2026-09-01", "2026-09-15", 2))
+
+    def test_history_reads_typed_rows_for_one_symbol(self):
+        history = ScanHistoryStore(self.directory).history("AAA", IPO.name)
+        self.assertEqual(list(history.scanned_on), ["2026-08-01", "2026-09-01", "2026-09-15"])
+        self.assertEqual(history.price.iloc[0], 1234.5)
+        self.assertTrue(ScanHistoryStore(self.directory).history("ZZZ").empty)
+
+    def test_cli_answers_month_questions(self):
+        with patch("builtins.print") as printed:
+            main(["--dir", self.directory, "months", "AAA", "--scanner", IPO.name])
+        printed.assert_called_once_with("AAA: 2 month(s): 2026-08, 2026-09")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+# tests/test_http_scan_service.py
+
+import asyncio
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch, AsyncMock
+from urllib.parse import parse_qs
+
+from app.core.config import ScannerConfig
+from app.services.http_scan_service import HttpScanService
+from app.services import scraper_service
+
+CSRF_TOKEN = "test-token-123"
+SCAN_CLAUSE = "( {cash} ( latest close > 100 and latest volume > 10000 ) )"
+
+SCREENER_HTML = f"""<!DOCTYPE html>
+<html><head><meta name="csrf-token" content="{CSRF_TOKEN}"></head>
+<body><textarea name="scan_clause" style="display:none">{SCAN_CLAUSE.replace('>', '&gt;')}</textarea></body></html>
+"""
+
+RECORDS = [
+    {"sr": 1, "nsecode": "RELIANCE", "name": "Reliance Industries", "bsecode": "500325", "per_chg": 1.2, "close": 2950.5, "volume": 1200345},
+    {"sr": 2, "nsecode": "", "name": "BSE Only Ltd", "bsecode": "512345", "per_chg": -0.4, "close": 45.1, "volume": 9800},
+]
+
+class StandInChartInkHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the ChartInk screener page and scan-processing endpoint."""
+    received_posts = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/screener/broken":
+            self._send(200, "<html><body>no token here</body></html>", "text/html")
+        else:
+            self._send(200, SCREENER_HTML, "text/html")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        form = parse_qs(body)
+        self.received_posts.append({"path": self.path, "form": form, "csrf": self.headers.get("X-CSRF-TOKEN")})
+        if self.headers.get("X-CSRF-TOKEN") != CSRF_TOKEN:
+            self._send(419, "{}", "application/json")
+            return
+        payload = {"draw": 1, "recordsTotal": len(RECORDS), "recordsFiltered": len(RECORDS), "data": RECORDS}
+        self._send(200, json.dumps(payload), "application/json")
+
+    def _send(self, status, body, content_type):
+        encoded = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+class TestHttpScanService(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInChartInkHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StandInChartInkHandler.received_posts.clear()
+        self.service = HttpScanService(timeout_seconds=5)
+
+    def test_scrape_returns_playwright_shaped_result(self):
+        """The HTTP backend returns the same scanner/headers/data shape as Playwright."""
+        scanner = ScannerConfig(name="Test", url=f"{self.base_url}/screener/test-scan", backend="http")
+        result = asyncio.run(self.service.scrape_single_url(scanner))
+
+        self.assertIs(result["scanner"], scanner)
+        self.assertEqual(result["data"], [
+            ["Reliance Industries", "RELIANCE", "2950.5", "1200345"],
+            ["BSE Only Ltd", "512345", "45.1", "9800"],
+        ])
+        post = StandInChartInkHandler.received_posts[0]
+        self.assertEqual(post["path"], "/screener/process")
+        self.assertEqual(post["csrf"], CSRF_TOKEN)
+        self.assertEqual(post["form"]["scan_clause"], [SCAN_CLAUSE])
+
+    def test_scrape_returns_none_when_page_has_no_token(self):
+        """A page without a CSRF token fails the HTTP scan so Playwright can take over."""
+        scanner = ScannerConfig(name="Broken", url=f"{self.base_url}/screener/broken", backend="http")
+        self.assertIsNone(asyncio.run(self.service.scrape_single_url(scanner)))
+        self.assertEqual(StandInChartInkHandler.received_posts, [])
+
+    def test_run_scrapers_falls_back_to_playwright(self):
+        """Only failed or Playwright-configured scanners reach the browser, and order is kept."""
+        ok = ScannerConfig(name="OK", url=f"{self.base_url}/screener/ok", backend="http")
+        broken = ScannerConfig(name="Broken", url=f"{self.base_url}/screener/broken", backend="http")
+        browser_only = ScannerConfig(name="Browser", url=f"{self.base_url}/screener/browser")
+
+        async def fake_playwright(scanners, proxy_pool=None, on_result=None, warm=None):
+            return [{"scanner": s, "headers": [], "data": [["from", "browser", "1", "1"]]} for s in scanners]
+
+        with patch.object(scraper_service, "_run_playwright_scrapers", AsyncMock(side_effect=fake_playwright)) as mocked:
+            results = asyncio.run(scraper_service.run_scrapers([ok, broken, browser_only]))
+
+        mocked.assert_awaited_once_with([broken, browser_only], None, None, None)
+        self.assertEqual([r["scanner"].name for r in results], ["OK", "Broken", "Browser"])
+        self.assertEqual(results[0]["data"][0][1], "RELIANCE")
+        self.assertEqual(results[1]["data"][0][1], "browser")
+
+    def test_run_scrapers_skips_browser_when_all_http_succeed(self):
+        scanner = ScannerConfig(name="OK", url=f"{self.base_url}/screener/ok", backend="http")
+        with patch.object(scraper_service, "_run_playwright_scrapers", AsyncMock()) as mocked:
+            results = asyncio.run(scraper_service.run_scrapers([scanner]))
+        mocked.assert_not_awaited()
+        self.assertEqual(len(results[0]["data"]), 2)
+
+    def test_run_scrapers_streams_each_http_result(self):
+        fast = ScannerConfig(name="Fast", url=f"{self.base_url}/screener/ok", backend="http")
+        slow = ScannerConfig(name="Slow", url=f"{self.base_url}/screener/ok", backend="http")
+
+        async def run():
+            fast_delivered = asyncio.Event()
+            delivered = []
+
+            async def scrape(service, scanner):
+                if scanner is slow:
+                    await asyncio.wait_for(fast_delivered.wait(), 5)
+                return {"scanner": scanner, "headers": [], "data": []}
+
+            def on_result(result):
+                delivered.append(result["scanner"].name)
+                fast_delivered.set()
+
+            with patch.object(HttpScanService, "scrape_single_url", scrape):
+                await scraper_service.run_scrapers([slow, fast], on_result=on_result)
+            return delivered
+
+        # The slow scan only finishes once the fast one has been handed over
+        self.assertEqual(asyncio.run(run()), ["Fast", "Slow"])
+
+if __name__ == '__main__':
+    unittest.main()
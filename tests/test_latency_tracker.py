@@ -0,0 +1,67 @@
+# tests/test_latency_tracker.py
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from app.core.config import settings
+from app.services.latency_tracker import LatencyTracker
+
+class TestLatencyTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "latencies.json")
+
+    def test_fixed_budget_until_there_is_history(self):
+        tracker = LatencyTracker(self.path)
+        for seconds in (4, 5, 6, 7):
+            tracker.record("Scan", seconds)
+        self.assertIsNone(tracker.p95("Scan"))
+        self.assertEqual(tracker.budget("Scan"), (settings.scan_timeout_seconds / 2, settings.scan_timeout_seconds))
+
+    def test_budget_follows_p95_within_bounds(self):
+        tracker = LatencyTracker(self.path)
+        for seconds in [10] * 18 + [20, 40]:
+            tracker.record("Slow", seconds)
+        for seconds in [1] * 10:
+            tracker.record("Fast", seconds)
+        self.assertEqual(tracker.p95("Slow"), 20)
+        self.assertEqual(tracker.budget("Slow"), (20, 60))
+        # Very fast scanners still get the minimum timeout and hedge delay
+        self.assertEqual(tracker.budget("Fast"), (settings.scan_hedge_min_seconds, settings.scan_timeout_min_seconds))
+
+    def test_window_is_trimmed_and_saved(self):
+        tracker = LatencyTracker(self.path)
+        with patch.object(settings, "scan_latency_window", 3):
+            for seconds in range(1, 6):
+                tracker.record("Scan", seconds)
+        tracker.save()
+        self.assertEqual(LatencyTracker(self.path).samples, {"Scan": [3, 4, 5]})
+
+    def test_trackers_sharing_a_file_merge_their_samples(self):
+        LatencyTracker(self.path).save()
+        first, second = LatencyTracker(self.path), LatencyTracker(self.path)
+        first.record("A", 1)
+        second.record("B", 2)
+        second.record("A", 3)
+        first.save()
+        second.save()
+        second.save()
+        self.assertEqual(LatencyTracker(self.path).samples, {"A": [1, 3], "B": [2]})
+        self.assertEqual(os.listdir(self.directory), ["latencies.json"])
+
+    def test_damaged_file_starts_from_empty_history(self):
+        with open(self.path, "w") as f:
+            f.write('{"Scan": [1.5, 2.')
+        tracker = LatencyTracker(self.path)
+        self.assertEqual(tracker.samples, {})
+        tracker.record("Scan", 3)
+        tracker.save()
+        self.assertEqual(LatencyTracker(self.path).samples, {"Scan": [3]})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+# tests/test_main.py
+
+import asyncio
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from app import main as app_main
+from app.core.config import ScannerConfig, settings
+from app.services.history_store import ScanHistoryStore
+
+class FakeSheets:
+    """Blocking stand-in for SheetsService that records when each call happens."""
+
+    def __init__(self, events, open_delay):
+        time.sleep(open_delay)
+        self.scheduler = MagicMock()
+        self.events = events
+        self.events.append(("opened", time.perf_counter()))
+
+    def prefetch_tables(self):
+        self.events.append(("prefetched", time.perf_counter()))
+
+    def write_table(self, result):
+        time.sleep(0.05)
+        self.events.append((f"wrote {result['scanner_name']}", time.perf_counter()))
+
+    def format_worksheets(self):
+        self.events.append(("formatted", time.perf_counter()))
+
+class TestStreamingPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.scanners = [
+            ScannerConfig(name="Fast", url="https://chartink.com/screener/fast"),
+            ScannerConfig(name="Slow", url="https://chartink.com/screener/slow"),
+        ]
+        self.events = []
+
+    def run_pipeline(self, open_delay):
+        delays = {"Fast": 0.05, "Slow": 0.4}
+
+        async def fake_scrape(scanners, on_result=None):
+            async def scrape(scanner):
+                await asyncio.sleep(delays[scanner.name])
+                result = {"scanner": scanner, "headers": settings.table_headers, "data": [["N", scanner.name.upper(), "1", "2"]]}
+                self.events.append((f"scraped {scanner.name}", time.perf_counter()))
+                on_result(result)
+                return result
+            return await asyncio.gather(*[scrape(s) for s in scanners])
+
+        metrics_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(metrics_dir.cleanup)
+        with patch.object(settings, "scanners", self.scanners), \
+                patch.object(settings, "metrics_dir", metrics_dir.name), \
+                patch.object(settings, "history_dir", metrics_dir.name), \
+                patch.object(settings, "price_columns", "formulas"), \
+                patch.object(app_main, "scrape_with_checkpoint", fake_scrape), \
+                patch.object(app_main, "SheetsService", lambda: FakeSheets(self.events, open_delay)):
+            started = time.perf_counter()
+            asyncio.run(app_main.main())
+            return time.perf_counter() - started
+
+    def test_tables_are_written_as_each_scanner_completes(self):
+        elapsed = self.run_pipeline(open_delay=0.0)
+        order = [name for name, _ in self.events]
+
+        self.assertLess(order.index("wrote Fast"), order.index("scraped Slow"))
+        self.assertEqual(order[-1], "formatted")
+        self.assertLess(elapsed, 0.4 + 0.05 + 0.05 + 0.2)
+
+    def test_sheets_setup_overlaps_scraping(self):
+        elapsed = self.run_pipeline(open_delay=0.3)
+        # Sequential would be 0.4 (scrape) + 0.3 (auth) + writes; overlap keeps it near the max
+        self.assertLess(elapsed, 0.4 + 0.3)
+        times = dict(self.events)
+        self.assertLess(times["opened"], times["scraped Slow"])
+
+class TestShardedRun(unittest.TestCase):
+
+    def setUp(self):
+        self.scanners = [ScannerConfig(name=f"S{i}", url=f"https://chartink.com/screener/s{i}") for i in range(5)]
+        self.events = []
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def run_mode(self, coroutine_fn, failing=()):
+        async def fake_scrape(scanners, on_result=None):
+            if any(s.name in failing for s in scanners):
+                raise RuntimeError("browser crashed")
+            return [{"scanner": s, "headers": settings.table_headers, "data": [["N", s.name, "1", "2"]]} for s in scanners]
+
+        # Threads stand in for worker processes so the patches below apply to every shard
+        with patch.object(settings, "scanners", self.scanners), \
+                patch.object(settings, "metrics_dir", self.directory.name), \
+                patch.object(settings, "shard_artifact_dir", self.directory.name), \
+                patch.object(settings, "history_dir", self.directory.name), \
+                patch.object(settings, "price_columns", "formulas"), \
+                patch.object(app_main, "scrape_with_checkpoint", fake_scrape), \
+                patch.object(app_main, "ProcessPoolExecutor", lambda max_workers, mp_context: ThreadPoolExecutor(max_workers)), \
+                patch.object(app_main, "SheetsService", lambda: FakeSheets(self.events, 0.0)):
+            asyncio.run(coroutine_fn())
+        return [name for name, _ in self.events]
+
+    def test_workers_scrape_every_shard_then_write_once(self):
+        order = self.run_mode(lambda: app_main.run_sharded(3))
+        self.assertCountEqual([e for e in order if e.startswith("wrote")], [f"wrote {s.name}" for s in self.scanners])
+        self.assertEqual(order.count("opened"), 1)
+        self.assertEqual(order[-1], "formatted")
+
+    def test_failed_shard_leaves_only_its_tables_out(self):
+        order = self.run_mode(lambda: app_main.run_sharded(2), failing={"S0"})
+        written = [e for e in order if e.startswith("wrote")]
+        self.assertTrue(written)
+        self.assertNotIn("wrote S0", written)
+        self.assertLess(len(written), len(self.scanners))
+
+    def test_separate_shard_jobs_are_merged(self):
+        async def shards_then_merge():
+            for i in range(2):
+                await app_main.scrape_shard(i, 2)
+            await app_main.merge_shards()
+
+        order = self.run_mode(shards_then_merge)
+        self.assertEqual([e for e in order if e.startswith("wrote")], [f"wrote {s.name}" for s in self.scanners])
+        # Written results also land in the scan history
+        self.assertEqual(ScanHistoryStore(self.directory.name).symbols(), [s.name for s in self.scanners])
+
+    def test_shard_and_worker_arguments(self):
+        self.assertEqual(app_main.parse_args(["--shard", "1/4"]).shard, (1, 4))
+        self.assertEqual(app_main.parse_args(["--workers", "3"]).workers, 3)
+        with patch("sys.stderr"):
+            for argv in (["--shard", "4/4"], ["--workers", "0"], ["--shard", "0/2", "--merge"]):
+                with self.assertRaises(SystemExit):
+                    app_main.parse_args(argv)
+
+if __name__ == '__main__':
+    unittest.main()
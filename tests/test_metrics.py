@@ -0,0 +1,83 @@
+# tests/test_metrics.py
+
+import json
+import os
+import tempfile
+import unittest
+
+from app.utils.metrics import RunMetrics
+
+class TestRunMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = RunMetrics()
+
+    def test_spans_record_duration_labels_and_failures(self):
+        with self.metrics.span("scrape", scanner="Breakouts"):
+            pass
+        with self.assertRaises(ValueError):
+            with self.metrics.span("sheets_write"):
+                raise ValueError("quota")
+
+        spans = self.metrics.report()['spans']
+        self.assertEqual([s['name'] for s in spans], ["scrape", "sheets_write"])
+        self.assertEqual(spans[0]['labels'], {"scanner": "Breakouts"})
+        self.assertTrue(spans[0]['ok'])
+        self.assertFalse(spans[1]['ok'])
+        self.assertGreaterEqual(spans[0]['duration'], 0)
+
+    def test_counters_are_summed_per_label_set(self):
+        self.metrics.incr("sheets_api_calls", kind="read")
+        self.metrics.incr("sheets_api_calls", kind="read")
+        self.metrics.incr("sheets_api_calls", kind="write")
+        self.metrics.incr("sheets_payload_bytes", 512, direction="out")
+
+        counters = {(c['name'], tuple(c['labels'].items())): c['value'] for c in self.metrics.report()['counters']}
+        self.assertEqual(counters[("sheets_api_calls", (("kind", "read"),))], 2)
+        self.assertEqual(counters[("sheets_api_calls", (("kind", "write"),))], 1)
+        self.assertEqual(counters[("sheets_payload_bytes", (("direction", "out"),))], 512)
+
+    def test_worker_reports_are_merged_with_extra_labels(self):
+        worker = RunMetrics()
+        worker.started_at = self.metrics.started_at + 2
+        with worker.span("scrape", scanner="Breakouts"):
+            pass
+        worker.incr("browser_round_trips", 5, scanner="Breakouts")
+        self.metrics.incr("browser_round_trips", 1, scanner="Breakouts", shard="0/2")
+
+        self.metrics.merge(worker.report(), shard="0/2")
+        report = self.metrics.report()
+        self.assertEqual(report['spans'][0]['labels'], {"scanner": "Breakouts", "shard": "0/2"})
+        self.assertGreaterEqual(report['spans'][0]['start'], 2)
+        self.assertEqual(report['counters'], [
+            {'name': "browser_round_trips", 'labels': {"scanner": "Breakouts", "shard": "0/2"}, 'value': 6},
+        ])
+
+    def test_prometheus_output_declares_each_metric_once(self):
+        with self.metrics.span("scrape", scanner='Say "hi"'):
+            pass
+        self.metrics.incr("retries", stage="scrape")
+        self.metrics.incr("retries", stage="sheets")
+
+        text = self.metrics.to_prometheus()
+        self.assertEqual(text.count("# TYPE chartink_retries_total counter"), 1)
+        self.assertIn('chartink_retries_total{stage="scrape"} 1', text)
+        self.assertIn('chartink_span_count{scanner="Say \\"hi\\"",span="scrape"} 1', text)
+        self.assertIn("chartink_run_duration_seconds ", text)
+
+    def test_export_writes_json_report_and_textfile(self):
+        self.metrics.incr("browser_round_trips", 4, scanner="Breakouts")
+        with tempfile.TemporaryDirectory() as directory:
+            json_path, prom_path = self.metrics.export(directory)
+            with open(json_path, encoding='utf-8') as f:
+                report = json.load(f)
+            with open(prom_path, encoding='utf-8') as f:
+                prom = f.read()
+            leftovers = [name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+        self.assertEqual(report['counters'][0]['value'], 4)
+        self.assertIn('chartink_browser_round_trips_total{scanner="Breakouts"} 4', prom)
+        self.assertEqual(leftovers, [])
+
+if __name__ == '__main__':
+    unittest.main()
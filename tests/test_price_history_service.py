@@ -1,62 +1,131 @@
 # tests/test_price_history_service.py
 
+import os
+import shutil
+import tempfile
 import unittest
+from datetime import date
 from unittest.mock import patch
+
+import numpy as np
 import pandas as pd
 
 # We assume tests are run from the project's root directory.
-from app.services.price_history_service import PriceHistoryService
+from app.services.price_history_service import PriceHistoryService, monthly_high_low
+
+def daily_frame(prices, start="2026-08-01", end="2026-09-30"):
+    """
+    Builds a provider-shaped frame: daily rows, (field, ticker) columns.
+    `prices` maps ticker -> (base, step) so highs/lows are predictable.
+    """
+    index = pd.bdate_range(start, end)
+    columns = {}
+    for ticker, (base, step) in prices.items():
+        values = base + step * np.arange(len(index))
+        columns[('High', ticker)] = values + 1
+        columns[('Low', ticker)] = values - 1
+    frame = pd.DataFrame(columns, index=index)
+    frame.columns = pd.MultiIndex.from_tuples(frame.columns)
+    return frame
+
+class FakeProvider:
+    """Serves canned daily bars and records every bulk request."""
+
+    def __init__(self, prices, fail_times=0):
+        self.prices = prices
+        self.fail_times = fail_times
+        self.calls = []
+
+    def fetch_daily(self, tickers, start, end):
+        self.calls.append((list(tickers), start, end))
+        if self.fail_times:
+            self.fail_times -= 1
+            raise Exception("Yahoo Finance is down")
+        available = {t: self.prices[t] for t in tickers if t in self.prices}
+        if not available:
+            return pd.DataFrame()
+        return daily_frame(available)
 
 class TestPriceHistoryService(unittest.TestCase):
 
     def setUp(self):
-        """Set up a fresh instance of the service for each test."""
-        self.service = PriceHistoryService()
-
-    @patch('yfinance.Ticker')
-    def test_get_last_month_ohl_success(self, mock_ticker):
-        """Test successful retrieval of OHLC data."""
-        mock_instance = mock_ticker.return_value
-        mock_df = pd.DataFrame({
-            'High': [110, 115, 112],
-            'Low': [100, 105, 98]
+        """Set up a fresh cache directory and provider for each test."""
+        self.cache_dir = tempfile.mkdtemp()
+        self.provider = FakeProvider({
+            "RELIANCE.NS": (100.0, 1.0),
+            "M-M.NS": (50.0, -0.5),
+            "512345.BO": (10.0, 0.1),
         })
-        mock_instance.history.return_value = mock_df
+        self.service = PriceHistoryService(provider=self.provider, cache_dir=self.cache_dir)
+        self.today = date(2026, 10, 17)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_previous_month_high_low_in_one_bulk_request(self):
+        """All symbols are fetched together and September's high/low is returned."""
+        result = self.service.get_previous_month_high_low(["RELIANCE", "M&M"], today=self.today)
+
+        self.assertEqual(len(self.provider.calls), 1)
+        tickers, start, end = self.provider.calls[0]
+        self.assertEqual(sorted(tickers), ["M-M.NS", "RELIANCE.NS"])
+        self.assertEqual((start, end), (date(2026, 9, 1), date(2026, 9, 30)))
+
+        expected = daily_frame({"RELIANCE.NS": (100.0, 1.0), "M-M.NS": (50.0, -0.5)}).loc["2026-09"]
+        self.assertEqual(result["RELIANCE"], (round(expected[("High", "RELIANCE.NS")].max(), 2), round(expected[("Low", "RELIANCE.NS")].min(), 2)))
+        self.assertEqual(result["M&M"], (round(expected[("High", "M-M.NS")].max(), 2), round(expected[("Low", "M-M.NS")].min(), 2)))
+
+    def test_bse_fallback_only_requests_missing_symbols(self):
+        result = self.service.get_previous_month_high_low(["RELIANCE", "512345"], today=self.today)
+
+        self.assertEqual([sorted(c[0]) for c in self.provider.calls], [["512345.NS", "RELIANCE.NS"], ["512345.BO"]])
+        self.assertIn("512345", result)
+
+    def test_cached_months_are_not_fetched_again(self):
+        self.service.get_previous_month_high_low(["RELIANCE"], today=self.today)
+        self.provider.calls.clear()
+
+        fresh_service = PriceHistoryService(provider=self.provider, cache_dir=self.cache_dir)
+        result = fresh_service.get_previous_month_high_low(["RELIANCE", "M&M"], today=self.today)
 
-        result = self.service.get_last_month_ohl("RELIANCE")
-        
-        self.assertIsNotNone(result)
-        self.assertEqual(result, (115.0, 98.0))
-        mock_ticker.assert_called_with("RELIANCE.NS", session=self.service.session)
-        mock_instance.history.assert_called_once()
+        self.assertEqual([c[0] for c in self.provider.calls], [["M-M.NS"]])
+        self.assertEqual(set(result), {"RELIANCE", "M&M"})
 
-    @patch('yfinance.Ticker')
-    def test_get_last_month_ohl_empty_dataframe(self, mock_ticker):
-        """Test the case where yfinance returns an empty DataFrame."""
-        mock_instance = mock_ticker.return_value
-        mock_instance.history.return_value = pd.DataFrame()
+        self.provider.calls.clear()
+        fresh_service.get_previous_month_high_low(["RELIANCE", "M&M"], today=self.today)
+        self.assertEqual(self.provider.calls, [])
 
-        result = self.service.get_last_month_ohl("FAKESYMBOL")
+    def test_damaged_month_file_is_refetched_and_replaced(self):
+        with open(os.path.join(self.cache_dir, "2026-09.json"), "w") as f:
+            f.write('{"RELIANCE": [101.0, ')
+        result = self.service.get_previous_month_high_low(["RELIANCE"], today=self.today)
 
-        self.assertIsNone(result)
-        self.assertEqual(mock_instance.history.call_count, 2)
+        self.assertIn("RELIANCE", result)
+        self.assertEqual(len(self.provider.calls), 1)
+        self.assertEqual(os.listdir(self.cache_dir), ["2026-09.json"])
+        self.provider.calls.clear()
+        PriceHistoryService(provider=self.provider, cache_dir=self.cache_dir).get_previous_month_high_low(["RELIANCE"], today=self.today)
+        self.assertEqual(self.provider.calls, [])
 
-    @patch('yfinance.Ticker')
-    def test_get_last_month_ohl_exception(self, mock_ticker):
-        """Test the case where yfinance throws an exception."""
-        mock_instance = mock_ticker.return_value
-        mock_instance.history.side_effect = Exception("Yahoo Finance is down")
+    def test_unknown_symbols_are_omitted_and_not_cached(self):
+        result = self.service.get_previous_month_high_low(["FAKESYMBOL"], today=self.today)
+        self.assertEqual(result, {})
 
-        result = self.service.get_last_month_ohl("ERRORSYMBOL")
+        self.service.get_previous_month_high_low(["FAKESYMBOL"], today=self.today)
+        self.assertEqual(len(self.provider.calls), 4)
 
-        self.assertIsNone(result)
-        self.assertEqual(mock_instance.history.call_count, 2)
+    def test_provider_errors_are_retried(self):
+        self.provider.fail_times = 1
+        with patch("app.services.price_history_service.time.sleep") as sleep:
+            result = self.service.get_previous_month_high_low(["RELIANCE"], today=self.today)
+        sleep.assert_called_once()
+        self.assertIn("RELIANCE", result)
 
-    @patch('yfinance.Ticker')
-    def test_symbol_cleaning(self, mock_ticker):
-        """Test if the symbol is cleaned correctly."""
-        self.service.get_last_month_ohl("M&M")
-        mock_ticker.assert_called_with("M-M.NS", session=self.service.session)
+    def test_monthly_high_low_is_vectorized_across_tickers(self):
+        highs, lows = monthly_high_low(daily_frame({"A.NS": (1.0, 1.0), "B.NS": (5.0, 0.0)}))
+        self.assertEqual(list(highs.columns), ["A.NS", "B.NS"])
+        self.assertEqual(len(highs), 2)
+        self.assertEqual(lows.loc["2026-08-01", "B.NS"], 4.0)
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,141 @@
+# tests/test_proxy_pool.py
+
+import asyncio
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from app.core.config import settings
+from app.services.proxy_pool import ProxyPool
+
+async def start_stand_in_proxy(delay=0.0, status=200):
+    """A local proxy stand-in that answers CONNECT with the given status after `delay` seconds."""
+    async def handle(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        await asyncio.sleep(delay)
+        writer.write(f"HTTP/1.1 {status} Stand-in\r\n\r\n".encode())
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, f"127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+def unused_address():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"127.0.0.1:{sock.getsockname()[1]}"
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class TestProxyPool(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.scores_path = os.path.join(self.tmp, "scores.json")
+        self.clock = FakeClock()
+        self.settings_patch = patch.multiple(
+            settings, proxy_probe_timeout_seconds=1.0, proxy_top_k=2,
+            proxy_failure_threshold=2, proxy_cooldown_seconds=60,
+        )
+        self.settings_patch.start()
+
+    def tearDown(self):
+        self.settings_patch.stop()
+        shutil.rmtree(self.tmp)
+
+    def run_with_stand_ins(self, scenario):
+        async def runner():
+            fast, fast_addr = await start_stand_in_proxy()
+            slow, slow_addr = await start_stand_in_proxy(delay=0.2)
+            refusing, refusing_addr = await start_stand_in_proxy(status=403)
+            try:
+                return await scenario(fast_addr, slow_addr, refusing_addr, unused_address())
+            finally:
+                for server in (fast, slow, refusing):
+                    server.close()
+                    await server.wait_closed()
+        return asyncio.run(runner())
+
+    def test_health_check_ranks_by_latency_and_drops_failures(self):
+        async def scenario(fast, slow, refusing, dead):
+            pool = ProxyPool([slow, refusing, dead, fast], scores_path=self.scores_path, clock=self.clock)
+            await pool.refresh()
+            return pool, fast, slow, refusing, dead
+
+        pool, fast, slow, refusing, dead = self.run_with_stand_ins(scenario)
+        self.assertLess(pool.stats[fast].latency, pool.stats[slow].latency)
+        self.assertIsNone(pool.stats[refusing].latency)
+        self.assertIsNone(pool.stats[dead].latency)
+        self.assertEqual({pool.acquire() for _ in range(4)}, {fast, slow})
+
+    def test_circuit_breaker_opens_and_recovers_after_cooldown(self):
+        pool = ProxyPool(["10.0.0.1:80", "10.0.0.2:80"], scores_path=self.scores_path, clock=self.clock)
+        pool.record_success("10.0.0.1:80", 0.1)
+        pool.record_success("10.0.0.2:80", 0.5)
+
+        pool.record_failure("10.0.0.1:80")
+        self.assertIn("10.0.0.1:80", {pool.acquire() for _ in range(2)})
+        pool.record_failure("10.0.0.1:80")
+        self.assertEqual({pool.acquire() for _ in range(4)}, {"10.0.0.2:80"})
+
+        self.clock.now += 61
+        self.assertIn("10.0.0.1:80", {pool.acquire() for _ in range(4)})
+
+    def test_saved_scores_skip_probing_on_next_start(self):
+        async def scenario(fast, slow, refusing, dead):
+            first = ProxyPool([fast, slow, refusing, dead], scores_path=self.scores_path, clock=self.clock)
+            await first.refresh()
+
+            second = ProxyPool([fast, slow, refusing, dead], scores_path=self.scores_path, clock=self.clock)
+            with patch.object(ProxyPool, "_probe") as probe:
+                await second.refresh()
+            return second, probe, fast
+
+        second, probe, fast = self.run_with_stand_ins(scenario)
+        probe.assert_not_called()
+        self.assertIsNotNone(second.stats[fast].latency)
+
+    def test_unreadable_scores_are_ignored_and_replaced_atomically(self):
+        with open(self.scores_path, "w") as f:
+            f.write('{"10.0.0.1:80": {"latency": 0.1, "fail')
+        pool = ProxyPool(["10.0.0.1:80"], scores_path=self.scores_path, clock=self.clock)
+        self.assertIsNone(pool.stats["10.0.0.1:80"].latency)
+
+        pool.stats["10.0.0.1:80"].last_checked = self.clock.now
+        pool.save()
+        self.assertEqual(os.listdir(self.tmp), ["scores.json"])
+        reloaded = ProxyPool(["10.0.0.1:80"], scores_path=self.scores_path, clock=self.clock)
+        self.assertEqual(reloaded.stats["10.0.0.1:80"].last_checked, self.clock.now)
+
+    def test_pools_saving_the_same_file_keep_the_latest_record_per_proxy(self):
+        first = ProxyPool(["10.0.0.1:80", "10.0.0.2:80"], scores_path=self.scores_path, clock=self.clock)
+        second = ProxyPool(["10.0.0.2:80", "10.0.0.3:80"], scores_path=self.scores_path, clock=self.clock)
+        first.stats["10.0.0.1:80"].record_success(0.1, now=100)
+        first.stats["10.0.0.2:80"].record_success(0.2, now=300)
+        second.stats["10.0.0.2:80"].record_failure(now=200)
+        second.stats["10.0.0.3:80"].record_success(0.3, now=200)
+        first.save()
+        second.save()
+
+        merged = ProxyPool(["10.0.0.1:80", "10.0.0.2:80", "10.0.0.3:80"], scores_path=self.scores_path, clock=self.clock)
+        self.assertEqual({a: s.last_checked for a, s in merged.stats.items()},
+                         {"10.0.0.1:80": 100, "10.0.0.2:80": 300, "10.0.0.3:80": 200})
+        self.assertEqual(merged.stats["10.0.0.2:80"].failures, 0)
+
+    def test_from_file_skips_blank_lines_and_duplicates(self):
+        path = os.path.join(self.tmp, "proxies.txt")
+        with open(path, "w") as f:
+            f.write("1.1.1.1:80\n\n1.1.1.1:80\n2.2.2.2:8080\n")
+        pool = ProxyPool.from_file(path, scores_path=self.scores_path)
+        self.assertEqual(list(pool.stats), ["1.1.1.1:80", "2.2.2.2:8080"])
+
+if __name__ == '__main__':
+    unittest.main()
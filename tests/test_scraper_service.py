@@ -0,0 +1,164 @@
+# tests/test_scraper_service.py
+
+import asyncio
+import time
+import unittest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from app.core.config import ScannerConfig, settings
+from app.services.latency_tracker import LatencyTracker
+from app.services.scraper_service import ScanStalledError, ScraperService
+
+class FakePage:
+    """Records browser calls made by the scraper against a canned set of result pages."""
+
+    def __init__(self, pages, supports_show_all=False, empty=False, stalled=False):
+        self.pages = pages
+        self.empty = empty
+        self.stalled = stalled
+        self.current = 0
+        self.supports_show_all = supports_show_all
+        self.calls = []
+        self.next_button = MagicMock()
+        self.next_button.click = AsyncMock(side_effect=self._go_next)
+
+    async def _go_next(self, timeout=None):
+        self.calls.append("click")
+        self.current += 1
+
+    async def wait_for_selector(self, selector, timeout=None):
+        self.calls.append("wait_for_selector")
+        if self.stalled:
+            raise PlaywrightTimeoutError(f"Timeout {timeout}ms exceeded.")
+
+    async def wait_for_load_state(self, state, timeout=None):
+        self.calls.append("wait_for_load_state")
+
+    async def evaluate(self, script, arg=None):
+        self.calls.append("evaluate")
+        if script == ScraperService.SHOW_ALL_JS:
+            if self.supports_show_all:
+                self.pages = [[row for page in self.pages for row in page]]
+            return self.supports_show_all
+        rows = self.pages[self.current]
+        return {"rows": rows, "hasNext": self.current < len(self.pages) - 1, "empty": self.empty}
+
+    def locator(self, selector):
+        return self.next_button
+
+class TestExtractDataFromPages(unittest.TestCase):
+
+    def setUp(self):
+        self.service = ScraperService(pool=MagicMock())
+        self.page_one = [[f"Stock {i}", f"SYM{i}", "10.5", "1000"] for i in range(100)]
+        self.page_two = [["Last Stock", "LAST", "1.0", "5"]]
+
+    def test_each_page_is_read_in_one_evaluation(self):
+        """A 100-row page costs one wait plus one evaluation, not a call per cell."""
+        page = FakePage([self.page_one, self.page_two])
+        rows = asyncio.run(self.service._extract_data_from_pages(page))
+
+        self.assertEqual(rows, self.page_one + self.page_two)
+        self.assertEqual(page.calls, [
+            "evaluate",  # page-size probe
+            "wait_for_selector", "evaluate", "click", "wait_for_load_state",
+            "wait_for_selector", "evaluate",
+        ])
+
+    def test_show_all_skips_pagination(self):
+        page = FakePage([self.page_one, self.page_two], supports_show_all=True)
+        rows = asyncio.run(self.service._extract_data_from_pages(page))
+
+        self.assertEqual(len(rows), 101)
+        self.assertNotIn("click", page.calls)
+        self.assertEqual(page.calls.count("evaluate"), 2)
+
+    def test_empty_results_are_told_apart_from_a_stalled_grid(self):
+        self.assertEqual(asyncio.run(self.service._extract_data_from_pages(FakePage([[]], empty=True))), [])
+        with self.assertRaises(ScanStalledError):
+            asyncio.run(self.service._extract_data_from_pages(FakePage([[]])))
+        with self.assertRaises(ScanStalledError):
+            asyncio.run(self.service._extract_data_from_pages(FakePage([self.page_one], stalled=True), deadline=time.perf_counter() + 0.5))
+
+class TestHedgedScrape(unittest.TestCase):
+
+    def setUp(self):
+        self.scanner = ScannerConfig(name="Scan", url="https://chartink.com/screener/scan")
+        self.service = ScraperService(pool=MagicMock(), latencies=LatencyTracker("/nonexistent/latencies.json"))
+        self.cancelled = []
+
+    def attempts(self, durations, outcomes, queued=None):
+        async def attempt(scanner, timeout, label, acquired=None):
+            await asyncio.sleep((queued or {}).get(label, 0))
+            if acquired is not None:
+                acquired.set()
+            try:
+                await asyncio.sleep(durations[label])
+            except asyncio.CancelledError:
+                self.cancelled.append(label)
+                raise
+            if isinstance(outcomes[label], Exception):
+                raise outcomes[label]
+            return outcomes[label]
+        return attempt
+
+    def test_slow_attempt_is_hedged_and_the_loser_cancelled(self):
+        self.service._attempt = self.attempts({"primary": 5, "hedge": 0.01}, {"primary": [["P"]], "hedge": [["H"]]})
+        rows = asyncio.run(self.service._hedged(self.scanner, hedge_after=0.05, timeout=10))
+        self.assertEqual(rows, [["H"]])
+        self.assertEqual(self.cancelled, ["primary"])
+
+    def test_fast_attempt_is_not_hedged_and_failed_hedge_falls_back(self):
+        self.service._attempt = self.attempts({"primary": 0.01}, {"primary": [["P"]]})
+        self.assertEqual(asyncio.run(self.service._hedged(self.scanner, hedge_after=1, timeout=10)), [["P"]])
+
+        self.service._attempt = self.attempts({"primary": 0.2, "hedge": 0.01}, {"primary": [["P"]], "hedge": RuntimeError("crash")})
+        self.assertEqual(asyncio.run(self.service._hedged(self.scanner, hedge_after=0.05, timeout=10)), [["P"]])
+
+    def test_waiting_for_a_context_does_not_start_the_hedge_clock(self):
+        self.service._attempt = self.attempts({"primary": 0.01}, {"primary": [["P"]]}, queued={"primary": 0.2})
+        self.assertEqual(asyncio.run(self.service._hedged(self.scanner, hedge_after=0.05, timeout=10)), [["P"]])
+        self.assertEqual(self.cancelled, [])
+
+    def test_attempt_is_bounded_by_its_budget_from_acquisition(self):
+        async def hang(*args, **kwargs):
+            await asyncio.sleep(5)
+        page = MagicMock()
+        page.goto = AsyncMock(side_effect=hang)
+        page.close = AsyncMock()
+        pooled = MagicMock()
+        pooled.context.new_page = AsyncMock(return_value=page)
+
+        @asynccontextmanager
+        async def acquire(label):
+            await asyncio.sleep(0.1)  # queued behind other scans
+            yield pooled
+        self.service.pool.acquire = acquire
+
+        started = time.perf_counter()
+        with self.assertRaises(ScanStalledError):
+            asyncio.run(self.service._attempt(self.scanner, 0.05, "primary"))
+        self.assertLess(time.perf_counter() - started, 1)
+        page.close.assert_awaited_once()
+        self.assertLessEqual(page.goto.call_args.kwargs["timeout"], 1000)
+
+    def test_status_separates_empty_stalled_and_failed_scans(self):
+        def scrape(side_effect):
+            self.service._hedged = AsyncMock(side_effect=side_effect)
+            with patch.object(settings, "retry_delay_seconds", 0), patch("asyncio.sleep", AsyncMock()):
+                return asyncio.run(self.service.scrape_single_url(self.scanner))
+
+        self.assertEqual(scrape([[["A", "A", "1", "2"]]])["status"], "ok")
+        self.assertEqual(scrape([[]])["status"], "empty")
+        stalled = scrape(ScanStalledError("no rows"))
+        self.assertEqual((stalled["status"], stalled["data"]), ("stalled", []))
+        self.assertEqual(self.service._hedged.await_count, settings.retry_attempts)
+        self.assertEqual(scrape(RuntimeError("crash"))["status"], "failed")
+        # A stall followed by success is retried rather than reported empty
+        self.assertEqual(scrape([PlaywrightTimeoutError("goto"), [["A", "A", "1", "2"]]])["status"], "ok")
+
+if __name__ == '__main__':
+    unittest.main()
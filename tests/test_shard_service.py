@@ -0,0 +1,73 @@
+# tests/test_shard_service.py
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from app.core.config import ScannerConfig, settings
+from app.services.shard_service import (
+    clear_artifacts, load_artifacts, parse_shard, shard_scanners, write_artifact,
+)
+
+def scanners(count):
+    return [ScannerConfig(name=f"Scanner {i}", url=f"https://chartink.com/screener/scan-{i}") for i in range(count)]
+
+class TestSharding(unittest.TestCase):
+
+    def test_parse_shard_validates_the_index(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for bad in ("4/4", "-1/4", "1/0", "1", "a/b"):
+            with self.assertRaises(ValueError):
+                parse_shard(bad)
+
+    def test_shards_cover_every_scanner_once_with_balanced_sizes(self):
+        configured = scanners(23)
+        shards = [shard_scanners(configured, i, 4) for i in range(4)]
+
+        names = [scanner.name for shard in shards for scanner in shard]
+        self.assertCountEqual(names, [scanner.name for scanner in configured])
+        self.assertLessEqual(max(map(len, shards)) - min(map(len, shards)), 1)
+        # Config order inside a shard, and the same split whatever the config order
+        for shard in shards:
+            self.assertEqual(shard, [s for s in configured if s in shard])
+        reordered = [shard_scanners(list(reversed(configured)), i, 4) for i in range(4)]
+        self.assertEqual([sorted(s.name for s in shard) for shard in reordered],
+                         [sorted(s.name for s in shard) for shard in shards])
+
+class TestShardArtifacts(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.scanners = scanners(3)
+
+    def result(self, scanner, rows):
+        return {"scanner": scanner, "headers": settings.table_headers, "data": rows}
+
+    def test_artifacts_merge_back_in_config_order(self):
+        write_artifact([self.result(self.scanners[2], [["C", "C", "3", "30"]])], 1, 2, self.directory)
+        write_artifact([self.result(self.scanners[0], [["A", "A", "1", "10"]]),
+                        self.result(self.scanners[1], [])], 0, 2, self.directory)
+
+        results = load_artifacts(self.directory, self.scanners)
+        self.assertEqual([r["scanner"] for r in results], self.scanners)
+        self.assertEqual([r["data"] for r in results], [[["A", "A", "1", "10"]], [], [["C", "C", "3", "30"]]])
+
+    def test_missing_shards_are_reported_and_skipped(self):
+        write_artifact([self.result(self.scanners[0], [["A", "A", "1", "10"]])], 0, 2, self.directory)
+
+        with self.assertLogs("ChartInkAutomation", "WARNING") as logs:
+            results = load_artifacts(self.directory, self.scanners)
+        self.assertEqual([r["scanner"] for r in results], [self.scanners[0]])
+        self.assertTrue(any("shard(s) [1] of 2" in line for line in logs.output))
+
+    def test_no_artifacts_is_an_error_and_clear_removes_them(self):
+        with self.assertRaises(FileNotFoundError):
+            load_artifacts(self.directory, self.scanners)
+        write_artifact([], 0, 1, self.directory)
+        clear_artifacts(self.directory)
+        self.assertEqual(os.listdir(self.directory), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+# tests/test_sheet_diff.py
+
+import unittest
+
+from app.services.sheet_diff import diff_grid
+
+class TestDiffGrid(unittest.TestCase):
+
+    def test_identical_grids_produce_no_writes(self):
+        grid = [['A', 'B', 1], ['C', 'D', 2.0]]
+        self.assertEqual(diff_grid(grid, [['A', 'B', '1'], ['C', 'D', '2']], 3), [])
+
+    def test_appended_rows_are_one_block(self):
+        existing = [['A', 1]]
+        desired = [['A', 1], ['B', 2], ['C', 3]]
+        blocks = diff_grid(existing, desired, 2)
+        self.assertEqual([(b.row, b.col, b.values) for b in blocks], [(1, 0, [['B', 2], ['C', 3]])])
+
+    def test_vertical_runs_with_same_span_are_coalesced(self):
+        existing = [['A', 'x', 'k'], ['B', 'x', 'k'], ['C', 'x', 'k']]
+        desired = [['A', 'y', 'k'], ['B', 'y', 'k'], ['C', 'x', 'k']]
+        blocks = diff_grid(existing, desired, 3)
+        self.assertEqual([(b.row, b.col, b.values) for b in blocks], [(0, 1, [['y'], ['y']])])
+
+    def test_removed_rows_are_blanked(self):
+        blocks = diff_grid([['A', 1], ['B', 2]], [['A', 1]], 2)
+        self.assertEqual([(b.row, b.col, b.values) for b in blocks], [(1, 0, [['', '']])])
+
+    def test_payload_scales_with_change_not_table_size(self):
+        existing = [[f'S{i}', i, '=FORMULA()'] for i in range(1000)]
+        desired = existing + [['NEW', 1, '=FORMULA()']]
+        blocks = diff_grid(existing, desired, 3)
+        self.assertEqual(sum(b.height * b.width for b in blocks), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+# tests/test_sheets_scheduler.py
+
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from gspread.exceptions import APIError
+
+from app.core.config import settings
+from app.services.sheets_scheduler import SheetsRequestScheduler, TokenBucket
+
+def api_error(status):
+    response = MagicMock(status_code=status)
+    response.json.return_value = {'error': {'code': status, 'message': 'quota', 'status': 'RESOURCE_EXHAUSTED'}}
+    return APIError(response)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def make_scheduler(clock=None):
+    clock = clock or FakeClock()
+    sleeps = []
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock.sleep(seconds)
+    return SheetsRequestScheduler(clock=clock, sleep=sleep, project={}), sleeps
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_bucket_allows_a_minute_of_burst_then_paces_callers(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, clock)
+        self.assertEqual([bucket.reserve(), bucket.reserve()], [0.0, 0.0])
+        # Reservations queue: the next two callers wait one and two refill intervals
+        self.assertAlmostEqual(bucket.reserve(), 30.0)
+        self.assertAlmostEqual(bucket.reserve(), 60.0)
+        clock.now = 60.0
+        self.assertAlmostEqual(bucket.reserve(), 30.0)
+
+class TestSheetsRequestScheduler(unittest.TestCase):
+
+    def test_reads_beyond_the_user_quota_are_throttled_and_counted(self):
+        with patch.object(settings, 'sheets_read_quota_per_user', 2):
+            scheduler, sleeps = make_scheduler()
+        fn = MagicMock(return_value='ok')
+        for _ in range(3):
+            self.assertEqual(scheduler.read("read", fn, 'A1'), 'ok')
+
+        self.assertEqual(sleeps, [30.0])
+        stats = scheduler.summary()['read']
+        self.assertEqual((stats['calls'], stats['throttled'], stats['throttle_seconds']), (3, 1, 30.0))
+
+    def test_rate_limits_and_server_errors_are_retried_with_backoff(self):
+        scheduler, sleeps = make_scheduler()
+        fn = MagicMock(side_effect=[api_error(429), api_error(503), {'done': True}])
+
+        self.assertEqual(scheduler.write("write", fn, {'data': []}), {'done': True})
+        self.assertEqual(fn.call_count, 3)
+        self.assertEqual(len(sleeps), 2)
+        self.assertTrue(1.0 <= sleeps[0] <= 2.0 and 2.0 <= sleeps[1] <= 3.0)
+        self.assertEqual(scheduler.summary()['write']['retries'], 2)
+
+    def test_client_errors_and_exhausted_retries_are_raised(self):
+        scheduler, sleeps = make_scheduler()
+        with self.assertRaises(APIError):
+            scheduler.read("read", MagicMock(side_effect=api_error(400)))
+        self.assertEqual(sleeps, [])
+
+        with patch.object(settings, 'sheets_max_retries', 2):
+            fn = MagicMock(side_effect=api_error(429))
+            with self.assertRaises(APIError):
+                scheduler.read("read", fn)
+        self.assertEqual(fn.call_count, 3)
+
+    def test_batch_updates_queued_behind_a_call_are_merged(self):
+        scheduler, _ = make_scheduler()
+        spreadsheet = MagicMock(id='sheet-1')
+        first_call_started, release = threading.Event(), threading.Event()
+
+        def batch_update(body):
+            if spreadsheet.batch_update.call_count == 1:
+                first_call_started.set()
+                release.wait(5)
+            return {'replies': [{'n': r['n']} for r in body['requests']]}
+        spreadsheet.batch_update.side_effect = batch_update
+
+        results = {}
+        def submit(name, numbers):
+            results[name] = scheduler.batch_update(spreadsheet, {'requests': [{'n': n} for n in numbers]})
+
+        leader = threading.Thread(target=submit, args=('leader', [1]))
+        leader.start()
+        first_call_started.wait(5)
+        followers = [threading.Thread(target=submit, args=(name, numbers)) for name, numbers in (('a', [2, 3]), ('b', [4]))]
+        for thread in followers:
+            thread.start()
+        while len(scheduler._queues[('sheet-1', 'batch_update')]) < 2:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(spreadsheet.batch_update.call_count, 2)
+        merged = spreadsheet.batch_update.call_args.args[0]['requests']
+        self.assertCountEqual([r['n'] for r in merged], [2, 3, 4])
+        self.assertEqual(results['a']['replies'], [{'n': 2}, {'n': 3}])
+        self.assertEqual(results['b']['replies'], [{'n': 4}])
+        self.assertEqual(scheduler.summary()['write']['coalesced'], 1)
+
+    def test_value_writes_keep_the_configured_number_in_flight(self):
+        scheduler, _ = make_scheduler()
+        spreadsheet = MagicMock(id='sheet-1')
+        lock, in_flight, peak = threading.Lock(), [0], [0]
+
+        def values_batch_update(body):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.05)
+            with lock:
+                in_flight[0] -= 1
+            return {'responses': [{}] * len(body['data'])}
+        spreadsheet.values_batch_update.side_effect = values_batch_update
+
+        # Each body fills a whole chunk, so none can be merged with another
+        values = [['x'] * 10] * 10
+        body = lambda n: {'valueInputOption': 'RAW', 'data': [{'range': f'A{n}', 'values': values}]}
+        with patch.object(settings, 'sheets_write_concurrency', 2), patch.object(settings, 'sheets_write_chunk_cells', 100):
+            threads = [threading.Thread(target=scheduler.values_batch_update, args=(spreadsheet, body(n))) for n in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(spreadsheet.values_batch_update.call_count, 4)
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(scheduler._leaders[('sheet-1', 'values_batch_update')], 0)
+
+    def test_drain_that_finds_its_queue_emptied_by_another_gives_back_its_slot(self):
+        scheduler, _ = make_scheduler()
+        spreadsheet = MagicMock(id='sheet-1')
+        spreadsheet.values_batch_update.side_effect = lambda body: {'responses': [{}] * len(body['data'])}
+        first_waiting, release_first = threading.Event(), threading.Event()
+        throttled = []
+
+        def throttle(kind):
+            throttled.append(kind)
+            if len(throttled) == 1:
+                first_waiting.set()
+                release_first.wait(5)
+        scheduler._throttle = throttle
+
+        body = lambda n: {'valueInputOption': 'RAW', 'data': [{'range': f'A{n}', 'values': [['x']]}]}
+        results, errors = {}, []
+        def submit(name, n):
+            try:
+                results[name] = scheduler.values_batch_update(spreadsheet, body(n))
+            except Exception as e:
+                errors.append(e)
+
+        with patch.object(settings, 'sheets_write_concurrency', 2):
+            slow = threading.Thread(target=submit, args=('slow', 1))
+            slow.start()
+            first_waiting.wait(5)
+            # The second drain sends both queued writes while the first waits for quota
+            fast = threading.Thread(target=submit, args=('fast', 2))
+            fast.start()
+            fast.join(5)
+            release_first.set()
+            slow.join(5)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(spreadsheet.values_batch_update.call_count, 1)
+        self.assertEqual(set(results), {'slow', 'fast'})
+        self.assertEqual(scheduler._leaders[('sheet-1', 'values_batch_update')], 0)
+
+if __name__ == '__main__':
+    unittest.main()
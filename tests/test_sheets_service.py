@@ -0,0 +1,318 @@
+# tests/test_sheets_service.py
+
+import unittest
+from unittest.mock import patch, MagicMock
+
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+
+from app.core.config import ScannerConfig, settings
+from app.services.sheets_service import SheetsService
+
+def make_service(scanners, batch_get_response, sheets=None):
+    """Builds a SheetsService around a mocked gspread client."""
+    client = MagicMock()
+    spreadsheet = client.open.return_value
+    spreadsheet.client = MagicMock(spec=HTTPClient)
+    spreadsheet.fetch_sheet_metadata.return_value = {'sheets': sheets or []}
+    spreadsheet.add_worksheet.side_effect = lambda title, rows, cols: MagicMock(title=title, id=hash(title) % 1000)
+    spreadsheet.values_batch_get.return_value = batch_get_response
+    with patch.object(settings, 'scanners', scanners):
+        service = SheetsService(client=client)
+    return service, spreadsheet
+
+HEADERS = settings.table_headers
+
+def table(title, *rows):
+    """An existing table as returned by a FORMULA batch-get, starting at row 1."""
+    return {'values': [[title] + [''] * 6, list(HEADERS)] + [list(r) for r in rows]}
+
+class TestUpdateScannedStocksReport(unittest.TestCase):
+
+    def setUp(self):
+        self.scanners = [
+            ScannerConfig(name="One", url="https://chartink.com/screener/one"),
+            ScannerConfig(name="Two", url="https://chartink.com/screener/two"),
+            ScannerConfig(name="Three", url="https://chartink.com/screener/three"),
+            ScannerConfig(name="Other Tab", url="https://chartink.com/screener/four", worksheet="Archive"),
+        ]
+
+    def test_all_tables_use_one_batch_read_and_one_batch_write(self):
+        existing = {'valueRanges': [
+            table('One', ['Old', 'OLD', 1, 2, '', '', 'Dismissed'], ['Keep', 'KEEP', 1, 2, '', '', '']),
+            table('Two'),
+            {},
+            {},
+        ]}
+        service, spreadsheet = make_service(self.scanners, existing)
+        results = [
+            {'scanner_name': 'One', 'data': [['New', 'NEW', '3', '4', '', '', '']]},
+            {'scanner_name': 'Two', 'data': []},
+            {'scanner_name': 'Three', 'data': [['Third', 'THR', '5', '6', '', '', '']]},
+            {'scanner_name': 'Other Tab', 'data': [['Fourth', 'FOU', '7', '8', '', '', '']]},
+        ]
+
+        with patch.object(SheetsService, '_format_worksheets'):
+            service.update_scanned_stocks_report(results)
+
+        spreadsheet.values_batch_get.assert_called_once()
+        read_ranges = spreadsheet.values_batch_get.call_args.args[0]
+        self.assertEqual(read_ranges, [
+            "'Scanned Stocks'!A1:G5000", "'Scanned Stocks'!J1:P5000",
+            "'Scanned Stocks'!S1:Y5000", "'Archive'!A1:G5000",
+        ])
+
+        spreadsheet.values_batch_update.assert_called_once()
+        data = {d['range']: d['values'] for d in spreadsheet.values_batch_update.call_args.args[0]['data']}
+        # 'Keep' moves up over the dismissed row and 'NEW' takes its old place; E-F never change
+        self.assertEqual(data["'Scanned Stocks'!A3:B3"], [['Keep', 'KEEP']])
+        self.assertEqual(data["'Scanned Stocks'!G3:G3"], [['']])
+        self.assertEqual(data["'Scanned Stocks'!A4:D4"], [['New', 'NEW', '3', '4']])
+        # Tables that already had their title and headers are not rewritten there
+        self.assertFalse(any(r.startswith("'Scanned Stocks'!J") for r in data))
+        # A brand-new table gets its title, headers and rows; blank cells are skipped
+        self.assertEqual(data["'Scanned Stocks'!S1:S1"], [['Three']])
+        self.assertEqual(data["'Scanned Stocks'!S2:Y2"], [HEADERS])
+        self.assertEqual(data["'Scanned Stocks'!S3:V3"], [['Third', 'THR', '5', '6']])
+        self.assertEqual(data["'Archive'!A3:D3"][0][1], 'FOU')
+
+    def test_leftover_rows_are_blanked_in_the_same_batch(self):
+        existing = {'valueRanges': [
+            table('One', ['A', 'A', 1, 1, '', '', 'Dismissed'], ['B', 'B', 1, 1, '', '', 'dismissed ']),
+        ]}
+        service, spreadsheet = make_service(self.scanners[:1], existing)
+
+        with patch.object(SheetsService, '_format_worksheets'):
+            service.update_scanned_stocks_report([{'scanner_name': 'One', 'data': []}])
+
+        data = {d['range']: d['values'] for d in spreadsheet.values_batch_update.call_args.args[0]['data']}
+        self.assertEqual(data, {
+            "'Scanned Stocks'!A3:D4": [[''] * 4, [''] * 4],
+            "'Scanned Stocks'!G3:G4": [[''], ['']],
+        })
+
+    def test_unchanged_table_writes_nothing_and_dry_run_reports_plan(self):
+        rows = [['Keep', 'KEEP', 10, 20, '', '', ''], ['Also', 'ALSO', 3.0, 4, '', '', 'Bought']]
+        existing = {'valueRanges': [table('One', *rows)]}
+        service, spreadsheet = make_service(self.scanners[:1], existing)
+
+        with patch.object(SheetsService, '_format_worksheets') as formatter:
+            plan = service.update_scanned_stocks_report([{'scanner_name': 'One', 'data': [['Keep', 'KEEP', '10', '20', '', '', '']]}])
+        spreadsheet.values_batch_update.assert_not_called()
+        formatter.assert_called_once()
+        self.assertEqual(plan['cells'], 0)
+
+        with patch.object(SheetsService, '_format_worksheets') as formatter:
+            plan = service.update_scanned_stocks_report(
+                [{'scanner_name': 'One', 'data': [['Fresh', 'FRESH', '1', '2', '', '', '']]}], dry_run=True
+            )
+        spreadsheet.values_batch_update.assert_not_called()
+        formatter.assert_not_called()
+        self.assertEqual(plan['ranges'], [{'range': "'Scanned Stocks'!A5:D5", 'cells': 4}])
+        self.assertGreater(plan['payload_bytes'], 0)
+
+        with patch.object(SheetsService, '_format_worksheets') as formatter, patch.object(settings, 'sheets_dry_run', True):
+            service.format_worksheets()
+        formatter.assert_not_called()
+
+    def test_clean_dismissed_compacts_tables_without_formatting(self):
+        existing = {'valueRanges': [
+            table('One', ['A', 'A', 1, 1, '', '', 'Dismissed'], ['B', 'B', 2, 2, '', '', '']),
+            table('Two', ['C', 'C', 3, 3, '', '', '']),
+        ]}
+        service, spreadsheet = make_service(self.scanners[:2], existing)
+
+        with patch.object(SheetsService, '_format_worksheets') as formatter:
+            service.clean_dismissed_stocks()
+
+        formatter.assert_not_called()
+        spreadsheet.values_batch_get.assert_called_once()
+        spreadsheet.values_batch_update.assert_called_once()
+        data = {d['range']: d['values'] for d in spreadsheet.values_batch_update.call_args.args[0]['data']}
+        self.assertEqual(data["'Scanned Stocks'!A3:D4"], [['B', 'B', 2, 2], [''] * 4])
+        self.assertEqual(data["'Scanned Stocks'!G3:G3"], [['']])
+        self.assertFalse(any(r.startswith("'Scanned Stocks'!J") for r in data))
+
+    def test_blank_price_levels_of_rescanned_stocks_are_filled(self):
+        existing = {'valueRanges': [
+            table('One', ['Miss', 'MISS', 1, 1, '', '', ''], ['Have', 'HAVE', 1, 1, 90, 80, 'Bought'], ['Gone', 'GONE', 1, 1, '', '', '']),
+        ]}
+        service, spreadsheet = make_service(self.scanners[:1], existing)
+        results = [{'scanner_name': 'One', 'data': [
+            ['Miss', 'MISS', '2', '2', 11.5, 9.5, ''], ['Have', 'HAVE', '2', '2', 99, 88, ''],
+        ]}]
+
+        with patch.object(SheetsService, '_format_worksheets'):
+            service.update_scanned_stocks_report(results)
+
+        data = {d['range']: d['values'] for d in spreadsheet.values_batch_update.call_args.args[0]['data']}
+        # Only the blank levels are filled; known levels and unscanned rows stay as they are
+        self.assertEqual(data, {"'Scanned Stocks'!E3:F3": [[11.5, 9.5]]})
+
+    def test_failed_read_writes_nothing(self):
+        response = MagicMock(status_code=400)
+        response.json.return_value = {'error': {'code': 400, 'message': 'bad range', 'status': 'INVALID_ARGUMENT'}}
+        service, spreadsheet = make_service(self.scanners[:1], None)
+        spreadsheet.values_batch_get.side_effect = APIError(response)
+        result = {'scanner_name': 'One', 'data': [['New', 'NEW', '3', '4', '', '', '']]}
+
+        with patch.object(SheetsService, '_format_worksheets'):
+            with self.assertRaises(APIError):
+                service.update_scanned_stocks_report([result])
+            service.prefetch_tables()
+            with self.assertRaises(APIError):
+                service.write_table(result)
+
+        self.assertEqual(service._prefetched_tables, {})
+        spreadsheet.values_batch_update.assert_not_called()
+
+class TestLargeTables(unittest.TestCase):
+
+    def setUp(self):
+        self.scanners = [
+            ScannerConfig(name="One", url="https://chartink.com/screener/one"),
+            ScannerConfig(name="Two", url="https://chartink.com/screener/two"),
+        ]
+
+    def test_reads_page_through_tables_until_each_one_ends(self):
+        pages = [
+            {'valueRanges': [table('One', ['A', 'A', 1, 1, '', '', '']), table('Two')]},
+            {'valueRanges': [{'values': [['B', 'B', 2, 2, '', '', '']]}]},
+        ]
+        service, spreadsheet = make_service(self.scanners, None)
+        spreadsheet.values_batch_get.side_effect = pages
+
+        with patch.object(settings, 'sheets_read_chunk_rows', 3):
+            grids = service._read_tables(service.layouts)
+
+        self.assertEqual(spreadsheet.values_batch_get.call_count, 2)
+        # Only 'One' filled its first page, so only it is read further
+        self.assertEqual(spreadsheet.values_batch_get.call_args.args[0], ["'Scanned Stocks'!A4:G6"])
+        self.assertEqual([row[1] for row in grids[0][2:]], ['A', 'B'])
+        self.assertEqual(len(grids[1]), 2)
+
+    def test_large_writes_are_chunked_after_growing_the_grid(self):
+        sheet = {'properties': {'sheetId': 3, 'title': 'Scanned Stocks', 'index': 0, 'gridProperties': {'rowCount': 4}}}
+        service, spreadsheet = make_service(self.scanners[:1], {'valueRanges': [table('One')]}, sheets=[sheet])
+        rows = [[f'S{i}', f'S{i}', '1', '2', '', '', ''] for i in range(5)]
+
+        with patch.object(settings, 'sheets_write_chunk_cells', 8), \
+                patch.object(settings, 'sheets_read_chunk_rows', 10), \
+                patch.object(SheetsService, '_format_worksheets'):
+            service.update_scanned_stocks_report([{'scanner_name': 'One', 'data': rows}])
+
+        calls = [name for name, _, _ in spreadsheet.mock_calls if name in ('batch_update', 'values_batch_update')]
+        self.assertEqual(calls[0], 'batch_update')
+        resize = spreadsheet.batch_update.call_args.args[0]['requests'][0]['updateSheetProperties']
+        self.assertEqual(resize['properties'], {'sheetId': 3, 'gridProperties': {'rowCount': 20}})
+
+        written = [
+            [d['range'] for d in call.args[0]['data']]
+            for call in spreadsheet.values_batch_update.call_args_list
+        ]
+        # Chunks are sent concurrently, so their order is not fixed
+        self.assertCountEqual(written, [
+            ["'Scanned Stocks'!A3:D4"], ["'Scanned Stocks'!A5:D6"], ["'Scanned Stocks'!A7:D7"],
+        ])
+
+    def test_grid_is_widened_for_tables_past_its_last_column(self):
+        sheet = {'properties': {'sheetId': 3, 'title': 'Scanned Stocks', 'index': 0,
+                                'gridProperties': {'rowCount': 1000, 'columnCount': 50}}}
+        scanners = [ScannerConfig(name=f"Scan {n}", url=f"https://chartink.com/screener/{n}") for n in range(6)]
+        service, spreadsheet = make_service(scanners, None, sheets=[sheet])
+
+        # The sixth table ends at column 52; it is made room for before anything is read
+        resize = spreadsheet.batch_update.call_args.args[0]['requests'][0]['updateSheetProperties']
+        self.assertEqual(resize, {'properties': {'sheetId': 3, 'gridProperties': {'columnCount': 52}},
+                                  'fields': 'gridProperties.columnCount'})
+
+        with patch.object(settings, 'sheets_read_chunk_rows', 500):
+            service._ensure_grid([{'range': "'Scanned Stocks'!BA1200:BC1200"}])
+        resize = spreadsheet.batch_update.call_args.args[0]['requests']
+        self.assertEqual(len(resize), 1)
+        self.assertEqual(resize[0]['updateSheetProperties']['properties']['gridProperties'], {'rowCount': 2000, 'columnCount': 55})
+
+class TestAppendNewOnly(unittest.TestCase):
+
+    def setUp(self):
+        self.scanners = [
+            ScannerConfig(name="One", url="https://chartink.com/screener/one"),
+            ScannerConfig(name="Two", url="https://chartink.com/screener/two"),
+        ]
+        self.history = MagicMock()
+        self.history.has_scanner.side_effect = lambda name: name == "One"
+        self.history.unseen.side_effect = lambda name, symbols: [s for s in symbols if s != "OLD"]
+
+    def make_service(self):
+        with patch.object(settings, 'sheets_append_new_only', True), patch.object(settings, 'scanners', self.scanners):
+            service, spreadsheet = make_service(self.scanners, {'valueRanges': [table('Two')]})
+            service.history = self.history
+            service.prefetch_tables()
+        return service, spreadsheet
+
+    def test_tables_with_history_append_new_symbols_without_a_read(self):
+        service, spreadsheet = self.make_service()
+        # Only the table without history was prefetched
+        self.assertEqual(spreadsheet.values_batch_get.call_args.args[0], ["'Scanned Stocks'!J1:P5000"])
+
+        with patch.object(settings, 'sheets_append_new_only', True):
+            service.write_table({'scanner_name': 'One', 'data': [
+                ['Old', 'OLD', '1', '2', '', '', ''], ['New', 'NEW', '3', '4', '', '', ''],
+            ]})
+
+        spreadsheet.values_batch_get.assert_called_once()
+        spreadsheet.values_append.assert_called_once()
+        anchor = spreadsheet.values_append.call_args.args[0]
+        self.assertEqual(anchor, "'Scanned Stocks'!A2:G2")
+        self.assertEqual(spreadsheet.values_append.call_args.kwargs['params']['insertDataOption'], 'OVERWRITE')
+        self.assertEqual(spreadsheet.values_append.call_args.kwargs['body'], {'values': [['New', 'NEW', '3', '4', '', '', '']]})
+
+    def test_scanner_without_history_is_merged_as_usual(self):
+        service, spreadsheet = self.make_service()
+        with patch.object(settings, 'sheets_append_new_only', True):
+            service.write_table({'scanner_name': 'Two', 'data': [['New', 'NEW', '3', '4', '', '', '']]})
+        spreadsheet.values_append.assert_not_called()
+        spreadsheet.values_batch_update.assert_called_once()
+
+class TestFormatWorksheets(unittest.TestCase):
+
+    def setUp(self):
+        self.scanners = [
+            ScannerConfig(name="One", url="https://chartink.com/screener/one"),
+            ScannerConfig(name="Two", url="https://chartink.com/screener/two"),
+        ]
+
+    def test_formatting_is_one_batch_and_skipped_when_fingerprint_matches(self):
+        service, spreadsheet = make_service(self.scanners, {'valueRanges': []})
+        service._format_worksheets()
+
+        spreadsheet.batch_update.assert_called_once()
+        requests = spreadsheet.batch_update.call_args.args[0]['requests']
+        kinds = [next(iter(r)) for r in requests]
+        self.assertEqual(kinds.count('mergeCells'), 2)
+        self.assertEqual(kinds[-1], 'createDeveloperMetadata')
+        stored = requests[-1]['createDeveloperMetadata']['developerMetadata']['metadataValue']
+
+        # A later run sees the stored fingerprint on the sheet and makes no formatting call
+        sheet = {
+            'properties': {'sheetId': service.worksheets['Scanned Stocks'].id, 'title': 'Scanned Stocks', 'index': 0},
+            'developerMetadata': [{'metadataKey': 'chartink_format_fingerprint', 'metadataValue': stored}],
+        }
+        service, spreadsheet = make_service(self.scanners, {'valueRanges': []}, sheets=[sheet])
+        service._format_worksheets()
+        spreadsheet.batch_update.assert_not_called()
+        spreadsheet.add_worksheet.assert_not_called()
+
+    def test_changed_layout_updates_the_stored_fingerprint(self):
+        sheet = {
+            'properties': {'sheetId': 7, 'title': 'Scanned Stocks', 'index': 0},
+            'developerMetadata': [{'metadataKey': 'chartink_format_fingerprint', 'metadataValue': 'stale'}],
+        }
+        service, spreadsheet = make_service(self.scanners, {'valueRanges': []}, sheets=[sheet])
+        service._format_worksheets()
+
+        requests = spreadsheet.batch_update.call_args.args[0]['requests']
+        self.assertIn('updateDeveloperMetadata', requests[-1])
+
+if __name__ == '__main__':
+    unittest.main()